@@ -43,10 +43,16 @@
 import argparse
 import json
 import os
-import requests
-from enum import StrEnum, Enum  # must be Python 3.11+
-from typing import Tuple, Dict, Any, List
-from pathlib import Path
+
+from nim_client import NimClient, NIM_HOST_URL_BASE, NIM_PORTS, NIM_ENDPOINTS
+from result_cache import ResultCache, DEFAULT_CACHE_DIR
+from design_params import ExampleRequestParams, get_reduced_pdb, load_hotspots, binder_sequences, warmup_queries
+from target_registry import TargetRegistry
+from mpnn_probs import save_probs
+from tracing import configure_tracing, get_tracer, traced_open
+from hotspots import add_hotspot_arguments, hotspot_config_from_args
+
+SCRIPT = "1_protein_binder_design"
 
 # Load arguments
 parser = argparse.ArgumentParser(description="De Novo Protein Design Workflow")
@@ -54,6 +60,21 @@ parser.add_argument("--cycle", type=str, required=True, help="Cycle number (e.g.
 parser.add_argument("--num_seq", type=int, default=1, help="Number of sequences to generate per target")
 parser.add_argument("--diffusion", type=int, default=20, help="Number of diffusion steps (15-30 recommended)")
 parser.add_argument("--temp", type=float, default=0.2, help="Sampling temperature (range: 0-1)")
+parser.add_argument("--target_pdb", type=str, default=None, help="Precomputed AlphaFold2 model of the target (default: its registry file name, e.g. cycle1_alphafold2_output.pdb, in the working directory)")
+parser.add_argument("--crop_radius", type=float, default=None, help="Send only the epitope window plus residues within this many Angstrom of it, renumbered (default: the whole target)")
+add_hotspot_arguments(parser)
+parser.add_argument("--connect_timeout", type=float, default=10.0, help="Seconds to wait for a NIM connection")
+parser.add_argument("--read_timeout", type=float, default=960.0, help="Seconds to wait for a NIM response")
+parser.add_argument("--max_retries", type=int, default=5, help="Retries on 429/503 or dropped connections, with exponential backoff")
+parser.add_argument("--no_cache", "--no-cache", action="store_true", help="Always call the NIMs; do not read or write the result cache")
+parser.add_argument("--refresh", action="store_true", help="Recompute every NIM call and overwrite its cached result")
+parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the on-disk NIM result cache")
+parser.add_argument("--cache_max_gb", type=float, default=20.0, help="Size bound of the result cache; least recently used entries are evicted")
+parser.add_argument("--ready_timeout", type=float, default=1200.0, help="Seconds to wait for the NIMs to report ready before giving up")
+parser.add_argument("--warmup", action="store_true", help="Send one tiny RFdiffusion and ProteinMPNN request once the NIMs are ready")
+parser.add_argument("--trace", type=str, default=None, help="JSONL trace of timing spans (default: <outdir>/trace_<name>.jsonl)")
+parser.add_argument("--metrics_port", type=int, default=None, help="Serve Prometheus metrics of the spans on this port")
+parser.add_argument("--otel", action="store_true", help="Also send spans to the OpenTelemetry tracer (needs opentelemetry-sdk)")
 args = parser.parse_args()
 
 # Assign input arguments to variables
@@ -67,57 +88,48 @@ root = "/home/ubuntu/nvidia-workbench"
 os.makedirs(root, exist_ok=True)
 print(f"Generating {num_seq} sequences per target for cycle {cycle}...")
 
-if num_seq > 1: # if num_seq > 1, then run code below
-    if cycle == "1":
-        contigs="A400-600/0 15-25"
-        precomputed_pdb_path = "cycle1_alphafold2_output.pdb" # converts pdb_id to a Path Object;
-        target_sequence="MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN"
-    elif cycle == "2":
-        contigs="A100-300/0 15-25"
-        target_sequence="GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV"
-        precomputed_pdb_path = "cycle2_alphafold2_output.pdb" # 
-    else:
-        raise ValueError("Invalid cycle number. Please set cycle to 1 or 2.")
-    
-if num_seq == 1: # if num_seq > 1, then run code below
-    
-    if "1" in cycle:
-        target_sequence="MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN",
-        precomputed_pdb_path = "cycle1_alphafold2_output.pdb" # 
-
-        if cycle == "1A": 
-            contigs="A400-440/0 15-25"
-        if cycle == "1B":
-            contigs="A450-490/0 15-25"
-        if cycle == "1C":
-            contigs="A500-540/0 15-25"
-        if cycle == "1D":
-            contigs="A550-590/0 15-25"
-    
-    elif "2" in cycle:
-        target_sequence="GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV",
-        precomputed_pdb_path = "cycle2_alphafold2_output.pdb" # 
-
-        if cycle == "2A":
-            contigs="A100-140/0 15-25"
-        if cycle == "2B":
-            contigs="A150-190/0 15-25"
-        if cycle == "2C":
-            contigs="A200-240/0 15-25"
-        if cycle == "2D":
-            contigs="A250-290/0 15-25"
-    else:
-        raise ValueError("Invalid cycle number.")
+# Target sequence, precomputed AlphaFold2 PDB and contigs come from the target registry (targets.json)
+registry = TargetRegistry.load()
+epitope = registry.epitope(cycle, script=SCRIPT)  # 1_'s own windows (script_windows in targets.json)
+target_sequence = epitope.target.sequence
+# 1_ reads the AlphaFold2 model from the working directory under the registry's file name (e.g.
+# cycle1_alphafold2_output.pdb), as it always has, unless --target_pdb names another file; crops use it too
+epitope.target.pdb = args.target_pdb or os.path.basename(epitope.target.pdb)
+precomputed_pdb_path = epitope.target.pdb
+contigs = epitope.contigs(chain_break=True)
 
 # Set up variables part 2
 name = f"cycle{cycle}_{num_seq}seqs_{diffusion}diff_{temp}temp"
 outdir = f"{root}/cycle{cycle}_{diffusion}diff_{temp}temp"
 os.makedirs(outdir, exist_ok=True)
 print(f"Output dir : {outdir}")
+configure_tracing(args.trace or f"{outdir}/trace_{name}.jsonl", args.metrics_port, args.otel)
 
 # Check if AlphaFold2 PDB exists
 if not os.path.exists(precomputed_pdb_path):
     raise FileNotFoundError(f"Precomputed PDB file {precomputed_pdb_path} does not exist. Please check the path.")
+
+# --hotspots: RFdiffusion steers the binder onto these residues; 'auto' picks them from the AlphaFold2 model
+hotspots, hotspot_selection = args.hotspots or [], None
+hotspot_config = hotspot_config_from_args(args)
+if hotspot_config is not None:
+    hotspots = []
+    if epitope.window:
+        hotspot_selection = load_hotspots(precomputed_pdb_path, epitope.window, hotspot_config)
+        hotspots = hotspot_selection.residues
+    else:
+        print(f"Epitope {epitope.name} has no window to pick hotspots in; designing without hotspots")
+
+# Optionally crop the target around the epitope: RFdiffusion gets fewer residues, renumbered from 1
+crop = registry.crop(epitope.name, args.crop_radius, hotspots, script=SCRIPT) if args.crop_radius is not None else None
+if crop is not None:
+    contigs = crop.contigs(epitope.binder_length, chain_break=True)
+    with traced_open(f"{outdir}/2_{name}_crop_map.json") as map_file:
+        map_file.write(crop.residue_map.to_json())
+hotspot_res = crop.hotspots(hotspots) if crop is not None else list(hotspots)
+if hotspot_selection is not None:
+    with traced_open(f"{outdir}/2_{name}_hotspots.json") as json_file:
+        json.dump(dict(hotspot_selection.to_dict(), hotspot_res=hotspot_res), json_file, indent=4)
 print()
 
 ##############################################################
@@ -135,87 +147,22 @@ HEADERS = {
     "Authorization": f"Bearer {NVIDIA_API_KEY}",
     "poll-seconds": "900"
 }
-NIM_HOST_URL_BASE = "http://localhost"
-
-# 3 different endpoints for the models
-class NIM_PORTS(Enum):
-    RFDIFFUSION_PORT = 8082
-    PROTEINMPNN_PORT = 8083
-    AF2_MULTIMER_PORT = 8084
-class NIM_ENDPOINTS(StrEnum):
-    RFDIFFUSION =  "biology/ipd/rfdiffusion/generate"
-    PROTEINMPNN =  "biology/ipd/proteinmpnn/predict"
-    AF2_MULTIMER = "protein-structure/alphafold2/multimer/predict-structure-from-sequences"
-
-def query_nim(
-            payload: Dict[str, Any],
-            nim_endpoint: str,
-            headers: Dict[str, str] = HEADERS,
-            base_url: str = "http://localhost",
-            nim_port: int = 8080,
-            echo: bool = False) -> Tuple[int, Dict]:
-    function_url = f"{base_url}:{nim_port}/{nim_endpoint}"
-    if echo:
-        print("*"*80)
-        print(f"\tURL: {function_url}")
-        print(f"\tPayload: {payload}")
-        print("*"*80)
-    response = requests.post(function_url,
-                            json=payload,
-                            headers=headers)
-    if response.status_code == 200:
-        return response.status_code, response.json()
-    else:
-        raise Exception(f"Error: response returned code [{response.status_code}], with text: {response.text}")
-
-def check_nim_readiness(nim_port: NIM_PORTS,
-                        base_url: str = NIM_HOST_URL_BASE,
-                        endpoint: str = "v1/health/ready") -> bool:
-    """
-    Return true if a NIM is ready.
-    """
-    try:
-        response = requests.get(f"{base_url}:{nim_port}/{endpoint}")
-        d = response.json()
-        if "status" in d:
-            if d["status"] == "ready":
-                return True
-        return False
-    except Exception as e:
-        print(e)
-        return False
-    
-def get_reduced_pdb(pdb_id: str, rcsb_path: str = None) -> str:
-    pdb = Path(pdb_id)
-    if not pdb.exists() and rcsb_path is not None:
-        pdb.write_text(requests.get(rcsb_path).text)
-    lines = filter(lambda line: line.startswith("ATOM"), pdb.read_text().split("\n"))
-    return "\n".join(list(lines))
-
-class ExampleRequestParams:
-    def __init__(self,
-                target_sequence: str,
-                contigs: str, 
-                hotspot_res: List[str],
-                input_pdb_chains: List[str],
-                ca_only: bool,
-                use_soluble_model: bool,
-                sampling_temp: List[float],
-                diffusion_steps: int = 15,
-                num_seq_per_target: int = 20):
-        self.target_sequence = target_sequence
-        self.contigs = contigs
-        self.hotspot_res = hotspot_res
-        self.input_pdb_chains = input_pdb_chains
-        self.ca_only = ca_only
-        self.use_soluble_model = use_soluble_model
-        self.sampling_temp = sampling_temp
-        self.diffusion_steps = diffusion_steps
-        self.num_seq_per_target = num_seq_per_target
-status = check_nim_readiness(NIM_PORTS.RFDIFFUSION_PORT.value)
-print(f"RFDiffusion ready: {status}")
-status = check_nim_readiness(NIM_PORTS.PROTEINMPNN_PORT.value)
-print(f"ProteinMPNN ready: {status}")
+nim_client = NimClient(
+    headers=HEADERS,
+    base_url=NIM_HOST_URL_BASE,
+    connect_timeout=args.connect_timeout,
+    read_timeout=args.read_timeout,
+    max_retries=args.max_retries,
+    cache=None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_gb * 1024**3)),
+    refresh=args.refresh
+)
+
+# Block until both NIMs are ready (a cold start loads the models for minutes) instead of racing them
+nim_client.wait_until_ready(
+    {"RFDiffusion": NIM_PORTS.RFDIFFUSION_PORT.value, "ProteinMPNN": NIM_PORTS.PROTEINMPNN_PORT.value},
+    timeout=args.ready_timeout,
+    warmup=warmup_queries(precomputed_pdb_path) if args.warmup else None
+)
 print()
 print(f"------------- Cycle {cycle} ------------------")
 
@@ -225,7 +172,7 @@ print(f"------------- Cycle {cycle} ------------------")
 cycle = ExampleRequestParams(
     target_sequence= target_sequence,
     contigs=contigs,  # Region A400-A600, peptides 15-25 residues long
-    hotspot_res=[], 
+    hotspot_res=hotspot_res,
     input_pdb_chains=[], # [Optional] default is to design for all chains in the protein
     ca_only=False, # [Optional]  CA-only model helps to address specific needs in protein design where focusing on the alpha carbon (CA)
     use_soluble_model=True, 
@@ -238,16 +185,17 @@ example=cycle
 ##############################################################
 # 2. RFdiffusion
 ##############################################################
-precomputed_pdb=get_reduced_pdb(precomputed_pdb_path, rcsb_path=None)
+precomputed_pdb=crop.pdb if crop is not None else get_reduced_pdb(precomputed_pdb_path, rcsb_path=None)
 
 print(f"Running RFdiffusion....")
 rfdiffusion_query = {
     "input_pdb": precomputed_pdb,  # Now using the precomputed PDB structure
     "contigs": example.contigs,
     "diffusion_steps": example.diffusion_steps
-    # "hotspot_res": example.hotspot_res
 }
-rc, rfdiffusion_response = query_nim(
+if example.hotspot_res:
+    rfdiffusion_query["hotspot_res"] = example.hotspot_res
+rc, rfdiffusion_response = nim_client.query(
     payload=rfdiffusion_query,
     nim_endpoint=NIM_ENDPOINTS.RFDIFFUSION.value,
     nim_port=NIM_PORTS.RFDIFFUSION_PORT.value
@@ -255,7 +203,7 @@ rc, rfdiffusion_response = query_nim(
 
 # save
 print(rfdiffusion_response["output_pdb"][0:160])
-with open(f"{outdir}/2_{name}_rfdiffusion.pdb", "w") as pdb_file:
+with traced_open(f"{outdir}/2_{name}_rfdiffusion.pdb") as pdb_file:
     pdb_file.write(rfdiffusion_response["output_pdb"])
 
 ##############################################################
@@ -271,7 +219,7 @@ proteinmpnn_query = {
     "num_seq_per_target" : example.num_seq_per_target,
     "sampling_temp" : example.sampling_temp
 }
-rc, proteinmpnn_response = query_nim(
+rc, proteinmpnn_response = nim_client.query(
     payload=proteinmpnn_query,
     nim_endpoint=NIM_ENDPOINTS.PROTEINMPNN.value,
     nim_port=NIM_PORTS.PROTEINMPNN_PORT.value
@@ -279,37 +227,36 @@ rc, proteinmpnn_response = query_nim(
 
 
 # binder sequences are stored in fasta_sequences
-fasta_sequences = [x.strip() for x in proteinmpnn_response["mfasta"].split("\n") if '>' not in x][2:]
+fasta_sequences = binder_sequences(proteinmpnn_response["mfasta"])
 binder_target_pairs = [[binder, example.target_sequence] for binder in fasta_sequences]
 
 # Save binder_target_pairs to a .txt file
-with open(f"{outdir}/3_{name}_proteinmpnn.txt", "w") as txt_file:
+with traced_open(f"{outdir}/3_{name}_proteinmpnn.txt") as txt_file:
     for i, pair in enumerate(binder_target_pairs):
         binder, target = pair
         txt_file.write(f"Binder {i+1}: {binder}\n")
         txt_file.write(f"Target {i+1}: {target}\n")
         txt_file.write("\n")  # Add a blank line between pairs for readability
 
-with open(f"{outdir}/3_{name}_proteinmpnn_pairs.json", "w") as json_file:
-    json.dump(binder_target_pairs, json_file, indent=4)
+with traced_open(f"{outdir}/3_{name}_proteinmpnn_pairs.json") as json_file:
+    json.dump([[binder, epitope.target.name] for binder in fasta_sequences], json_file, indent=4)  # resolve with registry.resolve_pair
 
 # Save proteinmpnn_response["mfasta"] to a .fasta file
-with open(f"{outdir}/3_{name}_proteinmpnn.fasta", "w") as fasta_file:
+with traced_open(f"{outdir}/3_{name}_proteinmpnn.fasta") as fasta_file:
     fasta_file.write(proteinmpnn_response["mfasta"])
 
 # Save scores and probs to files
 scores = proteinmpnn_response["scores"]
-with open(f"{outdir}/3_{name}_proteinmpnn_scores.txt", "w") as scores_file:
+with traced_open(f"{outdir}/3_{name}_proteinmpnn_scores.txt") as scores_file:
     for i, score in enumerate(scores):
         scores_file.write(f"Sequence {i+1}: Score = {score}\n")
 
-# probs = proteinmpnn_response["probs"]
-# with open(f"{outdir}/3_{name}_proteinmpnn_probs.txt", "w") as probs_file:
-#     for i, prob_matrix in enumerate(probs):
-#         probs_file.write(f"Sequence {i+1}:\n")
-#         for position_probs in prob_matrix:
-#             probs_file.write(",".join(map(str, position_probs)) + "\n")
-#         probs_file.write("\n")
+# Save probs and scores as binary arrays (read back with mpnn_probs.ProbsReader)
+save_probs(f"{outdir}/3_{name}_proteinmpnn", proteinmpnn_response["probs"], proteinmpnn_response.get("scores"))
+
+# Where the time went: NIM calls, retries and local I/O (full trace in the JSONL file)
+print(f"Time by span (trace: {get_tracer().trace_path}):")
+print(get_tracer().summary())
 
 ##############################################################
 # 4. AlphaFold2-Multimer
@@ -340,7 +287,7 @@ with open(f"{outdir}/3_{name}_proteinmpnn_scores.txt", "w") as scores_file:
 #         "selected_models" : [1]
 #     }
 #     print(f"Processing pair number {n_processed+1} of {len(binder_target_pairs)}")
-#     rc, multimer_response = query_nim(
+#     rc, multimer_response = nim_client.query(
 #         payload=multimer_query,
 #         nim_endpoint=NIM_ENDPOINTS.AF2_MULTIMER.value,
 #         nim_port=NIM_PORTS.AF2_MULTIMER_PORT.value
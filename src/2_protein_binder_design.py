@@ -43,10 +43,22 @@
 import argparse
 import json
 import os
-import requests
-from enum import StrEnum, Enum  # must be Python 3.11+
-from typing import Tuple, Dict, Any, List
-from pathlib import Path
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from nim_client import NimClient, NIM_HOST_URL_BASE, NIM_PORTS, NIM_ENDPOINTS
+from result_cache import ResultCache, DEFAULT_CACHE_DIR
+from design_params import (ExampleRequestParams, get_reduced_pdb, load_hotspots, rfdiffusion_payload, proteinmpnn_payload, design_seeds,
+                           binder_records, print_binders, warmup_queries)
+from mfasta import MpnnRecord
+from design_db import DesignDB
+from target_registry import TargetRegistry
+from mpnn_probs import save_probs
+from tracing import configure_tracing, get_tracer, traced_open
+from triage import add_triage_arguments, config_from_args, triage, report
+from hotspots import add_hotspot_arguments, hotspot_config_from_args
+from run_journal import RunJournal
 
 # Load arguments
 parser = argparse.ArgumentParser(description="De Novo Protein Design Workflow")
@@ -54,6 +66,25 @@ parser.add_argument("--cycle", type=str, required=True, help="Cycle number (e.g.
 parser.add_argument("--num_seq", type=int, default=1, help="Number of sequences to generate per target")
 parser.add_argument("--diffusion", type=int, default=20, help="Number of diffusion steps (15-30 recommended)")
 parser.add_argument("--temp", type=float, default=0.2, help="Sampling temperature (range: 0-1)")
+parser.add_argument("--num_designs", type=int, default=None, help="RFdiffusion backbones to design, each with its own seed, ID and ProteinMPNN batch (default: one, unseeded)")
+parser.add_argument("--seed", type=int, default=None, help="Seed of the first design; design k gets seed + k - 1 (default: random seeds, recorded in the journal)")
+parser.add_argument("--design_workers", type=int, default=None, help="Designs submitted at once (default: one per RFdiffusion replica, or all of them to a single RFdiffusion NIM)")
+parser.add_argument("--crop_radius", type=float, default=None, help="Send only the epitope window plus residues within this many Angstrom of it, renumbered (default: the whole target)")
+add_hotspot_arguments(parser)
+parser.add_argument("--design_db", type=str, default=None, help="Also import this run's backbones and sequences into this SQLite design database (design_db.py)")
+parser.add_argument("--connect_timeout", type=float, default=10.0, help="Seconds to wait for a NIM connection")
+parser.add_argument("--read_timeout", type=float, default=960.0, help="Seconds to wait for a NIM response")
+parser.add_argument("--max_retries", type=int, default=5, help="Retries on 429/503 or dropped connections, with exponential backoff")
+parser.add_argument("--no_cache", "--no-cache", action="store_true", help="Always call the NIMs; do not read or write the result cache")
+parser.add_argument("--refresh", action="store_true", help="Recompute every NIM call and overwrite its cached result")
+parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the on-disk NIM result cache")
+parser.add_argument("--cache_max_gb", type=float, default=20.0, help="Size bound of the result cache; least recently used entries are evicted")
+parser.add_argument("--ready_timeout", type=float, default=1200.0, help="Seconds to wait for the NIMs to report ready before giving up")
+parser.add_argument("--warmup", action="store_true", help="Send one tiny RFdiffusion and ProteinMPNN request once the NIMs are ready")
+parser.add_argument("--trace", type=str, default=None, help="JSONL trace of timing spans (default: <outdir>/trace_<name>.jsonl)")
+parser.add_argument("--metrics_port", type=int, default=None, help="Serve Prometheus metrics of the spans on this port")
+parser.add_argument("--otel", action="store_true", help="Also send spans to the OpenTelemetry tracer (needs opentelemetry-sdk)")
+add_triage_arguments(parser)
 args = parser.parse_args()
 
 # Assign input arguments to variables
@@ -72,51 +103,12 @@ root = "/home/ubuntu/nvidia-workbench"
 os.makedirs(root, exist_ok=True)
 print(f"Generating {num_seq} sequences per target for cycle {cycle}...")
 
-if num_seq > 0: # if num_seq > 1, then run code below
-    if cycle == "1":
-        contigs="15-25" # contigs = "A400-700/15-25"???
-        precomputed_pdb_path ="/home/ubuntu/cycle1_alphafold2_output.pdb" # converts pdb_id to a Path Object;
-        target_sequence="MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN"
-    elif cycle == "2":
-        contigs="15-25"
-        target_sequence="GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV"
-        precomputed_pdb_path = "/home/ubuntu/cycle2_alphafold2_output.pdb" # 
-
-    elif "1" in cycle:
-        target_sequence="MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN",
-        precomputed_pdb_path = "/home/ubuntu/cycle1_alphafold2_output.pdb" # 
-        
-        # if cycle == "1A": 
-        #     contigs="A400-430/15-25"
-        # if cycle == "1B":
-        #     contigs="A450-480/15-25"
-        # if cycle == "1C":
-        #     contigs="A500-540/15-25"
-        # if cycle == "1D":
-        #     contigs="A560-600/15-25"
-        if cycle == "1A": 
-            contigs="430-450/15-25"
-        if cycle == "1B":
-            contigs="A480-510/15-25"
-        if cycle == "1C":
-            contigs="A520-545/15-25"
-        if cycle == "1D":
-            contigs="A575-600/15-25"
-            
-    elif "2" in cycle:
-        target_sequence="GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV",
-        precomputed_pdb_path = "/home/ubuntu/cycle2_alphafold2_output.pdb" # 
-
-        if cycle == "2A":
-            contigs="A110-135/15-25"
-        if cycle == "2B":
-            contigs="A150-175/15-25"
-        if cycle == "2C":
-            contigs="A200-230/15-25"
-        if cycle == "2D":
-            contigs="A250-275/15-25"
-    else:
-        raise ValueError("Invalid cycle number.")
+# Target sequence, precomputed AlphaFold2 PDB and contigs come from the target registry (targets.json)
+registry = TargetRegistry.load()
+epitope = registry.epitope(cycle)
+target_sequence = epitope.target.sequence
+precomputed_pdb_path = epitope.target.pdb
+contigs = epitope.contigs()
 
 
 # Set up variables part 2
@@ -124,6 +116,7 @@ name = f"cycle{cycle}_{num_seq}seqs_{diffusion}diff_{temp}temp"
 outdir = f"{root}/{diffusion}diff_{temp}temp_{num_seq}numseq"
 os.makedirs(outdir, exist_ok=True)
 print(f"Output dir : {outdir}")
+configure_tracing(args.trace or f"{outdir}/trace_{name}.jsonl", args.metrics_port, args.otel)
 
 # check if this outdir exists
 if os.path.exists(outdir):
@@ -138,6 +131,64 @@ for file in os.listdir(outdir):
 if not os.path.exists(precomputed_pdb_path):
     raise FileNotFoundError(f"Precomputed PDB file {precomputed_pdb_path} does not exist.")
 
+# --hotspots: RFdiffusion steers the binder onto these residues; 'auto' picks them from the AlphaFold2 model
+hotspots, hotspot_selection = args.hotspots or [], None
+hotspot_config = hotspot_config_from_args(args)
+if hotspot_config is not None:
+    hotspots = []
+    if epitope.window:
+        hotspot_selection = load_hotspots(precomputed_pdb_path, epitope.window, hotspot_config)
+        hotspots = hotspot_selection.residues
+    else:
+        print(f"Epitope {epitope.name} has no window to pick hotspots in; designing without hotspots")
+
+# Optionally crop the target around the epitope: RFdiffusion gets fewer residues, renumbered from 1
+crop = registry.crop(epitope.name, args.crop_radius, hotspots) if args.crop_radius is not None else None
+if crop is not None:
+    contigs = crop.contigs(epitope.binder_length, chain_break=False)
+    with traced_open(f"{outdir}/2_{name}_crop_map.json") as map_file:
+        map_file.write(crop.residue_map.to_json())
+hotspot_res = crop.hotspots(hotspots) if crop is not None else list(hotspots)
+if hotspot_selection is not None:
+    with traced_open(f"{outdir}/2_{name}_hotspots.json") as json_file:
+        json.dump(dict(hotspot_selection.to_dict(), hotspot_res=hotspot_res), json_file, indent=4)
+
+# Completed stages of earlier runs with the same parameters are skipped; the file names do not carry
+# the crop and hotspots, so stages recorded with other ones are redone
+journal = RunJournal(f"{outdir}/run_journal.jsonl")
+design_settings = {"crop_radius": args.crop_radius, "hotspots": hotspots or None}
+
+# --num_designs / --seed: several backbones, each with a recorded seed and its own ID in the file names
+if args.num_designs is None and args.seed is None:
+    designs = [("", None)]  # one unseeded design under the original file names
+else:
+    recorded = journal.done("designs", name)
+    seeds = design_seeds(args.num_designs or 1, args.seed, recorded["seeds"] if recorded is not None else None)
+    designs = [(f"design{k + 1}_seed{seed}", seed) for k, seed in enumerate(seeds)]
+    journal.record("designs", name, seeds=seeds, ids=[design_id for design_id, _ in designs])
+    print(f"{len(designs)} designs with seeds {', '.join(map(str, seeds))}")
+
+def design_key(design_id: str) -> str:
+    return f"{name}/{design_id}" if design_id else name
+
+def design_prefix(design_id: str) -> str:
+    return f"{name}_{design_id}" if design_id else name
+
+def import_design_db():
+    """
+    --design_db: import the run's backbones and sequences (new ones only, so a finished run can be backfilled).
+    """
+    design_db = DesignDB(args.design_db, registry)
+    print(f"Design database {args.design_db}: {design_db.import_directory(outdir)['sequences']} new sequences")
+    design_db.close()
+
+pairs_path = f"{outdir}/3_{name}_proteinmpnn_pairs.json"
+if os.path.exists(pairs_path) and all(journal.done("sequences", design_key(design_id), **design_settings) is not None for design_id, _ in designs):
+    print(f"{name} already completed (see {journal.path}), nothing to do.")
+    if args.design_db:
+        import_design_db()
+    sys.exit(0)
+
 ##############################################################
 # SET UP 
 ##############################################################
@@ -153,87 +204,22 @@ HEADERS = {
     "Authorization": f"Bearer {NVIDIA_API_KEY}",
     "poll-seconds": "900"
 }
-NIM_HOST_URL_BASE = "http://localhost"
-
-# 3 different endpoints for the models
-class NIM_PORTS(Enum):
-    RFDIFFUSION_PORT = 8082
-    PROTEINMPNN_PORT = 8083
-    AF2_MULTIMER_PORT = 8084
-class NIM_ENDPOINTS(StrEnum):
-    RFDIFFUSION =  "biology/ipd/rfdiffusion/generate"
-    PROTEINMPNN =  "biology/ipd/proteinmpnn/predict"
-    AF2_MULTIMER = "protein-structure/alphafold2/multimer/predict-structure-from-sequences"
-
-def query_nim(
-            payload: Dict[str, Any],
-            nim_endpoint: str,
-            headers: Dict[str, str] = HEADERS,
-            base_url: str = "http://localhost",
-            nim_port: int = 8080,
-            echo: bool = False) -> Tuple[int, Dict]:
-    function_url = f"{base_url}:{nim_port}/{nim_endpoint}"
-    if echo:
-        print("*"*80)
-        print(f"\tURL: {function_url}")
-        print(f"\tPayload: {payload}")
-        print("*"*80)
-    response = requests.post(function_url,
-                            json=payload,
-                            headers=headers)
-    if response.status_code == 200:
-        return response.status_code, response.json()
-    else:
-        raise Exception(f"Error: response returned code [{response.status_code}], with text: {response.text}")
+nim_client = NimClient(
+    headers=HEADERS,
+    base_url=NIM_HOST_URL_BASE,
+    connect_timeout=args.connect_timeout,
+    read_timeout=args.read_timeout,
+    max_retries=args.max_retries,
+    cache=None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_gb * 1024**3)),
+    refresh=args.refresh
+)
 
-def check_nim_readiness(nim_port: NIM_PORTS,
-                        base_url: str = NIM_HOST_URL_BASE,
-                        endpoint: str = "v1/health/ready") -> bool:
-    """
-    Return true if a NIM is ready.
-    """
-    try:
-        response = requests.get(f"{base_url}:{nim_port}/{endpoint}")
-        d = response.json()
-        if "status" in d:
-            if d["status"] == "ready":
-                return True
-        return False
-    except Exception as e:
-        print(e)
-        return False
-    
-def get_reduced_pdb(pdb_id: str, rcsb_path: str = None) -> str:
-    pdb = Path(pdb_id)
-    if not pdb.exists() and rcsb_path is not None:
-        pdb.write_text(requests.get(rcsb_path).text)
-    lines = filter(lambda line: line.startswith("ATOM"), pdb.read_text().split("\n"))
-    return "\n".join(list(lines))
-
-class ExampleRequestParams:
-    def __init__(self,
-                target_sequence: str,
-                contigs: str, 
-                hotspot_res: List[str],
-                input_pdb_chains: List[str],
-                ca_only: bool,
-                use_soluble_model: bool,
-                sampling_temp: List[float],
-                diffusion_steps: int = 15,
-                num_seq_per_target: int = 20):
-        self.target_sequence = target_sequence
-        self.contigs = contigs
-        self.hotspot_res = hotspot_res
-        self.input_pdb_chains = input_pdb_chains
-        self.ca_only = ca_only
-        self.use_soluble_model = use_soluble_model
-        self.sampling_temp = sampling_temp
-        self.diffusion_steps = diffusion_steps
-        self.num_seq_per_target = num_seq_per_target
-status = check_nim_readiness(NIM_PORTS.RFDIFFUSION_PORT.value)
-print(f"RFDiffusion ready: {status}")
-status = check_nim_readiness(NIM_PORTS.PROTEINMPNN_PORT.value)
-print(f"ProteinMPNN ready: {status}")
+# Block until both NIMs are ready (a cold start loads the models for minutes) instead of racing them
+nim_client.wait_until_ready(
+    {"RFDiffusion": NIM_PORTS.RFDIFFUSION_PORT.value, "ProteinMPNN": NIM_PORTS.PROTEINMPNN_PORT.value},
+    timeout=args.ready_timeout,
+    warmup=warmup_queries(precomputed_pdb_path) if args.warmup else None
+)
 print()
 print(f"------------- Cycle {cycle} ------------------")
 
@@ -243,7 +229,7 @@ print(f"------------- Cycle {cycle} ------------------")
 cycle = ExampleRequestParams(
     target_sequence= target_sequence,
     contigs=contigs,  # Region A400-A600, peptides 15-25 residues long
-    hotspot_res=[], 
+    hotspot_res=hotspot_res,
     input_pdb_chains=["A"], # [Optional] default is to design for all chains in the protein
     ca_only=False, # [Optional]  CA-only model helps to address specific needs in protein design where focusing on the alpha carbon (CA)
     use_soluble_model=True, 
@@ -256,88 +242,111 @@ example=cycle
 ##############################################################
 # 2. RFdiffusion
 ##############################################################
-precomputed_pdb=get_reduced_pdb(precomputed_pdb_path, rcsb_path=None)
-
-print(f"Running RFdiffusion....")
-rfdiffusion_query = {
-    "input_pdb": precomputed_pdb,  # Now using the precomputed PDB structure
-    "contigs": example.contigs,
-    "diffusion_steps": example.diffusion_steps
-    # "hotspot_res": example.hotspot_res
-}
-rc, rfdiffusion_response = query_nim(
-    payload=rfdiffusion_query,
-    nim_endpoint=NIM_ENDPOINTS.RFDIFFUSION.value,
-    nim_port=NIM_PORTS.RFDIFFUSION_PORT.value
-)
-
-# save
-print(rfdiffusion_response["output_pdb"][0:160])
-with open(f"{outdir}/2_{name}_rfdiffusion.pdb", "w") as pdb_file:
-    pdb_file.write(rfdiffusion_response["output_pdb"])
-
-##############################################################
-# 3. ProteinMPNN
-##############################################################
-print()
-print(f"Running ProteinMPNN....")
-proteinmpnn_query = {
-    "input_pdb" : rfdiffusion_response["output_pdb"],
-    "input_pdb_chains" : example.input_pdb_chains,
-    "ca_only" : example.ca_only,
-    "use_soluble_model" : example.use_soluble_model,
-    "num_seq_per_target" : example.num_seq_per_target,
-    "sampling_temp" : example.sampling_temp
-}
-rc, proteinmpnn_response = query_nim(
-    payload=proteinmpnn_query,
-    nim_endpoint=NIM_ENDPOINTS.PROTEINMPNN.value,
-    nim_port=NIM_PORTS.PROTEINMPNN_PORT.value
-)
-
-# binder sequences are stored in fasta_sequences
-fasta_sequences = [x.strip() for x in proteinmpnn_response["mfasta"].split("\n") if '>' not in x][2:]
-binder_target_pairs = [[binder, example.target_sequence] for binder in fasta_sequences]
+precomputed_pdb=crop.pdb if crop is not None else get_reduced_pdb(precomputed_pdb_path, rcsb_path=None)
 
-print()
-print(fasta_sequences)
-print()
-print(proteinmpnn_response["mfasta"])
-print()
-print(proteinmpnn_response)
-print()
-
-# Save binder_target_pairs as .json file
-fasta_sequences = []
-lines = proteinmpnn_response["mfasta"].split("\n")
-for i in range(len(lines)):
-    if lines[i].startswith(">T="):  # Identify lines with binder headers
-        if i + 1 < len(lines):  # Ensure the next line exists
-            fasta_sequences.append(lines[i + 1].strip())  # Collect the sequence
-
-binder_target_pairs = [[binder, example.target_sequence] for binder in fasta_sequences]
-with open(f"{outdir}/3_{name}_proteinmpnn_pairs.json", "w") as json_file:
+def run_design(design_id: str, seed: Optional[int]) -> List[MpnnRecord]:
+    """
+    One RFdiffusion backbone and its own ProteinMPNN batch (either reused from the journal); returns the designed binders.
+    """
+    key, prefix = design_key(design_id), design_prefix(design_id)
+    tag = f"[{design_id}] " if design_id else ""
+    sequences = journal.done("sequences", key, **design_settings)
+    if sequences is None and journal.done("sequences", key) is not None:
+        print(f"{tag}Earlier designs used another --crop_radius / --hotspots, redoing them")
+    if sequences is not None:
+        print(f"{tag}Reusing ProteinMPNN sequences {sequences['file']} from an earlier run")
+        with open(sequences["file"]) as fasta_file:
+            return binder_records(fasta_file.read())
+
+    backbone = journal.done("backbone", key, **design_settings)
+    if backbone is not None:
+        print(f"{tag}Reusing RFdiffusion backbone {backbone['file']} from an earlier run")
+        with open(backbone["file"]) as pdb_file:
+            rfdiffusion_response = {"output_pdb": pdb_file.read()}
+    else:
+        print(f"{tag}Running RFdiffusion" + (f" with seed {seed}" if seed is not None else "") + "....")
+        rc, rfdiffusion_response = nim_client.query(
+            payload=rfdiffusion_payload(example, precomputed_pdb, seed),
+            nim_endpoint=NIM_ENDPOINTS.RFDIFFUSION.value,
+            nim_port=NIM_PORTS.RFDIFFUSION_PORT.value
+        )
+
+        # save
+        print(rfdiffusion_response["output_pdb"][0:160])
+        with traced_open(f"{outdir}/2_{prefix}_rfdiffusion.pdb") as pdb_file:
+            pdb_file.write(rfdiffusion_response["output_pdb"])
+        journal.record("backbone", key, file=f"{outdir}/2_{prefix}_rfdiffusion.pdb", seed=seed, **design_settings)
+
+    ##############################################################
+    # 3. ProteinMPNN
+    ##############################################################
+    print(f"{tag}Running ProteinMPNN....")
+    rc, proteinmpnn_response = nim_client.query(
+        payload=proteinmpnn_payload(example, rfdiffusion_response["output_pdb"]),
+        nim_endpoint=NIM_ENDPOINTS.PROTEINMPNN.value,
+        nim_port=NIM_PORTS.PROTEINMPNN_PORT.value
+    )
+
+    # Save proteinmpnn_response["mfasta"] to a .fasta file
+    with traced_open(f"{outdir}/3_{prefix}_proteinmpnn.fasta") as fasta_file:
+        fasta_file.write(proteinmpnn_response["mfasta"])
+
+    # Save scores and probs to files
+    # scores = proteinmpnn_response["scores"]
+    # with open(f"{outdir}/3_{name}_proteinmpnn_scores.txt", "w") as scores_file:
+    #     for i, score in enumerate(scores):
+    #         scores_file.write(f"Sequence {i+1}: Score = {score}\n")
+
+    # Save probs and scores as binary arrays (read back with mpnn_probs.ProbsReader)
+    save_probs(f"{outdir}/3_{prefix}_proteinmpnn", proteinmpnn_response["probs"], proteinmpnn_response.get("scores"))
+    binders = binder_records(proteinmpnn_response["mfasta"])
+    journal.record("sequences", key, file=f"{outdir}/3_{prefix}_proteinmpnn.fasta", n_sequences=len(binders), seed=seed, **design_settings)
+    return binders
+
+# Designs are submitted concurrently, by default one per RFdiffusion replica, or all at once to a single
+# NIM, which queues them; each backbone goes on to ProteinMPNN as soon as it is ready
+pool = nim_client.router.pool(NIM_PORTS.RFDIFFUSION_PORT.value)
+design_workers = args.design_workers or min(len(designs), len(pool.healthy()) if pool is not None else len(designs)) or 1
+with ThreadPoolExecutor(max_workers=design_workers) as executor:
+    design_binders = list(executor.map(lambda design: run_design(*design), designs))
+
+# Only designs that pass the pre-fold triage go into the pairs file for AF2-Multimer
+triage_config = config_from_args(args)
+binder_target_pairs, design_summary = [], []
+for (design_id, seed), binders in zip(designs, design_binders):
+    fasta_sequences = [record.sequence for record in binders]
+    print()
+    if design_id:
+        print(f"Design {design_id}:")
+    print_binders(binders)
+    print()
+    if triage_config is not None:
+        triage_result = triage(fasta_sequences, [record.score for record in binders], triage_config)
+        print(report(triage_result))
+        with traced_open(f"{outdir}/3_{design_prefix(design_id)}_triage.json") as json_file:
+            json.dump(triage_result.rows(fasta_sequences), json_file, indent=4)
+        fasta_sequences = [seq for seq, keep in zip(fasta_sequences, triage_result.keep) if keep]
+    binder_target_pairs += [[binder, epitope.target.name] for binder in fasta_sequences]  # resolve with registry.resolve_pair
+    design_summary.append({"id": design_id, "seed": seed, "n_binders": len(binders), "n_pairs": len(fasta_sequences),
+                           "rfdiffusion_pdb": f"{outdir}/2_{design_prefix(design_id)}_rfdiffusion.pdb",
+                           "proteinmpnn_fasta": f"{outdir}/3_{design_prefix(design_id)}_proteinmpnn.fasta"})
+
+# Save binder_target_pairs of all designs as .json file
+with traced_open(pairs_path) as json_file:
     json.dump(binder_target_pairs, json_file, indent=4)
 print(binder_target_pairs)
 print()
-
-# Save proteinmpnn_response["mfasta"] to a .fasta file
-with open(f"{outdir}/3_{name}_proteinmpnn.fasta", "w") as fasta_file:
-    fasta_file.write(proteinmpnn_response["mfasta"])
-
-# Save scores and probs to files
-# scores = proteinmpnn_response["scores"]
-# with open(f"{outdir}/3_{name}_proteinmpnn_scores.txt", "w") as scores_file:
-#     for i, score in enumerate(scores):
-#         scores_file.write(f"Sequence {i+1}: Score = {score}\n")
-
-probs = proteinmpnn_response["probs"]
-with open(f"{outdir}/3_{name}_proteinmpnn_probs.txt", "w") as probs_file:
-    for i, prob_matrix in enumerate(probs):
-        probs_file.write(f"Sequence {i+1}:\n")
-        for position_probs in prob_matrix:
-            probs_file.write(",".join(map(str, position_probs)) + "\n")
-        probs_file.write("\n")
+if designs[0][0]:
+    with traced_open(f"{outdir}/2_{name}_designs.json") as json_file:
+        json.dump(design_summary, json_file, indent=4)
+    print(f"{len(designs)} designs, {len(binder_target_pairs)} pairs: {outdir}/2_{name}_designs.json")
+journal.close()
+if args.design_db:
+    import_design_db()
+
+# Where the time went: NIM calls, retries and local I/O (full trace in the JSONL file)
+print(f"Time by span (trace: {get_tracer().trace_path}):")
+print(get_tracer().summary())
 
 ##############################################################
 # 4. AlphaFold2-Multimer
@@ -371,7 +380,7 @@ with open(f"{outdir}/3_{name}_proteinmpnn_probs.txt", "w") as probs_file:
 #         "selected_models" : [1]
 #     }
 #     print(f"Processing pair number {n_processed+1} of {len(binder_target_pairs)}")
-#     rc, multimer_response = query_nim(
+#     rc, multimer_response = nim_client.query(
 #         payload=multimer_query,
 #         nim_endpoint=NIM_ENDPOINTS.AF2_MULTIMER.value,
 #         nim_port=NIM_PORTS.AF2_MULTIMER_PORT.value
@@ -419,10 +428,9 @@ with open(f"{outdir}/3_{name}_proteinmpnn_probs.txt", "w") as probs_file:
 # print(f"Loading validation analyses...")
 # print()
 
-# multimer_path = f"4_multimer.json" # 3_cycle1A_5seqs_25diff_0.1temp_proteinmpnn_pairs.json
-# with open(multimer_path, "r") as json_file:
-#     multimer_results = json.load(json_file)
-# print(multimer_results[:2])  # Print the first 2 pairs for preview
+# # Index of 4_multimer_run.py's per-pair PDBs; each structure is read only when it is used (fold_results.py)
+# multimer_results = FoldResults("output1/4_multimer_index.json")
+# print([fold.file for fold in multimer_results][:2])  # Print the first 2 pairs for preview
 
 
 # # Function to calculate average pLDDT over all residues 
@@ -450,13 +458,13 @@ with open(f"{outdir}/3_{name}_proteinmpnn_probs.txt", "w") as probs_file:
 #     return average_pLDDT
 
 # # Run 
-# plddts = []
-# for idx in range(0, len(multimer_results)):
-#     if multimer_results[idx] is not None:
-#         plddts.append(calculate_average_pLDDT(multimer_results[idx][0]))
+# folds, plddts = [], []
+# for fold in multimer_results.folded():
+#     folds.append(fold)
+#     plddts.append(calculate_average_pLDDT(fold.pdb))
 
 # ## Combine the results with their pLDDTs
-# binder_target_results = list(zip(binder_target_pairs, multimer_results, plddts))
+# binder_target_results = list(zip([[fold.binder, fold.target] for fold in folds], folds, plddts))
 
 # ## Sort the results by plddt
 # sorted_binder_target_results = sorted(binder_target_results, key=lambda x : x[2])
@@ -485,7 +493,7 @@ with open(f"{outdir}/3_{name}_proteinmpnn_probs.txt", "w") as probs_file:
 #         results_file.write(f"Binder: {pair[0]}\n")
 #         results_file.write(f"Target: {pair[1]}\n")
 #         results_file.write(f"Average pLDDT: {plddt:.2f}\n")
-#         results_file.write(f"Raw Multimer Result: {result}\n")
+#         results_file.write(f"Multimer PDB: {result.file}\n")
 #         results_file.write("-" * 80 + "\n")
 #     results_file.write("\n\n")
 
@@ -11,10 +11,13 @@
 import argparse
 import json
 import os
-import requests
-from enum import StrEnum, Enum  # must be Python 3.11+
-from typing import Tuple, Dict, Any, List
-from pathlib import Path
+
+from nim_client import NimClient, NIM_HOST_URL_BASE, NIM_PORTS, NIM_ENDPOINTS
+from result_cache import ResultCache, DEFAULT_CACHE_DIR
+from design_params import ExampleRequestParams, get_reduced_pdb, binder_records, print_binders, warmup_queries
+from target_registry import TargetRegistry
+from tracing import configure_tracing, get_tracer, traced_open
+from triage import add_triage_arguments, config_from_args, triage, report
 
 # Load arguments
 parser = argparse.ArgumentParser(description="De Novo Protein Design Workflow")
@@ -22,6 +25,20 @@ parser.add_argument("--cycle", type=str, required=True, help="Cycle number (e.g.
 parser.add_argument("--num_seq", type=int, default=1, help="Number of sequences to generate per target")
 parser.add_argument("--diffusion", type=int, default=20, help="Number of diffusion steps (15-30 recommended)")
 parser.add_argument("--temp", type=float, default=0.2, help="Sampling temperature (range: 0-1)")
+parser.add_argument("--crop_radius", type=float, default=0.0, help="Also keep residues within this many Angstrom of the peptide window (0: exactly the peptide)")
+parser.add_argument("--connect_timeout", type=float, default=10.0, help="Seconds to wait for a NIM connection")
+parser.add_argument("--read_timeout", type=float, default=960.0, help="Seconds to wait for a NIM response")
+parser.add_argument("--max_retries", type=int, default=5, help="Retries on 429/503 or dropped connections, with exponential backoff")
+parser.add_argument("--no_cache", "--no-cache", action="store_true", help="Always call the NIMs; do not read or write the result cache")
+parser.add_argument("--refresh", action="store_true", help="Recompute every NIM call and overwrite its cached result")
+parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the on-disk NIM result cache")
+parser.add_argument("--cache_max_gb", type=float, default=20.0, help="Size bound of the result cache; least recently used entries are evicted")
+parser.add_argument("--ready_timeout", type=float, default=1200.0, help="Seconds to wait for the NIMs to report ready before giving up")
+parser.add_argument("--warmup", action="store_true", help="Send one tiny RFdiffusion and ProteinMPNN request once the NIMs are ready")
+parser.add_argument("--trace", type=str, default=None, help="JSONL trace of timing spans (default: <outdir>/trace_<name>.jsonl)")
+parser.add_argument("--metrics_port", type=int, default=None, help="Serve Prometheus metrics of the spans on this port")
+parser.add_argument("--otel", action="store_true", help="Also send spans to the OpenTelemetry tracer (needs opentelemetry-sdk)")
+add_triage_arguments(parser)
 args = parser.parse_args()
 
 # Assign input arguments to variables
@@ -40,35 +57,19 @@ root = "/home/ubuntu/nvidia-workbench"
 os.makedirs(root, exist_ok=True)
 print(f"Generating {num_seq} sequences per target for cycle {cycle}...")
 
-if num_seq > 0: # if num_seq > 1, then run code below
-    contigs="15-25"
-    precomputed_pdb_path = f"/home/ubuntu/pep{cycle}.pdb" 
-    if "1" in cycle:
-        if cycle == "1A": 
-            target_sequence="LKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYEL" # A91-130
-        if cycle == "1B":
-            target_sequence="EEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLG"  #A170-209
-        if cycle == "1C":
-            target_sequence="VAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKIN" # A255-294
-        if cycle == "1D":
-            target_sequence="PKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGL" # A318-357
-    elif "2" in cycle:
-        if cycle == "2A": 
-            target_sequence="CSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREI", # A390-429
-        if cycle == "2B":
-            target_sequence="GTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQT", # A459-498
-        if cycle == "2C":
-            target_sequence="LRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPS", # A531-570
-        if cycle == "2D":
-            target_sequence = "EQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPT" # A587-626
-    else:
-        raise ValueError("Invalid cycle number.")
+# Target sequence, precomputed AlphaFold2 PDB and contigs come from the target registry (targets.json)
+registry = TargetRegistry.load()
+epitope = registry.epitope(f"pep{cycle}")
+target_sequence = epitope.target.sequence
+# The peptide is cropped from its source structure (targets.json "source") instead of a hand-cropped pep PDB
+precomputed_pdb_path = registry.crop_source(epitope.name)[0].pdb
 
 # Set up variables part 2
 name = f"cycle{cycle}_{num_seq}seqs_{diffusion}diff_{temp}temp"
 outdir = f"{root}/{diffusion}diff_{temp}temp_{num_seq}seq"
 os.makedirs(outdir, exist_ok=True)
 print(f"Output dir : {outdir}")
+configure_tracing(args.trace or f"{outdir}/trace_{name}.jsonl", args.metrics_port, args.otel)
 
 # check if this outdir exists
 if os.path.exists(outdir):
@@ -82,6 +83,11 @@ for file in os.listdir(outdir):
 # Check if AlphaFold2 PDB exists
 if not os.path.exists(precomputed_pdb_path):
     raise FileNotFoundError(f"Precomputed PDB file {precomputed_pdb_path} does not exist.")
+crop = registry.crop(epitope.name, args.crop_radius)
+contigs = crop.contigs(epitope.binder_length, chain_break=True) if crop is not None else epitope.contigs()
+if crop is not None:
+    with traced_open(f"{outdir}/2_{name}_crop_map.json") as map_file:
+        map_file.write(crop.residue_map.to_json())
 
 ##############################################################
 # SET UP 
@@ -98,85 +104,22 @@ HEADERS = {
     "Authorization": f"Bearer {NVIDIA_API_KEY}",
     "poll-seconds": "900"
 }
-NIM_HOST_URL_BASE = "http://localhost"
-
-# 3 different endpoints for the models
-class NIM_PORTS(Enum):
-    RFDIFFUSION_PORT = 8082
-    PROTEINMPNN_PORT = 8083
-class NIM_ENDPOINTS(StrEnum):
-    RFDIFFUSION =  "biology/ipd/rfdiffusion/generate"
-    PROTEINMPNN =  "biology/ipd/proteinmpnn/predict"
-
-def query_nim(
-            payload: Dict[str, Any],
-            nim_endpoint: str,
-            headers: Dict[str, str] = HEADERS,
-            base_url: str = "http://localhost",
-            nim_port: int = 8080,
-            echo: bool = False) -> Tuple[int, Dict]:
-    function_url = f"{base_url}:{nim_port}/{nim_endpoint}"
-    if echo:
-        print("*"*80)
-        print(f"\tURL: {function_url}")
-        print(f"\tPayload: {payload}")
-        print("*"*80)
-    response = requests.post(function_url,
-                            json=payload,
-                            headers=headers)
-    if response.status_code == 200:
-        return response.status_code, response.json()
-    else:
-        raise Exception(f"Error: response returned code [{response.status_code}], with text: {response.text}")
-
-def check_nim_readiness(nim_port: NIM_PORTS,
-                        base_url: str = NIM_HOST_URL_BASE,
-                        endpoint: str = "v1/health/ready") -> bool:
-    """
-    Return true if a NIM is ready.
-    """
-    try:
-        response = requests.get(f"{base_url}:{nim_port}/{endpoint}")
-        d = response.json()
-        if "status" in d:
-            if d["status"] == "ready":
-                return True
-        return False
-    except Exception as e:
-        print(e)
-        return False
-    
-def get_reduced_pdb(pdb_id: str, rcsb_path: str = None) -> str:
-    pdb = Path(pdb_id)
-    if not pdb.exists() and rcsb_path is not None:
-        pdb.write_text(requests.get(rcsb_path).text)
-    lines = filter(lambda line: line.startswith("ATOM"), pdb.read_text().split("\n"))
-    return "\n".join(list(lines))
+nim_client = NimClient(
+    headers=HEADERS,
+    base_url=NIM_HOST_URL_BASE,
+    connect_timeout=args.connect_timeout,
+    read_timeout=args.read_timeout,
+    max_retries=args.max_retries,
+    cache=None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_gb * 1024**3)),
+    refresh=args.refresh
+)
 
-class ExampleRequestParams:
-    def __init__(self,
-                target_sequence: str,
-                contigs: str, 
-                hotspot_res: List[str],
-                input_pdb_chains: List[str],
-                ca_only: bool,
-                use_soluble_model: bool,
-                sampling_temp: List[float],
-                diffusion_steps: int = 15,
-                num_seq_per_target: int = 20):
-        self.target_sequence = target_sequence
-        self.contigs = contigs
-        self.hotspot_res = hotspot_res
-        self.input_pdb_chains = input_pdb_chains
-        self.ca_only = ca_only
-        self.use_soluble_model = use_soluble_model
-        self.sampling_temp = sampling_temp
-        self.diffusion_steps = diffusion_steps
-        self.num_seq_per_target = num_seq_per_target
-status = check_nim_readiness(NIM_PORTS.RFDIFFUSION_PORT.value)
-print(f"RFDiffusion ready: {status}")
-status = check_nim_readiness(NIM_PORTS.PROTEINMPNN_PORT.value)
-print(f"ProteinMPNN ready: {status}")
+# Block until both NIMs are ready (a cold start loads the models for minutes) instead of racing them
+nim_client.wait_until_ready(
+    {"RFDiffusion": NIM_PORTS.RFDIFFUSION_PORT.value, "ProteinMPNN": NIM_PORTS.PROTEINMPNN_PORT.value},
+    timeout=args.ready_timeout,
+    warmup=warmup_queries(precomputed_pdb_path) if args.warmup else None
+)
 print()
 print(f"------------- Cycle {cycle} ------------------")
 
@@ -199,7 +142,7 @@ example=cycle
 ##############################################################
 # 2. RFdiffusion
 ##############################################################
-precomputed_pdb=get_reduced_pdb(precomputed_pdb_path, rcsb_path=None)
+precomputed_pdb=crop.pdb if crop is not None else get_reduced_pdb(precomputed_pdb_path, rcsb_path=None)
 
 print(f"Running RFdiffusion....")
 rfdiffusion_query = {
@@ -207,14 +150,14 @@ rfdiffusion_query = {
     "contigs": example.contigs,
     "diffusion_steps": example.diffusion_steps
 }
-rc, rfdiffusion_response = query_nim(
+rc, rfdiffusion_response = nim_client.query(
     payload=rfdiffusion_query,
     nim_endpoint=NIM_ENDPOINTS.RFDIFFUSION.value,
     nim_port=NIM_PORTS.RFDIFFUSION_PORT.value
 )
 
 print(rfdiffusion_response["output_pdb"][0:160])
-with open(f"{outdir}/2_{name}_rfdiffusion.pdb", "w") as pdb_file:
+with traced_open(f"{outdir}/2_{name}_rfdiffusion.pdb") as pdb_file:
     pdb_file.write(rfdiffusion_response["output_pdb"])
 
 ##############################################################
@@ -230,41 +173,44 @@ proteinmpnn_query = {
     "num_seq_per_target" : example.num_seq_per_target,
     "sampling_temp" : example.sampling_temp
 }
-rc, proteinmpnn_response = query_nim(
+rc, proteinmpnn_response = nim_client.query(
     payload=proteinmpnn_query,
     nim_endpoint=NIM_ENDPOINTS.PROTEINMPNN.value,
     nim_port=NIM_PORTS.PROTEINMPNN_PORT.value
 )
 
 # binder sequences are stored in fasta_sequences
-fasta_sequences = [x.strip() for x in proteinmpnn_response["mfasta"].split("\n") if '>' not in x][2:]
+binders = binder_records(proteinmpnn_response["mfasta"])
+fasta_sequences = [record.sequence for record in binders]
 binder_target_pairs = [[binder, example.target_sequence] for binder in fasta_sequences]
 print()
-print(fasta_sequences)
-print()
-print(proteinmpnn_response["mfasta"])
-print()
-print(proteinmpnn_response)
+print_binders(binders)
 print()
 
-# Save binder_target_pairs as .json file
-fasta_sequences = []
-lines = proteinmpnn_response["mfasta"].split("\n")
-for i in range(len(lines)):
-    if lines[i].startswith(">T="):  # Identify lines with binder headers
-        if i + 1 < len(lines):  # Ensure the next line exists
-            fasta_sequences.append(lines[i + 1].strip())  # Collect the sequence
+# Only designs that pass the pre-fold triage go into the pairs file for AF2-Multimer
+triage_config = config_from_args(args)
+if triage_config is not None:
+    triage_result = triage(fasta_sequences, [record.score for record in binders], triage_config)
+    print(report(triage_result))
+    with traced_open(f"{outdir}/3_{name}_triage.json") as json_file:
+        json.dump(triage_result.rows(fasta_sequences), json_file, indent=4)
+    fasta_sequences = [seq for seq, keep in zip(fasta_sequences, triage_result.keep) if keep]
 
-binder_target_pairs = [[binder, example.target_sequence] for binder in fasta_sequences]
-with open(f"{outdir}/3_{name}_proteinmpnn_pairs.json", "w") as json_file:
+# Save binder_target_pairs as .json file
+binder_target_pairs = [[binder, epitope.target.name] for binder in fasta_sequences]  # resolve with registry.resolve_pair
+with traced_open(f"{outdir}/3_{name}_proteinmpnn_pairs.json") as json_file:
     json.dump(binder_target_pairs, json_file, indent=4)
 print(binder_target_pairs)
 print()
 
 # Save proteinmpnn_response["mfasta"] to a .fasta file
-with open(f"{outdir}/3_{name}_proteinmpnn.fasta", "w") as fasta_file:
+with traced_open(f"{outdir}/3_{name}_proteinmpnn.fasta") as fasta_file:
     fasta_file.write(proteinmpnn_response["mfasta"])
 
+# Where the time went: NIM calls, retries and local I/O (full trace in the JSONL file)
+print(f"Time by span (trace: {get_tracer().trace_path}):")
+print(get_tracer().summary())
+
 # probs = proteinmpnn_response["probs"]
 # with open(f"{outdir}/3_{name}_proteinmpnn_probs.txt", "w") as probs_file:
 #     for i, prob_matrix in enumerate(probs):
@@ -1,22 +1,38 @@
-import requests
+import argparse
 import json
 import os
+import queue
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+
+from fold_index import FoldIndex, DEFAULT_FOLD_INDEX, first_occurrences
+from msa_cache import MsaCache, DEFAULT_MSA_DIR, multimer_payload
+from nim_client import NimClient, NimError, NimHTTPError, NimTimeoutError
+from nim_async import NimPoller, NimJobTimeoutError
+from result_cache import ResultCache, DEFAULT_CACHE_DIR
+from run_journal import RunJournal, unit_key
+from design_db import DesignDB
+from fold_results import INDEX_NAME, write_index
+from target_registry import TargetRegistry, DEFAULT_REGISTRY
+from triage import TriageConfig, triage
+from tracing import configure_tracing, get_tracer, traced_open
 
 # Define the AlphaFold2-Multimer endpoint
 url = "http://localhost:8000/protein-structure/alphafold2/multimer/predict-structure-from-sequences"
 
-# Define binder-target pairs
+# Define binder-target pairs; targets are referenced by name in the target registry (targets.json)
 binder_target_pairs = [
-    ["KSAKEREARRREELRRESLE", "MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN"],  # Binder 1 and target
-    ["TDGQARRQEQQARQQAQEAG", "MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN"],      # Binder 2 and target
-    ["EETLRQIEQELAQQRQLREY", "MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN"],    # Binder 3 and target
-    ["PLQAAQEQEQIATQIAQQQA", "MDPPRPALLALLALPALLLLLLAGARAEEEMLENVSLVCPKDATRFKHLRKYTYNYEAESSSGVPGTADSRSATRINCKVELEVPQLCSFILKTSQCTLKEVYGFNPEGKALLKKTKNSEEFAAAMSRYELKLAIPEGKQVFLYPEKDEPTYILNIKRGIISALLVPPETEEAKQVLFLDTVYGNCSTHFTVKTRKGNVATEISTERDLGQCDRFKPIRTGISPLALIKGMTRPLSTLISSSQSCQYTLDAKRKHVAEAICKEQHLFLPFSYKNKYGMVAQVTQTLKLEDTPKINSRFFGEGTKKMGLAFESTKSTSPPKQAEAVLKTLQELKKLTISEQNIQRANLFNKLVTELRGLSDEAVTSLLPQLIEVSSPITLQALVQCGQPQCSTHILQWLKRVHANPLLIDVVTYLVALIPEPSAQQLREIFNMARDQRSRATLYALSHAVNNYHKTNPTGTQELLDIANYLMEQIQDDCTGDEDYTYLILRVIGNMGQTMEQLTPELKSSILKCVQSTKPSLMIQKAAIQALRKMEPKDKDQEVLLQTFLDDASPGDKRLAAYLMLMRSPSQADINKIVQILPWEQNEQVKNFVASHIANILNSEELDIQDLKKLVKEALKESQLPTVMDFRKFSRNYQLYKSVSLPSLDPASAKIEGNLIFDPNNYLPKESMLKTTLTAFGFASADLIEIGLEGKGFEPTLEALFGKQGFFPDSVNKALYWVNGQVPDGVSKVLVDHFGYTKDDKHEQDMVNGIMLSVEKLIKDLKSKEVPEARAYLRILGEELGFASLHDLQLLGKLLLMGARTLQGIPQMIGEVIRKGSKNDFFLHYIFMENAFELPTGAGLQLQISSSGVIAPGAKAGVKLEVANMQAELVAKPSVSVEFVTNMGIIIPDFARSGVQMNTNFFHESGLEAHVALKAGKLKFIIPSPKRPVKLLSGGNTLHLVSTTKTEVIPPLIENRQSWSVCKQVFPGLNYCTSGAYSNASSTDSASYYPLTGDTRLELELRPTGEIEQYSVSATYELQREDRALVDTLKFVTQAEGAKQTEATMTFKYNRQSMTLSSEVQIPDFDVDLGTILRVNDESTEGKTSYRLTLDIQNKKITEVALMGHLSCDTKEERKIKGVISIPRLQAEARSEILAHWSPAKLLLQMDSSATAYGSTVSKRVAWHYDEEKIEFEWNTGTNVDTKKMTSNFPVDLSDYPKSLHMYANRLLDHRVPQTDMTFRHVGSKLIVAMSSWLQKASGSLPYTQTLQDHLNSLKEFNLQNMGLPDFHIPENLFLKSDGRVKYTLNKN"]    # Binder 3 and target
+    ["KSAKEREARRREELRRESLE", "cycle1"],  # Binder 1 and target
+    ["TDGQARRQEQQARQQAQEAG", "cycle1"],      # Binder 2 and target
+    ["EETLRQIEQELAQQRQLREY", "cycle1"],    # Binder 3 and target
+    ["PLQAAQEQEQIATQIAQQQA", "cycle1"]    # Binder 3 and target
 ]
 binder_target_pairs = [
-    ["TPADRLRAERQARQAAQRAQQS", "GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV"],  # Binder 1 and target
-    ["TQQEKEAAAQSKLEQEQKQAQS", "GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV"],      # Binder 2 and target
-    ["SEADRQAAARAQQQQQLTQQLA", "GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV"],    # Binder 3 and target
-    ["TERDKQAEREQQQRKQQLKEQK", "GKIDFLNNYALFLSPSAQQASWQVSARFNQYKYNQNFSAGNNENIMEAHVGINGEANLDFLNIPLTIPEMRLPYTIITTPPLKDFSLWEKTGLKEFLKTTKQSFDLSVKAQYKKNKHRHSITNPLAVLCEFISQSIKSFDRHFEKNRNNALDFVTKSYNETKIKFDKYKAEKSHDELPRTFQIPGYTVPVVNVEVSPFTIEMSAFGYVFPKAVSMPSFSILGSDVRVPSYTLILPSLELPVLHVPRNLKLSLPDFKELCTISHIFIPAMGNITYDFSFKSSVITLNTNAELFNQSDIVAHLLSSSSSVIDALQYKLEGTTRLTRKRGLKLATALSLSNKFVEGSHNSTVSLTTKNMEVSVATTTKAQIPILRMNFKQELNGNTKSKPTVSSSMEFKYDFNSSMLYSTAKGAVDHKLSLESLTSYFSIESSTKGDVKGSVLSREYSGTIASEANTYLNSKSTRSSVKLQGTSKIDDIWNLEVKENFAGEATLQRIYSLWEHSTKNHLQLEGLFFTNGEHTSKATLELSPWQMSALVQVHASQPSSFHDFPDLGQEVALNANTKNQKIRWKNEVRIHSGSFQSQVELSNDQEKAHLDIAGSLEGHLRFLKNIILPVYDKSLWDFLKLDVTTSIGRRQHLRVSTAFVYTKNPNGYSFSIPVKVLADKFIIPGLKLNDLNSVLVMPTFHVPFTDLQVPSCKLDFREIQIYKKLRTSSFALNLPTLPEVKFPEVDVLTKYSQPEDSLIPFFEITVPESQLTVSQFTLPKSVSDGIAALDLNAVANKIADFELPTIIVPEQTIEIPSIKFSVPAGIVIPSFQALTARFEVDSPVYNATWSASLKNKADYVETVLDSTCSSTVQFLEYELNVLGTHKIEDGTLASKTKGTFAHRDFSAEYEEDGKYEGLQEWEGKAHLNIKSPAFTDLHLRYQKDKKGISTSAASPAVGTVGMDMDEDDDFSKWNFYYSPQSSPDKKLTIFKTELRVRESDEETQIKVNWEEEAASGLLTSLKDNVPKATGVLYDYVNKYHWEHTGLTLREVSSKLRRNLQNNAEWVYQGAIRQIDDIDVRFQKAASGTTGTYQEWKDKAQNLYQELLTQEGQASFQGLKDNVFDGLVRVTQEFHMKVKHLIDSLIDFLNFPRFQFPGKPGIYTREELCTMFIREVGTVLSQVYSKVHNGSEILFSYFQDLVITLPFELRKHKLIDV"]    # Binder 4 and target
+    ["TPADRLRAERQARQAAQRAQQS", "cycle2"],  # Binder 1 and target
+    ["TQQEKEAAAQSKLEQEQKQAQS", "cycle2"],      # Binder 2 and target
+    ["SEADRQAAARAQQQQQLTQQLA", "cycle2"],    # Binder 3 and target
+    ["TERDKQAEREQQQRKQQLKEQK", "cycle2"]    # Binder 4 and target
 ]
 # Headers for the API request
 headers = {
@@ -24,56 +40,248 @@ headers = {
     "Accept": "application/json"
 }
 
+# Multimer replicas to fan out over, given as "URL" or "URL=N" where N is the
+# number of requests kept in flight on that replica (default --max_in_flight)
+parser = argparse.ArgumentParser(description="AlphaFold2-Multimer fan-out over binder-target pairs")
+parser.add_argument("--endpoints", nargs="+", default=[url], help="Multimer endpoint URLs, optionally suffixed with =N in-flight requests")
+parser.add_argument("--max_in_flight", type=int, default=2, help="Requests kept in flight per endpoint when no =N is given")
+parser.add_argument("--output_dir", type=str, default="output1", help="Directory for structure_pair_{idx}.pdb files")
+parser.add_argument("--read_timeout", type=float, default=960.0, help="Seconds to wait for one fold")
+parser.add_argument("--max_retries", type=int, default=5, help="Retries on 429/503 or dropped connections, with exponential backoff")
+parser.add_argument("--no_cache", "--no-cache", action="store_true", help="Always call the NIMs; do not read or write the result cache")
+parser.add_argument("--refresh", action="store_true", help="Recompute every NIM call and overwrite its cached result")
+parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the on-disk NIM result cache")
+parser.add_argument("--cache_max_gb", type=float, default=20.0, help="Size bound of the result cache; least recently used entries are evicted")
+parser.add_argument("--pairs", type=str, default=None, help="JSON list of [binder, target] pairs (e.g. a 3_{name}_proteinmpnn_pairs.json); default: the pairs above")
+parser.add_argument("--registry", type=str, default=DEFAULT_REGISTRY, help="Target registry used to resolve target names in pairs")
+parser.add_argument("--async_poll", action="store_true", help="Submit every fold and poll its request ID from one event loop instead of holding a connection per fold")
+parser.add_argument("--poll_seconds", type=int, default=5, help="With --async_poll: how long the NIM may hold one submit/status call")
+parser.add_argument("--job_timeout", type=float, default=7200.0, help="With --async_poll: give up polling a fold after this many seconds (rerun to collect it)")
+parser.add_argument("--trace", type=str, default=None, help="JSONL trace of timing spans (default: <output_dir>/4_multimer_trace.jsonl)")
+parser.add_argument("--metrics_port", type=int, default=None, help="Serve Prometheus metrics of the spans on this port")
+parser.add_argument("--journal", type=str, default=None, help="Run journal of finished folds (default: <output_dir>/4_multimer_journal.jsonl); a restarted run skips them")
+parser.add_argument("--fold_index", type=str, default=DEFAULT_FOLD_INDEX, help="Cross-run index of folded pairs; identical pairs reuse the indexed PDB")
+parser.add_argument("--no_dedup", action="store_true", help="Fold every pair, even identical ones")
+parser.add_argument("--reuse_msa", action="store_true", help="Search each target's MSA once (MSA search NIM) and send it with every pair, so only binders are searched")
+parser.add_argument("--msa_dir", type=str, default=DEFAULT_MSA_DIR, help="With --reuse_msa: directory of cached target MSAs")
+parser.add_argument("--msa_url", type=str, default=None, help="With --reuse_msa: MSA search endpoint (default: NIM_MSA_SEARCH_URLS or localhost:8085)")
+parser.add_argument("--design_db", type=str, default=None, help="Score the folds into this SQLite design database (design_db.py)")
+parser.add_argument("--triage", action="store_true", help="Skip binders that fail the composition / low-complexity checks of triage.py")
+args = parser.parse_args()
+
+if args.pairs:
+    with open(args.pairs) as json_file:
+        binder_target_pairs = json.load(json_file)
+registry = TargetRegistry.load(args.registry)
+binder_target_sequences = [registry.resolve_pair(pair) for pair in binder_target_pairs]
+
+endpoint_limits = []
+for spec in args.endpoints:
+    endpoint, _, limit = spec.partition("=")
+    endpoint_limits.append((endpoint, int(limit) if limit else args.max_in_flight))
+
+# Pooled keep-alive sessions shared by all workers
+nim_client = NimClient(headers=headers, read_timeout=args.read_timeout, max_retries=args.max_retries,
+                       pool_maxsize=max(limit for _, limit in endpoint_limits),
+                       cache=None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_gb * 1024**3)),
+                       refresh=args.refresh)
+# Each target's MSA is searched once and reused by all of its pairs
+msa_cache = MsaCache(nim_client, args.msa_dir, msa_url=args.msa_url) if args.reuse_msa else None
+
 # Create output directory for PDB files
-output_dir = "output1"
+output_dir = args.output_dir
 os.makedirs(output_dir, exist_ok=True)
+configure_tracing(args.trace or os.path.join(output_dir, "4_multimer_trace.jsonl"), args.metrics_port)
+
+# Variables for tracking results; PDBs stay on disk (structure_pair_{idx}.pdb), never in memory
+multimer_response_codes = [0 for _ in binder_target_pairs]  # Stores response codes (e.g., 200 for success)
 
-# Variables for tracking results
-multimer_results = []  # Stores PDB strings
-multimer_response_codes = []  # Stores response codes (e.g., 200 for success)
+def pdb_path(idx: int) -> str:
+    return os.path.join(output_dir, f"structure_pair_{idx + 1}.pdb")
 
-# Iterate over binder-target pairs
+# Folds finished by an earlier (interrupted) run are read back instead of being recomputed
+journal = RunJournal(args.journal or os.path.join(output_dir, "4_multimer_journal.jsonl"))
+pending, resumed = [], {}
 for idx, binder_target_pair in enumerate(binder_target_pairs):
-    print(f"Processing pair {idx + 1} of {len(binder_target_pairs)}: {binder_target_pair}")
-    
-    # Prepare the API payload
-    data = {
-        "sequences": binder_target_pair,
-        "databases": ["uniref90", "mgnify", "small_bfd"]
-    }
-    
-    # Make the POST request
-    response = requests.post(url, headers=headers, data=json.dumps(data))
-    
-    # Check the response
-    if response.ok:
-        print(f"Request succeeded for pair {idx + 1}")
-        multimer_response_codes.append(response.status_code)
-        
-        # Save the PDB result to a file
-        pdb_string = response.text
-        pdb_filename = os.path.join(output_dir, f"structure_pair_{idx + 1}.pdb")
-        with open(pdb_filename, "w") as pdb_file:
-            pdb_file.write(pdb_string)
-        
-        # Append the result to multimer_results
-        multimer_results.append(pdb_string)
+    entry = journal.done("fold", unit_key(*binder_target_sequences[idx]))
+    if entry is None:
+        pending.append(idx)
+        continue
+    resumed[idx] = entry["file"]
+    multimer_response_codes[idx] = 200
+if len(pending) < len(binder_target_pairs):
+    print(f"Resuming: {len(binder_target_pairs) - len(pending)} pairs already folded, {len(pending)} to go")
+
+# A resumed pair whose position changed (another --pairs order) gets its PDB copied to its new
+# structure_pair_{idx}.pdb. All copies are staged first, since pairs may have swapped files, and
+# before anything is folded into a file that still holds an earlier pair.
+moved = {idx: file for idx, file in resumed.items() if os.path.abspath(file) != os.path.abspath(pdb_path(idx))}
+for idx, file in moved.items():
+    shutil.copyfile(file, f"{pdb_path(idx)}.resume")
+for idx in moved:
+    os.replace(f"{pdb_path(idx)}.resume", pdb_path(idx))
+    journal.record("fold", unit_key(*binder_target_sequences[idx]), pair=idx + 1, file=pdb_path(idx))
+if moved:
+    print(f"Moved {len(moved)} resumed folds to their new pair numbers")
+
+# Binders that are mostly one residue type or low complexity are not worth a fold
+if args.triage:
+    triage_result = triage([binder_target_sequences[idx][0] for idx in pending], config=TriageConfig())
+    for idx, reason in zip(list(pending), triage_result.reasons):
+        if reason:
+            print(f"Pair {idx + 1} dropped by triage: {reason}")
+            pending.remove(idx)
+
+# Identical pairs (the same binder from another temperature, seed or run) are folded only once
+fold_index = None if args.no_dedup else FoldIndex(args.fold_index)
+if fold_index is not None:
+    for idx in moved:
+        fold_index.add(*binder_target_sequences[idx], pdb_path(idx))
+copies = {}
+if fold_index is not None:
+    unique, copies = first_occurrences([binder_target_sequences[idx] for idx in pending])
+    copies = {pending[n]: pending[first] for n, first in copies.items()}
+    pending = [pending[n] for n in unique]
+
+# One slot per in-flight request; a worker takes a slot to pick its replica and
+# hands it back when the response is in, so each replica never exceeds its limit
+endpoint_slots = queue.Queue()
+for endpoint, limit in endpoint_limits:
+    for _ in range(limit):
+        endpoint_slots.put(endpoint)
+
+def save_fold(idx: int, binder_target_pair: List[str], source: str):
+    """
+    Journal a fold whose PDB has been written to pdb_path(idx).
+    """
+    pdb_filename = pdb_path(idx)
+    journal.record("fold", unit_key(*binder_target_pair), pair=idx + 1, file=pdb_filename)
+    multimer_response_codes[idx] = 200
+    print(f"Pair {idx + 1} from {source}, saved {pdb_filename}")
+
+def failed_fold(idx: int, error: Exception):
+    """
+    Record why a pair was not folded: the NIM's HTTP status, 504 for a timeout (or a job still running)
+    and 503 for a NIM that could not be reached, so no attempted pair is left at 0.
+    """
+    if isinstance(error, NimJobTimeoutError):
+        print(f"Pair {idx + 1} still running as job {error.request_id}; rerun to collect it")
+    elif isinstance(error, NimHTTPError):
+        print(f"Request failed for pair {idx + 1}: {error.status_code}, {error.text}")
     else:
-        print(f"Request failed for pair {idx + 1}: {response.status_code}, {response.text}")
-        multimer_response_codes.append(response.status_code)
-        multimer_results.append(None)
+        print(f"Request error for pair {idx + 1}: {error}")
+    if isinstance(error, NimHTTPError):
+        multimer_response_codes[idx] = error.status_code
+    else:
+        multimer_response_codes[idx] = 504 if isinstance(error, NimTimeoutError) else 503
+
+def new_fold(idx: int, binder_target_pair: List[str], endpoint: str):
+    save_fold(idx, binder_target_pair, endpoint)
+    if fold_index is not None:
+        fold_index.add(*binder_target_pair, pdb_path(idx))
+
+def reuse_fold(idx: int, binder_target_pair: List[str], pdb_filename: str):
+    if os.path.abspath(pdb_filename) != os.path.abspath(pdb_path(idx)):
+        shutil.copyfile(pdb_filename, pdb_path(idx))
+    save_fold(idx, binder_target_pair, pdb_filename)
+
+# Pairs folded by any earlier run are copied from the fold index
+for idx in list(pending):
+    indexed = fold_index.lookup(*binder_target_sequences[idx]) if fold_index is not None else None
+    if indexed is not None:
+        reuse_fold(idx, binder_target_sequences[idx], indexed)
+        pending.remove(idx)
+if fold_index is not None:
+    print(f"{len(pending)} distinct pairs to fold, {len(binder_target_pairs) - len(pending)} already folded or duplicates")
+
+def fold_pair(idx: int, binder_target_pair: List[str]) -> Tuple[int, int]:
+    """
+    Fold one binder-target pair on the next free replica, streaming its PDB to disk as it arrives.
+    Returns (idx, 200) or (idx, the status failed_fold recorded).
+    """
+    endpoint = endpoint_slots.get()
+    try:
+        send = lambda payload: nim_client.post_json_to_file(endpoint, payload, pdb_path(idx))
+        msa_cache.fold(binder_target_pair, send) if msa_cache is not None else send(multimer_payload(binder_target_pair))
+    except NimError as e:
+        failed_fold(idx, e)
+        return idx, multimer_response_codes[idx]
+    finally:
+        endpoint_slots.put(endpoint)
+    new_fold(idx, binder_target_pair, endpoint)
+    return idx, 200
+
+if args.async_poll:
+    # Every fold is submitted at once and tracked by request ID; no connection stays open while AF2 runs
+    endpoints = [endpoint for endpoint, _ in endpoint_limits]
+    payload = msa_cache.payload if msa_cache is not None else multimer_payload
+    print(f"Submitting {len(pending)} pairs over {len(endpoints)} endpoint(s), polling every {args.poll_seconds}s")
+    poller = NimPoller(nim_client, poll_seconds=args.poll_seconds, job_timeout=args.job_timeout, journal=journal)
+
+    def poll(batch: List[Tuple[int, str, Dict[str, Any]]], resent: bool) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """
+        Run (idx, endpoint, payload) jobs; returns the ones to resend without precomputed alignments
+        (as MsaCache.fold would), unless they already are such resends.
+        """
+        rejected = []
+
+        def save_result(n: int, result):
+            # each PDB is written as soon as its job is done, then dropped
+            idx, endpoint, job_payload = batch[n]
+            if isinstance(result, Exception) and not resent and msa_cache is not None and msa_cache.rejected(job_payload, result):
+                rejected.append((idx, endpoint, msa_cache.plain_payload(binder_target_sequences[idx])))
+            elif isinstance(result, Exception):
+                failed_fold(idx, result)
+            else:
+                with traced_open(pdb_path(idx), "wb") as pdb_file:
+                    pdb_file.write(result)
+                new_fold(idx, binder_target_sequences[idx], endpoint)
+                if resent:
+                    msa_cache.accepted_without()
+
+        poller.run([(endpoint, job_payload) for _, endpoint, job_payload in batch], on_result=save_result)
+        return rejected
+
+    rejected = poll([(idx, endpoints[n % len(endpoints)], payload(binder_target_sequences[idx])) for n, idx in enumerate(pending)], resent=False)
+    if rejected:
+        print(f"Resubmitting {len(rejected)} pairs the multimer NIM rejected with precomputed alignments, without them")
+        poll(rejected, resent=True)
+else:
+    # Submit every pair; the pool never holds more requests than there are replica slots
+    n_workers = sum(limit for _, limit in endpoint_limits)
+    print(f"Folding {len(pending)} pairs over {len(endpoint_limits)} endpoint(s), {n_workers} in flight")
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(fold_pair, idx, binder_target_sequences[idx]) for idx in pending]
+        for n_done, future in enumerate(as_completed(futures), start=1):
+            idx, status_code = future.result()
+            multimer_response_codes[idx] = status_code
+            print(f"Finished {n_done} of {len(pending)} pairs")
+
+# Later copies of a pair get the PDB of its first copy
+for idx, first in copies.items():
+    if multimer_response_codes[first] == 200:
+        reuse_fold(idx, binder_target_sequences[idx], pdb_path(first))
 
 # Print summary
 print(f"\nProcessed {len(binder_target_pairs)} binder-target pairs.")
 print(f"Response codes: {multimer_response_codes}")
+if msa_cache is not None:
+    print(f"Target MSAs: {msa_cache.searches} searched, {msa_cache.hits} reused from {msa_cache.directory}")
 
-# Save the results to a JSON file for later use
-results_file = os.path.join(output_dir, "4_multimer.json")
-with open(results_file, "w") as json_file:
-    json.dump({
-        "binder_target_pairs": binder_target_pairs,
-        "multimer_results": multimer_results,
-        "response_codes": multimer_response_codes
-    }, json_file)
+# Index of the per-pair PDB files for later use (read back lazily with fold_results.FoldResults)
+results_file = os.path.join(output_dir, INDEX_NAME)
+write_index(results_file, [
+    {"pair": idx + 1, "binder": pair[0], "target": pair[1], "status": code, "file": pdb_path(idx) if code == 200 else None}
+    for idx, (pair, code) in enumerate(zip(binder_target_pairs, multimer_response_codes))
+])
 
-print(f"Results saved to {results_file}")
\ No newline at end of file
+journal.close()
+if fold_index is not None:
+    fold_index.close()
+print(f"Results saved to {results_file}")
+if args.design_db:
+    design_db = DesignDB(args.design_db)
+    print(f"Design database {args.design_db}: {design_db.import_directory(output_dir)['folds']} new folds")
+    design_db.close()
+print(f"Time by span (trace: {get_tracer().trace_path}):")
+print(get_tracer().summary())
@@ -0,0 +1,104 @@
+# End-to-end throughput benchmark of the pipeline scripts against the mock NIM server (mock_nim.py)
+# Starts the mock in-process, points a script at it (NIM_*_URLS replicas / --endpoints), runs the script
+# as a child process and reports wall time, requests/sec, p50/p99 latency per stage and the child's peak RSS.
+# Targets get synthetic PDBs in a scratch directory, so no GPUs, NIMs or NGC key are needed.
+#
+# python benchmark.py sweep --latency rfdiffusion=0.5 proteinmpnn=0.2 multimer=1.0 -- --cycles 1A 1B 2A --num_seq 4 --multimer_workers 4
+# python benchmark.py multimer --error_rate multimer=0.05 -- --max_in_flight 8 --async_poll
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from mock_nim import add_mock_arguments, config_from_args, fake_pdb, serve
+from nim_client import NIM_ENDPOINTS
+from target_registry import DEFAULT_REGISTRY
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = {"sweep": "sweep.py", "multimer": "4_multimer_run.py"}
+
+def mock_registry(workdir: str, registry_path: str = DEFAULT_REGISTRY) -> str:
+    """
+    Copy of the target registry whose target PDBs are synthetic files under workdir.
+    """
+    with open(registry_path) as f:
+        registry = json.load(f)
+    rng = random.Random(0)
+    for name, target in registry["targets"].items():
+        pdb_path = os.path.join(workdir, f"{name}.pdb")
+        with open(pdb_path, "w") as pdb_file:
+            pdb_file.write(fake_pdb([(target.get("chain", "A"), target["sequence"])], rng))
+        target["pdb"] = pdb_path
+    path = os.path.join(workdir, "targets.json")
+    with open(path, "w") as f:
+        json.dump(registry, f, indent=2)
+    return path
+
+def script_command(scenario: str, workdir: str, registry: str, origin: str, script_args: List[str]) -> List[str]:
+    command = [sys.executable, os.path.join(SRC_DIR, SCRIPTS[scenario]), "--registry", registry, "--no_cache"]
+    if scenario == "sweep":
+        command += ["--root", os.path.join(workdir, "out"), "--manifest", os.path.join(workdir, "manifest.json")]
+    else:
+        command += ["--endpoints", f"{origin}/{NIM_ENDPOINTS.AF2_MULTIMER.value}", "--output_dir", os.path.join(workdir, "out")]
+    if "--reuse_msa" in script_args:
+        command += ["--msa_dir", os.path.join(workdir, "msa")]
+    return command + script_args
+
+def run(command: List[str], env: Dict[str, str], quiet: bool) -> Dict[str, float]:
+    """
+    Run command to completion; returns its exit code, wall seconds and peak RSS (MB) from wait4.
+    """
+    start = time.monotonic()
+    child = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL if quiet else None)
+    _, status, usage = os.wait4(child.pid, 0)
+    child.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return {"exit_code": child.returncode, "wall_s": time.monotonic() - start, "peak_rss_mb": peak_rss_mb}
+
+def report(scenario: str, result: Dict, stats: Dict[str, Dict]) -> Dict:
+    n_requests = sum(s["requests"] for s in stats.values())
+    summary = dict(scenario=scenario, **result, requests=n_requests, requests_per_s=n_requests / result["wall_s"], stages=stats)
+    print("-"*80)
+    print(f"{scenario}: exit code {result['exit_code']}, {result['wall_s']:.2f}s wall, peak RSS {result['peak_rss_mb']:.1f} MB")
+    print(f"{n_requests} requests, {summary['requests_per_s']:.2f} req/s")
+    print(f"{'stage':<14}{'requests':>10}{'errors':>8}{'p50 s':>10}{'p99 s':>10}{'MB served':>12}")
+    for model, s in stats.items():
+        print(f"{model:<14}{s['requests']:>10}{s['errors']:>8}{s['p50_s']:>10.3f}{s['p99_s']:>10.3f}{s['bytes'] / 1e6:>12.2f}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline scripts against the mock NIM server",
+                                     epilog="Arguments after -- are passed to the script")
+    parser.add_argument("scenario", choices=sorted(SCRIPTS), help="sweep: sweep.py (RFdiffusion, ProteinMPNN, optionally AF2); multimer: 4_multimer_run.py")
+    parser.add_argument("--workdir", type=str, default=None, help="Scratch directory for target PDBs and outputs (default: a new temp dir)")
+    parser.add_argument("--out", type=str, default=None, help="Also write the summary as JSON here")
+    parser.add_argument("--quiet", action="store_true", help="Hide the script's own output")
+    add_mock_arguments(parser)
+    argv = sys.argv[1:]
+    script_args = argv[argv.index("--") + 1:] if "--" in argv else []
+    args = parser.parse_args(argv[:argv.index("--")] if "--" in argv else argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="nim_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+    mock, servers = serve(config_from_args(args), [0])
+    origin = f"http://127.0.0.1:{servers[0].server_port}"
+    env = dict(os.environ, NGC_CLI_API_KEY=os.environ.get("NGC_CLI_API_KEY", "mock"), PYTHONUNBUFFERED="1",
+               NIM_RFDIFFUSION_URLS=origin, NIM_PROTEINMPNN_URLS=origin, NIM_AF2_MULTIMER_URLS=origin, NIM_MSA_SEARCH_URLS=origin)
+    command = script_command(args.scenario, workdir, mock_registry(workdir), origin, script_args)
+    print(f"Mock NIMs on {origin}, outputs in {workdir}")
+    print(" ".join(command))
+
+    summary = report(args.scenario, run(command, env, args.quiet), mock.stats())
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
+    for server in servers:
+        server.shutdown()
+    sys.exit(summary["exit_code"])
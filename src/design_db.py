@@ -0,0 +1,271 @@
+# Persistent design database (SQLite) of runs, parameters, backbones, sequences and folds
+# The output directories hold one run's files each, named differently by each script, and a rerun
+# with the same parameters overwrites them. The database keeps every import instead: a backbone
+# file whose content changed becomes a new backbone row next to the old one (and its sequences),
+# so earlier designs stay queryable after their files are gone.
+#   runs       one per (output directory, run name), with the epitope (cycle) and target
+#   params     num_seq / diffusion / temp parsed from the run name, one row per parameter
+#   backbones  one per RFdiffusion design (design ID, seed, PDB file and its sha256)
+#   sequences  ProteinMPNN designs with their MPNN scores (score, global_score, seq_recovery) and triage verdict
+#   folds      AF2-Multimer PDBs with the scoring.py metrics, linked to their sequence by binder
+# Indexed on epitope, target, MPNN score, interface pLDDT and binder sequence.
+#
+# python design_db.py import /home/ubuntu/nvidia-workbench          (walks every directory below)
+# python design_db.py top --cycle 2C --n 50                         (best MPNN score across all temperatures)
+# python design_db.py top --cycle 2C --by interface_plddt
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from mfasta import designed_records
+from run_journal import file_sha256
+from scoring import score_file
+from target_registry import TargetRegistry, DEFAULT_REGISTRY
+
+DEFAULT_DESIGN_DB = "/home/ubuntu/nvidia-workbench/designs.sqlite"
+
+# 3_cycle2C_4seqs_25diff_0.2temp[_design3_seed42]_proteinmpnn.fasta (2_, sweep.py and 3_ all write this name)
+FASTA_NAME = re.compile(r"3_(?P<name>cycle(?P<cycle>[^_]+)_(?P<num_seq>\d+)seqs_(?P<diffusion>\d+)diff_(?P<temp>[-+.\deE]+)temp)"
+                        r"(?:_(?P<design>design\d+_seed(?P<seed>\d+)))?_proteinmpnn\.fasta$")
+FOLD_PATTERN = "*structure_pair_*.pdb"  # 4_multimer_run.py and sweep.py folds
+FOLD_METRICS = ["mean_plddt", "binder_plddt", "target_plddt", "interface_plddt", "n_contacts", "n_interface_residues",
+                "min_interface_ca_dist", "mean_interface_ca_dist"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    outdir TEXT NOT NULL,
+    epitope TEXT,
+    target TEXT,
+    imported REAL,
+    UNIQUE (outdir, name)
+);
+CREATE TABLE IF NOT EXISTS params (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    value,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS backbones (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    design_id TEXT NOT NULL DEFAULT '',
+    seed INTEGER,
+    file TEXT,
+    sha256 TEXT NOT NULL,
+    UNIQUE (run_id, design_id, sha256)
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    id INTEGER PRIMARY KEY,
+    backbone_id INTEGER NOT NULL REFERENCES backbones(id),
+    sample INTEGER,
+    sequence TEXT NOT NULL,
+    temperature REAL,
+    score REAL,
+    global_score REAL,
+    seq_recovery REAL,
+    triage TEXT,
+    UNIQUE (backbone_id, sample, sequence)
+);
+CREATE TABLE IF NOT EXISTS folds (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    mtime REAL,
+    binder TEXT NOT NULL,
+    sequence_id INTEGER REFERENCES sequences(id),
+    {", ".join(f"{m} REAL" for m in FOLD_METRICS)}
+);
+CREATE INDEX IF NOT EXISTS runs_epitope ON runs(epitope);
+CREATE INDEX IF NOT EXISTS runs_target ON runs(target);
+CREATE INDEX IF NOT EXISTS backbones_run ON backbones(run_id);
+CREATE INDEX IF NOT EXISTS sequences_backbone ON sequences(backbone_id);
+CREATE INDEX IF NOT EXISTS sequences_score ON sequences(score);
+CREATE INDEX IF NOT EXISTS sequences_sequence ON sequences(sequence);
+CREATE INDEX IF NOT EXISTS folds_sequence ON folds(sequence_id);
+CREATE INDEX IF NOT EXISTS folds_binder ON folds(binder);
+CREATE INDEX IF NOT EXISTS folds_interface_plddt ON folds(interface_plddt);
+"""
+
+class DesignDB:
+    def __init__(self, path: str = DEFAULT_DESIGN_DB, registry: Optional[TargetRegistry] = None):
+        self.path = path
+        self.registry = registry
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")  # readers (queries, notebooks) do not block an import
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def target_of(self, epitope: str) -> Optional[str]:
+        if self.registry is None or epitope not in self.registry.epitopes:
+            return None
+        return self.registry.epitopes[epitope].target.name
+
+    def add_run(self, outdir: str, name: str, epitope: Optional[str], params: Dict[str, Any]) -> int:
+        outdir = os.path.abspath(outdir)
+        self.db.execute("INSERT INTO runs (name, outdir, epitope, target, imported) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (outdir, name) DO UPDATE SET imported = excluded.imported",
+                        (name, outdir, epitope, self.target_of(epitope), time.time()))
+        run_id = self.db.execute("SELECT id FROM runs WHERE outdir = ? AND name = ?", (outdir, name)).fetchone()[0]
+        self.db.executemany("INSERT OR REPLACE INTO params (run_id, name, value) VALUES (?, ?, ?)",
+                            [(run_id, k, v) for k, v in params.items()])
+        return run_id
+
+    def add_backbone(self, run_id: int, design_id: str, seed: Optional[int], file: Optional[str], sha256: str) -> int:
+        self.db.execute("INSERT OR IGNORE INTO backbones (run_id, design_id, seed, file, sha256) VALUES (?, ?, ?, ?, ?)",
+                        (run_id, design_id, seed, file and os.path.abspath(file), sha256))
+        return self.db.execute("SELECT id FROM backbones WHERE run_id = ? AND design_id = ? AND sha256 = ?",
+                               (run_id, design_id, sha256)).fetchone()[0]
+
+    def import_fasta(self, fasta_path: str) -> int:
+        """
+        Import one ProteinMPNN fasta with its run, parameters, backbone and triage verdicts; returns the sequences added.
+        """
+        match = FASTA_NAME.search(os.path.basename(fasta_path))
+        if match is None:
+            return 0
+        outdir, name, design_id = os.path.dirname(fasta_path), match["name"], match["design"] or ""
+        prefix = f"{name}_{design_id}" if design_id else name
+        params = {"num_seq": int(match["num_seq"]), "diffusion": int(match["diffusion"]), "temp": float(match["temp"])}
+        pdb_path = os.path.join(outdir, f"2_{prefix}_rfdiffusion.pdb")
+        has_pdb = os.path.exists(pdb_path)
+        with open(fasta_path) as fasta_file:
+            records = designed_records(fasta_file)
+        triage_path = os.path.join(outdir, f"3_{prefix}_triage.json")
+        verdicts = {}
+        if os.path.exists(triage_path):
+            with open(triage_path) as f:
+                verdicts = {row["sequence"]: "kept" if row["keep"] else row["reason"] for row in json.load(f)}
+        with self._lock, self.db:
+            run_id = self.add_run(outdir, name, match["cycle"], params)
+            # a backbone without its PDB is identified by the sequences designed on it
+            backbone_id = self.add_backbone(run_id, design_id, int(match["seed"]) if match["seed"] else None,
+                                            pdb_path if has_pdb else None, file_sha256(pdb_path if has_pdb else fasta_path))
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO sequences (backbone_id, sample, sequence, temperature, score, global_score, seq_recovery, triage) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(backbone_id, r.sample, r.sequence, r.temperature, r.score, r.global_score, r.seq_recovery, verdicts.get(r.sequence))
+                 for r in records])
+            return self.db.total_changes - before
+
+    def import_folds(self, paths: List[str], workers: Optional[int] = None) -> int:
+        """
+        Score and import fold PDBs that are new or changed since their last import; returns the folds imported.
+        """
+        with self._lock:
+            known = dict(self.db.execute("SELECT file, mtime FROM folds").fetchall())
+        paths = [os.path.abspath(p) for p in paths]
+        paths = [p for p in paths if known.get(p) != os.path.getmtime(p)]
+        if not paths:
+            return 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(score_file, paths, chunksize=max(1, len(paths) // ((workers or os.cpu_count()) * 4))))
+        rows = []
+        for r in results:
+            if "error" in r:
+                print(f"Skipping {r['file']}: {r['error']}")
+                continue
+            rows.append((r["file"], os.path.getmtime(r["file"]), r["binder_sequence"], *(r[m] for m in FOLD_METRICS)))
+        columns = ", ".join(FOLD_METRICS)
+        with self._lock, self.db:
+            self.db.executemany(f"INSERT OR REPLACE INTO folds (file, mtime, binder, {columns}) VALUES (?, ?, ?, {', '.join('?' * len(FOLD_METRICS))})", rows)
+        return len(rows)
+
+    def link_folds(self):
+        """
+        Point each fold at the latest imported sequence of its binder.
+        """
+        with self._lock, self.db:
+            self.db.execute("UPDATE folds SET sequence_id = (SELECT MAX(id) FROM sequences WHERE sequence = folds.binder)")
+
+    def import_directory(self, directory: str, workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Import every ProteinMPNN fasta and fold PDB under directory (recursively); files imported before are skipped.
+        """
+        n_sequences, fold_paths = 0, []
+        for dirpath, _, _ in os.walk(directory):
+            for fasta_path in sorted(glob.glob(os.path.join(dirpath, "3_*_proteinmpnn.fasta"))):
+                n_sequences += self.import_fasta(fasta_path)
+            fold_paths += sorted(glob.glob(os.path.join(dirpath, FOLD_PATTERN)))
+        n_folds = self.import_folds(fold_paths, workers)
+        self.link_folds()
+        return {"sequences": n_sequences, "folds": n_folds}
+
+    def top_binders(self, epitope: Optional[str] = None, target: Optional[str] = None, n: int = 50, by: str = "score") -> List[Dict[str, Any]]:
+        """
+        Best distinct binders of an epitope (cycle) or target across all runs: lowest MPNN score, or with
+        by="interface_plddt" the highest interface pLDDT among folded ones.
+        """
+        best = {"score": "MIN(s.score)", "interface_plddt": "MAX(f.interface_plddt)"}[by]
+        order = {"score": "best ASC", "interface_plddt": "best DESC"}[by]
+        query = f"""
+            SELECT {best} AS best, s.sequence, s.score, s.temperature, s.seq_recovery, s.triage, r.epitope, r.target,
+                   r.name AS run, b.design_id, b.seed, f.interface_plddt, f.mean_plddt, f.n_contacts, f.file AS fold
+            FROM sequences s
+            JOIN backbones b ON b.id = s.backbone_id
+            JOIN runs r ON r.id = b.run_id
+            LEFT JOIN folds f ON f.sequence_id = s.id
+            WHERE (:epitope IS NULL OR r.epitope = :epitope) AND (:target IS NULL OR r.target = :target)
+              {"AND f.id IS NOT NULL" if by == "interface_plddt" else "AND s.score IS NOT NULL"}
+            GROUP BY s.sequence
+            ORDER BY {order}
+            LIMIT :n"""
+        with self._lock:
+            rows = self.db.execute(query, {"epitope": epitope, "target": target, "n": n}).fetchall()
+        return [{k: row[k] for k in row.keys() if k != "best"} for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ["runs", "backbones", "sequences", "folds"]}
+
+def print_top(rows: List[Dict[str, Any]]):
+    print(f"{'#':>3}  {'score':>7}  {'T':>5}  {'iPLDDT':>6}  {'cycle':>5}  {'run':<36}  sequence")
+    for i, r in enumerate(rows, start=1):
+        iplddt = f"{r['interface_plddt']:6.2f}" if r["interface_plddt"] is not None else f"{'-':>6}"
+        score = f"{r['score']:7.4f}" if r["score"] is not None else f"{'-':>7}"
+        print(f"{i:>3}  {score}  {r['temperature'] or 0:>5}  {iplddt}  {r['epitope'] or '-':>5}  {r['run']:<36}  {r['sequence']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import design outputs into the SQLite design database and query it")
+    parser.add_argument("--db", type=str, default=DEFAULT_DESIGN_DB, help="Database file")
+    parser.add_argument("--registry", type=str, default=DEFAULT_REGISTRY, help="Target registry, for the target of each cycle")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Import output directories (recursively)")
+    import_parser.add_argument("directories", nargs="+", help="Output directories, e.g. /home/ubuntu/nvidia-workbench")
+    import_parser.add_argument("--workers", type=int, default=None, help="Fold scoring processes (default: all cores)")
+    top_parser = commands.add_parser("top", help="Print the best binders")
+    top_parser.add_argument("--cycle", type=str, default=None, help="Epitope / cycle (e.g. 2C)")
+    top_parser.add_argument("--target", type=str, default=None, help="Target name (e.g. cycle2)")
+    top_parser.add_argument("--n", type=int, default=50, help="Number of binders")
+    top_parser.add_argument("--by", choices=["score", "interface_plddt"], default="score", help="Rank by MPNN score or by interface pLDDT of the fold")
+    top_parser.add_argument("--json", action="store_true", help="Print JSON rows instead of a table")
+    args = parser.parse_args()
+
+    design_db = DesignDB(args.db, TargetRegistry.load(args.registry) if os.path.exists(args.registry) else None)
+    if args.command == "import":
+        for directory in args.directories:
+            added = design_db.import_directory(directory, args.workers)
+            print(f"Imported {directory}: {added['sequences']} new sequences, {added['folds']} new or changed folds")
+        print(f"{args.db}: " + ", ".join(f"{v} {k}" for k, v in design_db.counts().items()))
+    else:
+        rows = design_db.top_binders(args.cycle, args.target, args.n, args.by)
+        if args.json:
+            print(json.dumps(rows, indent=4))
+        else:
+            print_top(rows)
+    design_db.close()
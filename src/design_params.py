@@ -0,0 +1,165 @@
+# Request parameters and payload builders shared by the design scripts and the sweep driver
+
+import random
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from epitope_crop import EpitopeCrop, crop_epitope
+from hotspots import HotspotConfig, HotspotResult, hotspot_report, select_hotspots
+from mfasta import MpnnRecord, designed_records, iter_mfasta
+from nim_client import NIM_ENDPOINTS
+from pdb_structure import Structure
+from tracing import span
+
+def get_reduced_pdb(pdb_id: str, rcsb_path: str = None) -> str:
+    pdb = Path(pdb_id)
+    if not pdb.exists() and rcsb_path is not None:
+        pdb.write_text(requests.get(rcsb_path).text)
+    with span("local.reduce_pdb", file=str(pdb)) as s:
+        reduced = Structure.from_pdb_text(pdb.read_text()).atoms_only().to_pdb()
+        s.set(bytes=len(reduced))
+        return reduced
+
+@lru_cache(maxsize=None)
+def load_reduced_pdb(pdb_path: str) -> str:
+    """
+    get_reduced_pdb, read once per process (the sweep driver reuses the same target PDB for many jobs).
+    """
+    return get_reduced_pdb(pdb_path, rcsb_path=None)
+
+@lru_cache(maxsize=None)
+def load_epitope_crop(pdb_path: str, window: str, radius: float, hotspots: Tuple[str, ...] = ()) -> EpitopeCrop:
+    """
+    crop_epitope of a target PDB, computed once per process for each window, radius and hotspot set.
+    """
+    structure = Structure.from_pdb_text(load_reduced_pdb(pdb_path))
+    with span("local.crop_epitope", file=pdb_path, window=window, radius=radius) as s:
+        crop = crop_epitope(structure, window, radius, hotspots)
+        s.set(residues=crop.n_residues(), bytes=len(crop.pdb))
+    print(f"Cropped {pdb_path} to {crop.n_residues()} residues within {radius:g} A of {window}")
+    return crop
+
+@lru_cache(maxsize=None)
+def load_hotspots(pdb_path: str, window: str, config: HotspotConfig) -> HotspotResult:
+    """
+    select_hotspots on a target PDB, computed (and reported) once per process for each window and config.
+    """
+    structure = Structure.from_pdb_text(load_reduced_pdb(pdb_path))
+    with span("local.select_hotspots", file=pdb_path, window=window) as s:
+        result = select_hotspots(structure, window, config)
+        s.set(hotspots=len(result.residues))
+    print(hotspot_report(result))
+    return result
+
+class ExampleRequestParams:
+    def __init__(self,
+                target_sequence: str,
+                contigs: str,
+                hotspot_res: List[str],
+                input_pdb_chains: List[str],
+                ca_only: bool,
+                use_soluble_model: bool,
+                sampling_temp: List[float],
+                diffusion_steps: int = 15,
+                num_seq_per_target: int = 20):
+        self.target_sequence = target_sequence
+        self.contigs = contigs
+        self.hotspot_res = hotspot_res
+        self.input_pdb_chains = input_pdb_chains
+        self.ca_only = ca_only
+        self.use_soluble_model = use_soluble_model
+        self.sampling_temp = sampling_temp
+        self.diffusion_steps = diffusion_steps
+        self.num_seq_per_target = num_seq_per_target
+
+def rfdiffusion_payload(example: ExampleRequestParams, input_pdb: str, seed: Optional[int] = None) -> Dict[str, Any]:
+    payload = {
+        "input_pdb": input_pdb,
+        "contigs": example.contigs,
+        "diffusion_steps": example.diffusion_steps
+    }
+    if example.hotspot_res:
+        payload["hotspot_res"] = example.hotspot_res  # in the numbering of input_pdb (the crop's, when cropped)
+    if seed is not None:
+        payload["random_seed"] = seed  # unset, the NIM picks its own and the design cannot be reproduced
+    return payload
+
+def design_seeds(num_designs: int, base_seed: Optional[int] = None, recorded: Optional[List[int]] = None) -> List[int]:
+    """
+    RFdiffusion seeds of num_designs designs: base_seed, base_seed + 1, ... when given, else the seeds an
+    earlier run recorded (so its finished designs are reused) followed by new random ones.
+    """
+    if base_seed is not None:
+        return [base_seed + k for k in range(num_designs)]
+    seeds = list(recorded or [])[:num_designs]
+    rng = random.SystemRandom()
+    while len(seeds) < num_designs:
+        seed = rng.randrange(2**31)
+        if seed not in seeds:
+            seeds.append(seed)
+    return seeds
+
+def proteinmpnn_payload(example: ExampleRequestParams, rfdiffusion_pdb: str) -> Dict[str, Any]:
+    return {
+        "input_pdb" : rfdiffusion_pdb,
+        "input_pdb_chains" : example.input_pdb_chains,
+        "ca_only" : example.ca_only,
+        "use_soluble_model" : example.use_soluble_model,
+        "num_seq_per_target" : example.num_seq_per_target,
+        "sampling_temp" : example.sampling_temp
+    }
+
+def merge_proteinmpnn(responses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One ProteinMPNN response from batches of the same backbone: the input record once, then every batch's
+    designs with samples renumbered in order, and their probs and scores concatenated.
+    """
+    if len(responses) == 1:
+        return responses[0]
+    lines, sample = [], 0
+    for i, response in enumerate(responses):
+        for record in iter_mfasta(response["mfasta"]):
+            if not record.is_design:
+                if i == 0:
+                    lines += [record.header, record.sequence]
+                continue
+            sample += 1
+            lines += [re.sub(r"sample=\d+", f"sample={sample}", record.header), record.sequence]
+    merged = {"mfasta": "\n".join(lines) + "\n", "probs": [p for r in responses for p in r["probs"]]}
+    if all("scores" in r for r in responses):
+        merged["scores"] = [score for r in responses for score in r["scores"]]
+    return merged
+
+def binder_records(mfasta: str) -> List[MpnnRecord]:
+    """
+    The designed binders (">T=" records) of a ProteinMPNN mfasta, with their header scores.
+    """
+    with span("local.parse_fasta", bytes=len(mfasta)):
+        return designed_records(mfasta)
+
+def binder_sequences(mfasta: str) -> List[str]:
+    return [record.sequence for record in binder_records(mfasta)]
+
+def print_binders(records: List[MpnnRecord]):
+    print(f"{'#':>3}  {'T':>5}  {'score':>7}  {'recovery':>8}  sequence")
+    for i, r in enumerate(records, start=1):
+        print(f"{i:>3}  {r.temperature or 0:>5}  {r.score or 0:>7.4f}  {r.seq_recovery or 0:>8.4f}  {r.sequence}")
+
+def warmup_queries(pdb_path: str, n_residues: int = 10) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """
+    One tiny RFdiffusion and ProteinMPNN request on the first residues of the target, for NimClient.wait_until_ready.
+    """
+    structure = Structure.from_pdb_text(load_reduced_pdb(pdb_path))
+    chain = structure.chain_ids()[0]
+    first = int(structure.chains(chain).res_num[0])
+    last = first + n_residues - 1
+    crop = structure.residue_range(first, last, chain).to_pdb()
+    return {
+        "RFDiffusion": (NIM_ENDPOINTS.RFDIFFUSION.value, {"input_pdb": crop, "contigs": f"{chain}{first}-{last}/0 5", "diffusion_steps": 1}),
+        "ProteinMPNN": (NIM_ENDPOINTS.PROTEINMPNN.value, {"input_pdb": crop, "input_pdb_chains": [chain], "ca_only": False,
+                                                          "use_soluble_model": True, "num_seq_per_target": 1, "sampling_temp": [0.1]}),
+    }
@@ -0,0 +1,206 @@
+# Coordinate-aware cropping of a target structure around its epitope, to shrink RFdiffusion inputs
+#   - each residue is represented by its CB (CA for glycine); a uniform grid over those points
+#     (cells of the crop radius) finds every residue within the radius of the window or hotspot residues
+#     by looking at 27 neighbouring cells instead of measuring all residue pairs
+#   - segments shorter than min_segment are widened and gaps of up to max_gap residues between
+#     segments are filled, so the crop is not shredded into one- or two-residue fragments
+#   - kept residues are renumbered 1..N per chain; a ResidueMap converts original residue IDs
+#     (contig windows, hotspots) to the new numbering and back
+#
+#   crop = crop_epitope(Structure.from_pdb_text(pdb_text), "A480-510", radius=10.0)
+#   crop.pdb                            # renumbered PDB text for the RFdiffusion payload
+#   crop.contigs("15-25", True)         # "A1-9/0 A10-40/0 A41-52/0 15-25"
+#   crop.residue_map.original("A12")    # "A482"
+
+import json
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from pdb_structure import Structure
+
+WINDOW_PATTERN = re.compile(r"^([A-Za-z])(-?\d+)-(-?\d+)$")
+RESIDUE_PATTERN = re.compile(r"^([A-Za-z])(-?\d+)$")
+
+def parse_window(window: str) -> Tuple[str, int, int]:
+    """
+    "A480-510" -> ("A", 480, 510)
+    """
+    m = WINDOW_PATTERN.match(window.strip())
+    if m is None:
+        raise ValueError(f"Invalid epitope window {window!r}, expected e.g. 'A480-510'")
+    chain, start, end = m.group(1), int(m.group(2)), int(m.group(3))
+    return chain, min(start, end), max(start, end)
+
+def parse_residue(residue: str) -> Tuple[str, int]:
+    """
+    "A485" -> ("A", 485)
+    """
+    m = RESIDUE_PATTERN.match(residue.strip())
+    if m is None:
+        raise ValueError(f"Invalid residue {residue!r}, expected e.g. 'A485'")
+    return m.group(1), int(m.group(2))
+
+class GridIndex:
+    """
+    Uniform grid over 3D points for radius queries (cell size = the query radius).
+    """
+    def __init__(self, points: np.ndarray, cell: float):
+        if cell <= 0:
+            raise ValueError("Grid cell size must be positive")
+        self.points = points
+        self.cell = cell
+        keys = np.floor(points / cell).astype(np.int64)
+        self.cells: Dict[Tuple[int, int, int], np.ndarray] = {}
+        order = np.lexsort(keys.T[::-1])
+        unique, first = np.unique(keys[order], axis=0, return_index=True)
+        for key, members in zip(unique, np.split(order, first[1:])):
+            self.cells[tuple(int(k) for k in key)] = members
+
+    def within(self, queries: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Boolean mask over the indexed points: true where a point lies within radius of any query point.
+        """
+        mask = np.zeros(len(self.points), dtype=bool)
+        reach = int(np.ceil(radius / self.cell))
+        offsets = [(dx, dy, dz) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1) for dz in range(-reach, reach + 1)]
+        for query in queries:
+            x, y, z = (int(k) for k in np.floor(query / self.cell))
+            candidates = [self.cells[c] for c in ((x + dx, y + dy, z + dz) for dx, dy, dz in offsets) if c in self.cells]
+            if not candidates:
+                continue
+            candidates = np.concatenate(candidates)
+            near = ((self.points[candidates] - query) ** 2).sum(axis=1) <= radius ** 2
+            mask[candidates[near]] = True
+        return mask
+
+class ResidueMap:
+    """
+    Original (chain, residue number) <-> renumbered residue number of a crop.
+    """
+    def __init__(self, pairs: List[Tuple[str, int, int]]):
+        self.pairs = pairs  # (chain, original number, new number), in crop order
+        self._new = {(c, old): new for c, old, new in pairs}
+        self._original = {(c, new): old for c, old, new in pairs}
+
+    def new(self, residue: str) -> str:
+        chain, num = parse_residue(residue)
+        if (chain, num) not in self._new:
+            raise KeyError(f"Residue {residue} is not in the crop")
+        return f"{chain}{self._new[(chain, num)]}"
+
+    def original(self, residue: str) -> str:
+        chain, num = parse_residue(residue)
+        if (chain, num) not in self._original:
+            raise KeyError(f"Residue {residue} is not in the crop")
+        return f"{chain}{self._original[(chain, num)]}"
+
+    def window(self, window: str) -> str:
+        """
+        An original window ("A480-510") in the new numbering; every residue of it must be in the crop.
+        """
+        chain, start, end = parse_window(window)
+        return f"{chain}{self._new[(chain, start)]}-{self._new[(chain, end)]}"
+
+    def to_json(self) -> str:
+        return json.dumps([{"chain": c, "original": old, "new": new} for c, old, new in self.pairs])
+
+class EpitopeCrop:
+    def __init__(self, structure: Structure, residue_map: ResidueMap, segments: List[Tuple[str, int, int]], window: str):
+        self.structure = structure  # renumbered
+        self.residue_map = residue_map
+        self.segments = segments  # (chain, first, last) in the new numbering
+        self.window = window  # the original window
+
+    @property
+    def pdb(self) -> str:
+        return self.structure.to_pdb()
+
+    def n_residues(self) -> int:
+        return len(self.residue_map.pairs)
+
+    def contigs(self, binder_length: str, chain_break: bool = False) -> str:
+        """
+        RFdiffusion contig string keeping every cropped segment, e.g. "A1-9/0 A10-40/0 15-25".
+        Segments that were not contiguous in the original structure are separated by chain breaks.
+        """
+        target = "/0 ".join(f"{chain}{first}-{last}" for chain, first, last in self.segments)
+        return f"{target}/0 {binder_length}" if chain_break else f"{target}/{binder_length}"
+
+    def hotspots(self, residues: Sequence[str]) -> List[str]:
+        """
+        Hotspot residues ("A485") in the new numbering.
+        """
+        return [self.residue_map.new(r) for r in residues]
+
+def representative_points(structure: Structure) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Chain, residue number and CB coordinates (CA for glycine or a missing CB) of every residue.
+    """
+    atoms = structure.atoms_only()
+    ca = atoms.select(atoms.atom_name == "CA")
+    cb = atoms.select(atoms.atom_name == "CB")
+    xyz = ca.xyz.copy()
+    cb_index = {(c, n): i for i, (c, n) in enumerate(zip(cb.chain, cb.res_num))}
+    for i, key in enumerate(zip(ca.chain, ca.res_num)):
+        j = cb_index.get(key)
+        if j is not None:
+            xyz[i] = cb.xyz[j]
+    return ca.chain, ca.res_num, xyz
+
+def crop_epitope(structure: Structure,
+                 window: str,
+                 radius: float = 10.0,
+                 hotspots: Sequence[str] = (),
+                 max_gap: int = 3,
+                 min_segment: int = 5) -> EpitopeCrop:
+    """
+    Keep the window, the hotspot residues and every residue within radius (Angstrom) of them, then renumber.
+    Segments shorter than min_segment residues are widened along the chain, and gaps of up to max_gap
+    residues are filled. With radius 0 the crop is exactly the window (plus hotspots).
+    """
+    chain_id, start, end = parse_window(window)
+    chains, res_nums, xyz = representative_points(structure)
+    seeds = (chains == chain_id) & (res_nums >= start) & (res_nums <= end)
+    if seeds.sum() < end - start + 1:
+        raise ValueError(f"Window {window} is not fully resolved in the structure")
+    for residue in hotspots:
+        c, n = parse_residue(residue)
+        seeds |= (chains == c) & (res_nums == n)
+
+    keep = seeds.copy()
+    if radius > 0:
+        keep |= GridIndex(xyz, radius).within(xyz[seeds], radius)
+
+    # widen isolated short segments, so no residue is kept without its backbone neighbours
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.astype(np.int8), [0]])))
+    for first, stop in zip(edges[::2], edges[1::2]):
+        pad = (min_segment - (stop - first) + 1) // 2
+        if pad > 0:
+            same_chain = chains == chains[first]
+            lo, hi = max(first - pad, 0), min(stop + pad, len(keep))
+            keep[lo:hi] |= same_chain[lo:hi]
+
+    # fill short gaps between kept residues of the same chain
+    for i in np.flatnonzero(keep[:-1] & ~keep[1:]):
+        j = i + 1 + np.argmax(keep[i + 1:]) if keep[i + 1:].any() else None
+        if j is not None and chains[j] == chains[i] and j - i - 1 <= max_gap and res_nums[j] - res_nums[i] - 1 <= max_gap:
+            keep[i + 1:j] = True
+
+    pairs, segments = [], []
+    last_new: Dict[str, int] = {}
+    for c, old in zip(chains[keep], res_nums[keep]):
+        c, old = str(c), int(old)
+        new = last_new.get(c, 0) + 1
+        last_new[c] = new
+        if segments and segments[-1][0] == c and pairs[-1][1] == old - 1:
+            segments[-1] = (c, segments[-1][1], new)
+        else:
+            segments.append((c, new, new))
+        pairs.append((c, old, new))
+    numbering = {(c, old): new for c, old, new in pairs}
+
+    atoms = structure.atoms_only()
+    kept = atoms.select(np.array([(c, int(n)) in numbering for c, n in zip(atoms.chain, atoms.res_num)], dtype=bool))
+    return EpitopeCrop(kept.renumbered(numbering), ResidueMap(pairs), segments, window)
@@ -0,0 +1,79 @@
+# Cross-run dedup index of AF2-Multimer folds, keyed by the binder and target sequences
+# At low sampling temperatures ProteinMPNN repeats itself, and the same binder comes back from other
+# temperatures, seeds and runs. Each distinct (binder, target) pair is folded once: later copies reuse
+# the PDB of the first fold, and a copy that turns up while its twin is still folding waits for it
+# instead of sending a second request.
+#
+# The index is an append-only RunJournal shared by all runs (default ~/.cache/nim_results/fold_index.jsonl):
+# {"kind": "fold", "key": unit_key(binder, target), "file": ".../structure_pair_3.pdb", ...}
+# An entry whose PDB has been deleted no longer counts, so the pair is folded again.
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from result_cache import DEFAULT_CACHE_DIR
+from run_journal import RunJournal, unit_key
+
+DEFAULT_FOLD_INDEX = os.path.join(DEFAULT_CACHE_DIR, "fold_index.jsonl")
+
+class FoldIndex:
+    def __init__(self, path: str = DEFAULT_FOLD_INDEX):
+        self.journal = RunJournal(path)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, threading.Event] = {}
+        self.reused = 0
+
+    def lookup(self, binder: str, target: str) -> Optional[str]:
+        """
+        PDB file of an earlier fold of this pair, or None.
+        """
+        entry = self.journal.done("fold", unit_key(binder, target))
+        return entry["file"] if entry is not None else None
+
+    def add(self, binder: str, target: str, file: str, **data: Any):
+        self.journal.record("fold", unit_key(binder, target), file=os.path.abspath(file), **data)
+
+    def fold(self, binder: str, target: str, run: Callable[[], str]) -> Tuple[str, bool]:
+        """
+        PDB file for the pair: an indexed fold, the fold of a thread already running this pair (waited for),
+        or run() (which folds it and returns its file). The flag is true when an existing fold was reused.
+        If run() fails, one waiting thread runs it again.
+        """
+        key = unit_key(binder, target)
+        while True:
+            with self._lock:
+                file = self.lookup(binder, target)
+                if file is not None:
+                    self.reused += 1
+                    return file, True
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    self._in_flight[key] = threading.Event()
+                    break
+            in_flight.wait()
+        try:
+            file = run()
+            self.add(binder, target, file)
+            return file, False
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def close(self):
+        self.journal.close()
+
+def first_occurrences(pairs: List[List[str]]) -> Tuple[List[int], Dict[int, int]]:
+    """
+    Indices of the first copy of each distinct pair, and {index of a later copy: index of its first copy}.
+    """
+    first: Dict[str, int] = {}
+    unique, copies = [], {}
+    for idx, pair in enumerate(pairs):
+        key = unit_key(*pair)
+        if key in first:
+            copies[idx] = first[key]
+        else:
+            first[key] = idx
+            unique.append(idx)
+    return unique, copies
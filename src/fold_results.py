@@ -0,0 +1,80 @@
+# Index manifest and lazy loader of AF2-Multimer results
+# 4_multimer_run.py streams every fold to its own structure_pair_{idx}.pdb as it arrives and, instead
+# of one 4_multimer.json holding every PDB string, writes a small index next to them:
+#   4_multimer_index.json  {"pairs": [{"pair": 1, "binder": "KSAK...", "target": "cycle1",
+#                                      "status": 200, "file": "structure_pair_1.pdb"}, ...]}
+# FoldResults reads only the index; a structure is read from disk when it is accessed, so walking a
+# batch of 1000+ folds keeps one PDB in memory at a time.
+#
+#   for fold in FoldResults("output1/4_multimer_index.json"):
+#       if fold.ok:
+#           print(fold.pair, fold.structure().ca().b_factor.mean())
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from pdb_structure import Structure
+
+INDEX_NAME = "4_multimer_index.json"
+
+def write_index(path: str, entries: List[Dict[str, Any]]):
+    """
+    Write the index atomically; file paths are stored relative to the index so the directory can be moved.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    pairs = [dict(e, file=os.path.relpath(e["file"], directory) if e.get("file") else None) for e in entries]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"pairs": pairs}, f, indent=1)
+    os.replace(tmp, path)
+
+class FoldResult:
+    def __init__(self, entry: Dict[str, Any], directory: str):
+        self.pair = entry["pair"]
+        self.binder = entry["binder"]
+        self.target = entry["target"]
+        self.status = entry["status"]
+        self.file = os.path.join(directory, entry["file"]) if entry.get("file") else None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and self.file is not None and os.path.exists(self.file)
+
+    @property
+    def pdb(self) -> str:
+        """
+        PDB text, read now (not kept).
+        """
+        with open(self.file) as f:
+            return f.read()
+
+    def structure(self) -> Structure:
+        return Structure.from_file(self.file)
+
+class FoldResults:
+    """
+    The folds of one 4_multimer_run.py output directory, opened one at a time.
+    """
+    def __init__(self, path: str):
+        if os.path.isdir(path):
+            path = os.path.join(path, INDEX_NAME)
+        self.path = path
+        with open(path) as f:
+            self._entries = json.load(f)["pairs"]
+        self._directory = os.path.dirname(os.path.abspath(path))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, i: int) -> FoldResult:
+        return FoldResult(self._entries[i], self._directory)
+
+    def __iter__(self) -> Iterator[FoldResult]:
+        return (FoldResult(entry, self._directory) for entry in self._entries)
+
+    def folded(self) -> Iterator[FoldResult]:
+        return (fold for fold in self if fold.ok)
+
+    def find(self, binder: str) -> Optional[FoldResult]:
+        return next((fold for fold in self if fold.binder == binder), None)
@@ -0,0 +1,260 @@
+# Automatic hotspot selection for hotspot-guided RFdiffusion
+# Without hotspot_res RFdiffusion docks most binders anywhere on the target, and those backbones are
+# wasted ProteinMPNN and AF2-Multimer work. Hotspots are picked inside the epitope window of the
+# precomputed AlphaFold2 model from three per-residue terms, each 0-1:
+#   - exposure: 1 - HSE-up / buried_count, where HSE-up (half-sphere exposure) counts the CA atoms within
+#     hse_radius in the half sphere the residue's CA->CB vector points into (a virtual CB for glycine
+#     and CA-only models)
+#   - hydrophobic patch: exposure-weighted mean Kyte-Doolittle hydropathy of the residues whose CB lies
+#     within patch_radius of its CB (binders bury hydrophobic surface)
+#   - confidence: pLDDT from the B-factor column / 100
+# Only hydrophobic or aromatic side chains (HOTSPOT_RESIDUES) above min_plddt and min_exposure whose
+# patch is at least the median patch of the window's exposed residues are eligible, and the patch term
+# weighs most, so exposure breaks ties instead of pulling in exposed charged loops (a hydrophilic window
+# may yield fewer than n hotspots). The best-scoring ones are taken greedily,
+# each at least min_separation A from those already chosen, so the hotspots span the patch instead of
+# stacking on one side chain. Neighbours come from epitope_crop.GridIndex; the terms are computed for
+# all residues at once with array operations.
+#
+#   result = select_hotspots(Structure.from_file("cycle1_alphafold2_output.pdb"), "A430-450", HotspotConfig(n=3))
+#   result.residues       # ["A440", "A443", "A430"], original numbering
+#   print(hotspot_report(result))
+#
+# python hotspots.py      # picks on docs/cycle1_alphafold2_output.pdb for every cycle1 window of the registry,
+#                         # each ranked within its window by apolar_surface, an atom-level measure the
+#                         # selection does not use (it reports, it does not pass or fail)
+
+import argparse
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from epitope_crop import GridIndex, parse_window
+from pdb_structure import Structure
+
+BUNDLED_PDB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docs", "cycle1_alphafold2_output.pdb")
+
+KYTE_DOOLITTLE = {"ALA": 1.8, "ARG": -4.5, "ASN": -3.5, "ASP": -3.5, "CYS": 2.5, "GLN": -3.5, "GLU": -3.5, "GLY": -0.4,
+                  "HIS": -3.2, "ILE": 4.5, "LEU": 3.8, "LYS": -3.9, "MET": 1.9, "PHE": 2.8, "PRO": -1.6, "SER": -0.8,
+                  "THR": -0.7, "TRP": -0.9, "TYR": -1.3, "VAL": 4.2}
+VDW_RADII = {"C": 1.7, "N": 1.55, "O": 1.52, "S": 1.8}
+HOTSPOT_RESIDUES = {"ALA", "CYS", "ILE", "LEU", "MET", "PHE", "TRP", "TYR", "VAL"}  # hydrophobic or aromatic side chains
+
+class HotspotConfig:
+    def __init__(self,
+                 n: int = 3,
+                 min_plddt: float = 70.0,
+                 min_exposure: float = 0.3,
+                 min_separation: float = 6.0,
+                 hse_radius: float = 13.0,
+                 buried_count: int = 30,
+                 patch_radius: float = 10.0,
+                 weights: Tuple[float, float, float] = (0.5, 2.0, 0.5)):
+        self.n = n
+        self.min_plddt = min_plddt
+        self.min_exposure = min_exposure
+        self.min_separation = min_separation  # Angstrom between the CBs of two hotspots
+        self.hse_radius = hse_radius
+        self.buried_count = buried_count  # HSE-up at which a residue counts as fully buried
+        self.patch_radius = patch_radius
+        self.weights = weights  # exposure, hydrophobic patch, confidence
+
+class HotspotResult:
+    def __init__(self, window: str, residues: List[str], rows: List[Dict[str, Any]], eligible: int):
+        self.window = window
+        self.residues = residues  # chosen hotspots, best first
+        self.rows = rows  # one per window residue: metrics, chosen, reason
+        self.eligible = eligible  # residues that passed the pLDDT, exposure and side chain cutoffs
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window, "hotspots": self.residues, "residues": self.rows}
+
+def residue_frames(structure: Structure) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Chain, residue number, residue name, CA, CB and pLDDT of every residue. Glycines (and residues
+    without a CB) get the virtual CB built from their N, CA and C; in CA-only models it is placed 1.53 A
+    from the CA, away from the two neighbouring CAs.
+    """
+    atoms = structure.atoms_only()
+    ca = atoms.select(atoms.atom_name == "CA")
+    index = {key: i for i, key in enumerate(zip(ca.chain.tolist(), ca.res_num.tolist()))}
+
+    def coordinates(atom_name: str) -> np.ndarray:
+        sub = atoms.select(atoms.atom_name == atom_name)
+        rows = np.array([index.get(key, -1) for key in zip(sub.chain.tolist(), sub.res_num.tolist())], dtype=np.int64)
+        xyz = np.full((len(ca), 3), np.nan)
+        xyz[rows[rows >= 0]] = sub.xyz[rows >= 0]
+        return xyz
+
+    n, c, cb = coordinates("N"), coordinates("C"), coordinates("CB")
+    b, d = ca.xyz - n, c - ca.xyz
+    virtual = -0.58273431 * np.cross(b, d) + 0.56802827 * b - 0.54067466 * d + ca.xyz
+    cb = np.where(np.isnan(cb), virtual, cb)
+    missing = np.isnan(cb).any(axis=1)
+    if missing.any():
+        prev = np.where(np.r_[False, ca.chain[1:] == ca.chain[:-1]][:, None], np.roll(ca.xyz, 1, axis=0), ca.xyz)
+        after = np.where(np.r_[ca.chain[:-1] == ca.chain[1:], False][:, None], np.roll(ca.xyz, -1, axis=0), ca.xyz)
+        away = 2 * ca.xyz - prev - after
+        length = np.linalg.norm(away, axis=1, keepdims=True)
+        cb = np.where(missing[:, None] & (length > 0), ca.xyz + 1.53 * away / np.maximum(length, 1e-9), cb)
+    return ca.chain, ca.res_num, ca.res_name, ca.xyz, cb, ca.b_factor
+
+def half_sphere_exposure(ca: np.ndarray, cb: np.ndarray, rows: np.ndarray, radius: float) -> np.ndarray:
+    """
+    HSE-up of the residues in rows: CA atoms within radius on the CB side of each residue's CA.
+    """
+    near = np.flatnonzero(GridIndex(ca, radius).within(ca[rows], radius))
+    offsets = ca[near][None, :, :] - ca[rows][:, None, :]  # (rows, near, 3)
+    dist2 = (offsets ** 2).sum(axis=2)
+    up = np.einsum("rnk,rk->rn", offsets, cb[rows] - ca[rows]) > 0
+    return ((dist2 <= radius ** 2) & (dist2 > 0) & up).sum(axis=1)
+
+def patch_cutoff(patch: np.ndarray, exposure: np.ndarray, config: HotspotConfig) -> float:
+    """
+    Median patch of the window's exposed residues: the more hydrophobic half of its surface.
+    """
+    exposed = exposure >= config.min_exposure
+    return float(np.median(patch[exposed])) if exposed.any() else 0.0
+
+def select_hotspots(structure: Structure, window: str, config: Optional[HotspotConfig] = None) -> HotspotResult:
+    """
+    Hotspot residues ("A437") of the window in the original numbering, with the metrics of every window residue.
+    """
+    config = config or HotspotConfig()
+    chain_id, start, end = parse_window(window)
+    chains, res_nums, res_names, ca, cb, plddt = residue_frames(structure)
+    window_rows = np.flatnonzero((chains == chain_id) & (res_nums >= start) & (res_nums <= end) & ~np.isnan(cb).any(axis=1))
+    if not len(window_rows):
+        raise ValueError(f"Window {window} has no resolved residues in the structure")
+
+    # exposure of the window and of every residue of its surface patches
+    patch_rows = np.flatnonzero(GridIndex(cb, config.patch_radius).within(cb[window_rows], config.patch_radius) & ~np.isnan(cb).any(axis=1))
+    hse_up = half_sphere_exposure(ca, cb, patch_rows, config.hse_radius)
+    patch_exposure = np.clip(1.0 - hse_up / config.buried_count, 0.0, 1.0)
+    position = np.searchsorted(patch_rows, window_rows)  # the window rows are all patch rows
+    exposure = patch_exposure[position]
+
+    hydropathy = np.array([KYTE_DOOLITTLE.get(r, 0.0) for r in res_names[patch_rows]])
+    dist2 = ((cb[window_rows][:, None, :] - cb[patch_rows][None, :, :]) ** 2).sum(axis=2)
+    weight = (dist2 <= config.patch_radius ** 2) * patch_exposure[None, :]
+    patch = (weight @ hydropathy) / np.maximum(weight.sum(axis=1), 1e-9)
+    patch = (patch + 4.5) / 9.0  # Kyte-Doolittle spans -4.5..4.5
+    confidence = plddt[window_rows] / 100.0
+    # exposure and patch are ranked within the window (min-max), so the narrower hydropathy range still counts
+    spread = lambda x: (x - x.min()) / (x.max() - x.min()) if x.max() > x.min() else np.ones_like(x)
+    w_exposure, w_patch, w_confidence = config.weights
+    score = (w_exposure * spread(exposure) + w_patch * spread(patch) + w_confidence * confidence) / (w_exposure + w_patch + w_confidence)
+
+    residue_ids = [f"{c}{n}" for c, n in zip(chains[window_rows], res_nums[window_rows])]
+    reasons = [""] * len(window_rows)
+    for i in np.flatnonzero(plddt[window_rows] < config.min_plddt):
+        reasons[i] = f"pLDDT {plddt[window_rows][i]:.0f} < {config.min_plddt:g}"
+    for i in np.flatnonzero(exposure < config.min_exposure):
+        reasons[i] = reasons[i] or f"buried, HSE-up {hse_up[position][i]}"
+    for i, name in enumerate(res_names[window_rows]):
+        if name not in HOTSPOT_RESIDUES:
+            reasons[i] = reasons[i] or f"polar side chain ({name})"
+    patch_median = patch_cutoff(patch, exposure, config)
+    for i in np.flatnonzero(patch < patch_median):
+        reasons[i] = reasons[i] or f"patch {patch[i]:.2f} below the window median {patch_median:.2f}"
+
+    eligible = sum(not r for r in reasons)
+    chosen: List[int] = []
+    for i in np.argsort(-score, kind="stable"):
+        if reasons[i]:
+            continue
+        if len(chosen) >= config.n:
+            reasons[i] = f"not in top {config.n}"
+            continue
+        if chosen:
+            gaps = np.sqrt(((cb[window_rows][chosen] - cb[window_rows][i]) ** 2).sum(axis=1))
+            if gaps.min() < config.min_separation:
+                reasons[i] = f"within {config.min_separation:g} A of {residue_ids[chosen[int(gaps.argmin())]]}"
+                continue
+        chosen.append(int(i))
+
+    rows = [{"residue": residue_ids[i], "res_name": str(res_names[window_rows][i]), "plddt": round(float(plddt[window_rows][i]), 2),
+             "hse_up": int(hse_up[position][i]), "exposure": round(float(exposure[i]), 3), "patch": round(float(patch[i]), 3),
+             "score": round(float(score[i]), 3), "chosen": i in chosen, "reason": reasons[i]} for i in range(len(window_rows))]
+    return HotspotResult(window, [residue_ids[i] for i in chosen], rows, eligible)
+
+def apolar_surface(structure: Structure, window: str, radius: float = 10.0, probe: float = 1.4, points: int = 96) -> Dict[str, float]:
+    """
+    Per window residue: the carbon/sulfur share of the solvent-accessible surface (Shrake-Rupley) of the
+    atoms within radius of its CB. Atom-level and independent of the HSE / Kyte-Doolittle terms above,
+    so it can judge their picks.
+    """
+    chain_id, start, end = parse_window(window)
+    chains, res_nums, _, _, cb, _ = residue_frames(structure)
+    window_rows = np.flatnonzero((chains == chain_id) & (res_nums >= start) & (res_nums <= end) & ~np.isnan(cb).any(axis=1))
+    atoms = structure.atoms_only()
+    element = np.array([name.strip()[:1] for name in atoms.atom_name])
+    reach = np.array([VDW_RADII.get(e, 1.8) for e in element]) + probe
+    near = np.flatnonzero(GridIndex(atoms.xyz, radius).within(cb[window_rows], radius))
+    i = np.arange(points) + 0.5
+    polar, azimuth = np.arccos(1 - 2 * i / points), np.pi * (1 + 5 ** 0.5) * i
+    sphere = np.stack([np.cos(azimuth) * np.sin(polar), np.sin(azimuth) * np.sin(polar), np.cos(polar)], axis=1)
+    grid = GridIndex(atoms.xyz, 2 * reach.max())
+    area = np.zeros(len(atoms))
+    for a in near:
+        others = np.flatnonzero(grid.within(atoms.xyz[a:a + 1], reach[a] + reach.max()))
+        others = others[others != a]
+        dots = atoms.xyz[a] + reach[a] * sphere
+        buried = (((dots[:, None, :] - atoms.xyz[others][None, :, :]) ** 2).sum(axis=2) < reach[others] ** 2).any(axis=1)
+        area[a] = (~buried).mean() * 4 * np.pi * reach[a] ** 2
+    apolar = np.isin(element, ["C", "S"])
+    shares = {}
+    for row in window_rows:
+        around = near[((atoms.xyz[near] - cb[row]) ** 2).sum(axis=1) <= radius ** 2]
+        shares[f"{chains[row]}{res_nums[row]}"] = float(area[around][apolar[around]].sum() / max(area[around].sum(), 1e-9))
+    return shares
+
+def hotspot_report(result: HotspotResult) -> str:
+    if not result.residues:
+        return f"No residue of {result.window} qualifies as a hotspot; designing without hotspots"
+    chosen = {row["residue"]: row for row in result.rows if row["chosen"]}
+    line = f"Hotspots of {result.window}: {', '.join(result.residues)} ({result.eligible} of {len(result.rows)} residues eligible)"
+    return line + "".join(f"\n  {r} {chosen[r]['res_name']}: exposure {chosen[r]['exposure']:.2f}, patch {chosen[r]['patch']:.2f}, "
+                          f"pLDDT {chosen[r]['plddt']:.0f}, score {chosen[r]['score']:.2f}" for r in result.residues)
+
+def add_hotspot_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--hotspots", nargs="+", default=None, help="RFdiffusion hotspot residues in the original numbering (e.g. A437 A441), or 'auto' to pick them from the precomputed AlphaFold2 model")
+    parser.add_argument("--n_hotspots", type=int, default=3, help="With --hotspots auto: number of hotspots to pick")
+    parser.add_argument("--hotspot_min_plddt", type=float, default=70.0, help="With --hotspots auto: skip residues whose pLDDT is below this")
+    parser.add_argument("--hotspot_separation", type=float, default=6.0, help="With --hotspots auto: minimum CB distance (Angstrom) between two hotspots")
+
+def hotspot_config_from_args(args: argparse.Namespace) -> Optional[HotspotConfig]:
+    """
+    HotspotConfig from add_hotspot_arguments options with --hotspots auto, else None.
+    """
+    if args.hotspots != ["auto"]:
+        return None
+    return HotspotConfig(args.n_hotspots, args.hotspot_min_plddt, min_separation=args.hotspot_separation)
+
+if __name__ == "__main__":
+    from target_registry import TargetRegistry, DEFAULT_REGISTRY  # target_registry imports this module via design_params
+
+    parser = argparse.ArgumentParser(description="Pick hotspots on an AlphaFold2 model and rank them by exposed apolar surface within their window")
+    parser.add_argument("--pdb", type=str, default=BUNDLED_PDB, help="AlphaFold2 model (default: the bundled cycle1 model)")
+    parser.add_argument("--windows", nargs="+", default=None, help="Epitope windows (default: every window of the registry epitopes whose target is this model)")
+    parser.add_argument("--registry", type=str, default=DEFAULT_REGISTRY, help="Target/epitope registry (targets.json)")
+    args = parser.parse_args()
+
+    windows = args.windows
+    if windows is None:
+        registry = TargetRegistry.load(args.registry)
+        epitopes = [e for e in registry.epitopes.values() if os.path.basename(e.target.pdb) == os.path.basename(args.pdb)]
+        windows = list(dict.fromkeys(w for e in epitopes for w in [e.window, *e.script_windows.values()] if w))
+    structure = Structure.from_file(args.pdb)
+    n_picks, n_above = 0, 0
+    for window in windows:
+        result = select_hotspots(structure, window)
+        print(hotspot_report(result))
+        shares = apolar_surface(structure, window)
+        values = np.array(list(shares.values()))
+        for residue in result.residues:
+            rank = float((values < shares[residue]).mean())
+            n_picks, n_above = n_picks + 1, n_above + (shares[residue] > np.median(values))
+            print(f"  {residue}: apolar surface {shares[residue]:.2f}, above {rank:.0%} of the window (median {np.median(values):.2f})")
+    print(f"{n_above} of {n_picks} hotspots have more exposed apolar surface around them than their window's median residue")
@@ -0,0 +1,92 @@
+# Streaming parser for ProteinMPNN mfasta output
+#   >input, score=1.5171, global_score=1.5171, fixed_chains=['A'], designed_chains=['B'], model_name=v_48_020, seed=37
+#   KSAKEREARRREELRRESLE...
+#   >T=0.2, sample=1, score=0.8912, global_score=0.8912, seq_recovery=0.3500
+#   TDGQARRQEQQARQQAQEAG
+# The first record is the input sequence; every ">T=" record is one designed binder. Header fields
+# are parsed into numbers where they are numbers, and sequences may wrap over several lines.
+#
+#   for record in iter_mfasta(open("3_run_proteinmpnn.fasta")):
+#       if record.is_design:
+#           print(record.sequence, record.score, record.seq_recovery)
+
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+FIELD_SEPARATOR = re.compile(r",\s*(?=[A-Za-z_]+=)")
+
+def parse_header(header: str) -> Dict[str, Any]:
+    """
+    ">T=0.2, sample=1, score=0.8912" -> {"T": 0.2, "sample": 1, "score": 0.8912}; a leading bare name is kept as "name".
+    """
+    fields: Dict[str, Any] = {}
+    for part in FIELD_SEPARATOR.split(header.lstrip(">").strip()):
+        key, sep, value = part.partition("=")
+        if not sep:
+            fields["name"] = key.strip()
+            continue
+        value = value.strip()
+        try:
+            fields[key.strip()] = int(value)
+        except ValueError:
+            try:
+                fields[key.strip()] = float(value)
+            except ValueError:
+                fields[key.strip()] = value
+    return fields
+
+class MpnnRecord:
+    def __init__(self, header: str, sequence: str):
+        self.header = header
+        self.sequence = sequence
+        self.fields = parse_header(header)
+
+    @property
+    def is_design(self) -> bool:
+        return "T" in self.fields
+
+    @property
+    def temperature(self) -> Optional[float]:
+        return self.fields.get("T")
+
+    @property
+    def sample(self) -> Optional[int]:
+        return self.fields.get("sample")
+
+    @property
+    def score(self) -> Optional[float]:
+        return self.fields.get("score")
+
+    @property
+    def global_score(self) -> Optional[float]:
+        return self.fields.get("global_score")
+
+    @property
+    def seq_recovery(self) -> Optional[float]:
+        return self.fields.get("seq_recovery")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.fields, sequence=self.sequence)
+
+def iter_mfasta(source: Union[str, Iterable[str]]) -> Iterator[MpnnRecord]:
+    """
+    Records of an mfasta given as text or as an iterable of lines (e.g. an open file), one at a time.
+    """
+    lines = source.splitlines() if isinstance(source, str) else source
+    header, chunks = None, []
+    for line in lines:
+        line = line.strip()
+        if line.startswith(">"):
+            if header is not None:
+                yield MpnnRecord(header, "".join(chunks))
+            header, chunks = line, []
+        elif line and header is not None:
+            chunks.append(line)
+    if header is not None:
+        yield MpnnRecord(header, "".join(chunks))
+
+def designed_records(source: Union[str, Iterable[str]]) -> List[MpnnRecord]:
+    """
+    The designed binders (">T=" records) of an mfasta, in order.
+    """
+    return [record for record in iter_mfasta(source) if record.is_design]
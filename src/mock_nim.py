@@ -0,0 +1,295 @@
+# Stand-in NIM server for testing and benchmarking the pipeline without GPUs
+# Implements the endpoints the scripts use (NIM_ENDPOINTS, v1/health/ready, v1/version and the
+# v2/nvcf/pexec/status/<request ID> polling endpoint) with synthetic but well-formed responses:
+#   RFdiffusion   {"output_pdb": backbone PDB}
+#   ProteinMPNN   {"mfasta": ..., "probs": L x 21 per sequence (20 amino acids + X), "scores": [...]}
+#   AF2-Multimer  PDB text of the binder-target complex, pLDDT in the B-factor column
+#   MSA search    {"alignments": {database: {"a3m": {"alignment": ..., "format": "a3m"}}}}
+# Latency per model is log-normal (median, sigma), errors are 503s at a configurable rate, and a
+# request whose poll-seconds header is shorter than its latency gets a 202 + NVCF-REQID (submit/poll mode).
+# The "msa" latency is per 1000 residues; a multimer fold also pays it for every chain that comes
+# without a precomputed alignment, as the real NIM searches those chains itself.
+# With --gpu_slots a model serves only that many requests at once and the rest wait their turn, as on
+# a GPU, so client-side service time grows with the requests in flight; --mpnn_per_sequence adds
+# ProteinMPNN time per designed sequence so batch size shows in its latency. A request with a
+# random_seed always gets the same response for the same input; --default_seed N treats unseeded
+# requests the same way, like a NIM with a fixed default seed. --reject_alignments answers multimer
+# payloads carrying precomputed alignments with a 422 that does not say why.
+#
+# python mock_nim.py --ports 8082 8083 8084 8000 --latency rfdiffusion=2.0 proteinmpnn=0.5:0.2 multimer=5 --error_rate multimer=0.05
+
+import argparse
+import gzip
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from nim_client import NIM_ENDPOINTS
+
+MODELS = {
+    NIM_ENDPOINTS.RFDIFFUSION.value: "rfdiffusion",
+    NIM_ENDPOINTS.PROTEINMPNN.value: "proteinmpnn",
+    NIM_ENDPOINTS.AF2_MULTIMER.value: "multimer",
+    NIM_ENDPOINTS.MSA_SEARCH.value: "msa",
+}
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+ONE_TO_THREE = dict(zip(AMINO_ACIDS, ["ALA", "CYS", "ASP", "GLU", "PHE", "GLY", "HIS", "ILE", "LYS", "LEU",
+                                      "MET", "ASN", "PRO", "GLN", "ARG", "SER", "THR", "VAL", "TRP", "TYR"]))
+
+def fake_pdb(chains: List[Tuple[str, str]], rng: random.Random) -> str:
+    """
+    CA trace PDB for [(chain id, sequence)], a helix-like walk with random pLDDT B-factors.
+    """
+    lines, serial = [], 1
+    for chain_id, sequence in chains:
+        for i, aa in enumerate(sequence):
+            x, y, z = 2.3 * math.cos(i * 1.75), 2.3 * math.sin(i * 1.75), 1.5 * i + (0.0 if chain_id == "A" else 10.0)
+            lines.append(f"ATOM  {serial:5d}  CA  {ONE_TO_THREE.get(aa, 'GLY')} {chain_id}{i + 1:4d}    "
+                         f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00{rng.uniform(50, 95):6.2f}           C")
+            serial += 1
+    lines.append("END")
+    return "\n".join(lines) + "\n"
+
+class MockConfig:
+    def __init__(self,
+                 latency: Optional[Dict[str, Tuple[float, float]]] = None,
+                 error_rate: Optional[Dict[str, float]] = None,
+                 binder_length: int = 20,
+                 target_length: int = 300,
+                 ready_after: float = 0.0,
+                 seed: int = 0,
+                 reject_gzip: bool = False,
+                 gpu_slots: Optional[Dict[str, int]] = None,
+                 mpnn_per_sequence: float = 0.0,
+                 default_seed: Optional[int] = None,
+                 reject_alignments: bool = False):
+        self.latency = {"rfdiffusion": (0.5, 0.25), "proteinmpnn": (0.2, 0.25), "multimer": (1.0, 0.25), "msa": (0.0, 0.0)}
+        self.latency.update(latency or {})  # model -> (median seconds, log-normal sigma)
+        self.error_rate = error_rate or {}
+        self.binder_length = binder_length
+        self.target_length = target_length  # residues of the RFdiffusion backbone's target chain
+        self.ready_after = ready_after  # seconds of simulated cold start before v1/health/ready says ready
+        self.seed = seed
+        self.reject_gzip = reject_gzip  # answer gzip request bodies with 415, like a server without gzip support
+        self.gpu_slots = gpu_slots or {}  # model -> requests served at once; unlisted models serve all at once
+        self.mpnn_per_sequence = mpnn_per_sequence  # extra ProteinMPNN seconds per designed sequence
+        self.default_seed = default_seed  # random_seed of unseeded requests; None draws a fresh one
+        self.reject_alignments = reject_alignments  # 422 for multimer payloads with "alignments", like a NIM without them
+
+class MockNim:
+    """
+    Response generation, simulated latency and the request log shared by every port of one mock server.
+    """
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.started = time.monotonic()
+        self.rng = random.Random(config.seed)
+        self.jobs: Dict[str, Tuple[float, int, bytes]] = {}  # request ID -> (done at, status, body)
+        self.log: List[Dict] = []  # one entry per inference request
+        self.gpus = {model: threading.Semaphore(n) for model, n in config.gpu_slots.items()}
+        self._lock = threading.Lock()
+
+    def latency(self, model: str) -> float:
+        median, sigma = self.config.latency[model]
+        with self._lock:
+            return median * math.exp(self.rng.gauss(0, sigma)) if sigma > 0 else median
+
+    def respond(self, model: str, payload: Dict) -> Tuple[int, bytes]:
+        with self._lock:
+            rng = random.Random(self.rng.random())
+        seed = payload.get("random_seed", self.config.default_seed)
+        if seed is not None:
+            rng = random.Random(f"{model}:{seed}:{payload.get('input_pdb', '')}")  # a seeded request always gets the same response
+        if rng.random() < self.config.error_rate.get(model, 0.0):
+            return 503, b'{"detail": "mock: service unavailable"}'
+        if model == "rfdiffusion":
+            chains = [("A", "".join(rng.choice(AMINO_ACIDS) for _ in range(self.config.target_length))),
+                      ("B", "G" * self.config.binder_length)]
+            return 200, json.dumps({"output_pdb": fake_pdb(chains, rng)}).encode()
+        if model == "proteinmpnn":
+            n, temps = payload.get("num_seq_per_target", 1), payload.get("sampling_temp", [0.1])
+            seqs = ["".join(rng.choice(AMINO_ACIDS) for _ in range(self.config.binder_length)) for _ in range(n * len(temps))]
+            scores = [rng.uniform(0.8, 2.0) for _ in seqs]
+            mfasta = ">input, score=1.5000, global_score=1.5000\n" + "G" * self.config.binder_length + "\n"
+            mfasta += "".join(f">T={temps[i % len(temps)]}, sample={i + 1}, score={s:.4f}, global_score={s:.4f}, seq_recovery={rng.random():.4f}\n{seq}\n"
+                              for i, (seq, s) in enumerate(zip(seqs, scores)))
+            probs = [[[round(rng.random() / 10, 4) for _ in range(21)] for _ in seq] for seq in seqs]
+            return 200, json.dumps({"mfasta": mfasta, "probs": probs, "scores": scores}).encode()
+        if model == "msa":
+            sequence = payload.get("sequence", "")
+            a3m = f">query\n{sequence}\n" + "".join(f">hit{i}\n{''.join(rng.choice(AMINO_ACIDS) for _ in sequence)}\n" for i in range(8))
+            return 200, json.dumps({"alignments": {db: {"a3m": {"alignment": a3m, "format": "a3m"}}
+                                                   for db in payload.get("databases", ["uniref90"])}}).encode()
+        sequences = payload.get("sequences", ["G" * self.config.binder_length])
+        return 200, fake_pdb([(chr(ord("A") + i), s) for i, s in enumerate(sequences)], rng).encode()
+
+    def record(self, model: str, status: int, seconds: float, size: int):
+        with self._lock:
+            self.log.append({"model": model, "status": status, "seconds": seconds, "bytes": size, "time": time.monotonic()})
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Per model: request count, errors, p50/p99/mean latency and bytes served.
+        """
+        with self._lock:
+            log = list(self.log)
+        out = {}
+        for model in sorted({e["model"] for e in log}):
+            entries = [e for e in log if e["model"] == model]
+            seconds = sorted(e["seconds"] for e in entries)
+            out[model] = {
+                "requests": len(entries),
+                "errors": sum(e["status"] >= 400 for e in entries),
+                "p50_s": seconds[len(seconds) // 2],
+                "p99_s": seconds[min(len(seconds) - 1, int(len(seconds) * 0.99))],
+                "mean_s": sum(seconds) / len(seconds),
+                "bytes": sum(e["bytes"] for e in entries),
+            }
+        return out
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real NIMs
+    mock: MockNim = None
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def poll_seconds(self) -> float:
+        try:
+            return float(self.headers.get("poll-seconds", "inf"))
+        except ValueError:
+            return float("inf")
+
+    def do_GET(self):
+        path = self.path.lstrip("/")
+        if path == "v1/health/ready":
+            ready = time.monotonic() - self.mock.started >= self.mock.config.ready_after
+            return self.reply(200 if ready else 503, json.dumps({"status": "ready" if ready else "not ready"}).encode())
+        if path == "v1/version":
+            return self.reply(200, b'{"release": "mock", "api": "1.0.0"}')
+        if path == "mock/stats":
+            return self.reply(200, json.dumps(self.mock.stats()).encode())
+        if path.startswith("v2/nvcf/pexec/status/"):
+            request_id = path.rsplit("/", 1)[1]
+            job = self.mock.jobs.get(request_id)
+            if job is None:
+                return self.reply(404, b'{"detail": "unknown request ID"}')
+            done_at, status, body = job
+            time.sleep(max(0.0, min(self.poll_seconds(), done_at - time.monotonic())))
+            if time.monotonic() < done_at:
+                return self.reply(202, b"", {"NVCF-REQID": request_id})
+            self.mock.jobs.pop(request_id, None)
+            return self.reply(status, body)
+        self.reply(404, b'{"detail": "not found"}')
+
+    def do_POST(self):
+        start = time.monotonic()
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            if self.mock.config.reject_gzip:
+                return self.reply(415, b'{"detail": "mock: Content-Encoding gzip not supported"}')
+            raw = gzip.decompress(raw)
+        payload = json.loads(raw or b"{}")
+        model = MODELS.get(self.path.lstrip("/"))
+        if model is None:
+            return self.reply(404, b'{"detail": "not found"}')
+        if model == "multimer" and self.mock.config.reject_alignments and payload.get("alignments"):
+            return self.reply(422, b'{"detail": "mock: invalid request"}')
+        latency = self.mock.latency(model)
+        if model in ("msa", "multimer"):
+            alignments = payload.get("alignments") or []
+            searched = [s for i, s in enumerate(payload.get("sequences", [payload.get("sequence", "")]))
+                        if model == "msa" or i >= len(alignments) or alignments[i] is None]
+            latency = (latency if model == "multimer" else 0.0) + sum(self.mock.latency("msa") * len(s) / 1000 for s in searched)
+        if model == "proteinmpnn":
+            latency += self.mock.config.mpnn_per_sequence * payload.get("num_seq_per_target", 1) * len(payload.get("sampling_temp", [0.1]))
+        status, body = self.mock.respond(model, payload)
+        if status == 200 and latency > self.poll_seconds():
+            # the job outlives this call: hand back a request ID and finish it "in the background"
+            request_id = str(uuid.uuid4())
+            self.mock.jobs[request_id] = (start + latency, status, body)
+            time.sleep(self.poll_seconds())
+            self.mock.record(model, status, latency, len(body))
+            return self.reply(202, b"", {"NVCF-REQID": request_id})
+        gpu = self.mock.gpus.get(model)
+        if gpu is not None and status == 200:
+            with gpu:
+                time.sleep(latency)
+        else:
+            time.sleep(latency if status == 200 else 0.0)
+        self.mock.record(model, status, time.monotonic() - start, len(body))
+        self.reply(status, body, {"Content-Type": "application/json"} if model != "multimer" else None)
+
+def serve(config: MockConfig, ports: List[int], host: str = "127.0.0.1") -> Tuple[MockNim, List[ThreadingHTTPServer]]:
+    """
+    Start one mock server thread per port (port 0 picks a free one); every port serves every model.
+    """
+    mock = MockNim(config)
+    handler = type("BoundMockHandler", (MockHandler,), {"mock": mock})
+    servers = []
+    for port in ports:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return mock, servers
+
+def parse_model_values(specs: List[str], name: str) -> Dict[str, List[float]]:
+    """
+    ["rfdiffusion=2.0:0.3", ...] -> {"rfdiffusion": [2.0, 0.3]}
+    """
+    values = {}
+    for spec in specs or []:
+        model, _, value = spec.partition("=")
+        if model not in MODELS.values():
+            raise ValueError(f"Unknown model {model} in {name}; expected one of {', '.join(MODELS.values())}")
+        values[model] = [float(v) for v in value.split(":")]
+    return values
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", nargs="*", default=[], help="MODEL=MEDIAN[:SIGMA] seconds, log-normal (models: rfdiffusion proteinmpnn multimer; msa is per 1000 residues searched)")
+    parser.add_argument("--error_rate", nargs="*", default=[], help="MODEL=P fraction of requests answered with 503")
+    parser.add_argument("--binder_length", type=int, default=20, help="Residues of each designed binder")
+    parser.add_argument("--target_length", type=int, default=300, help="Target residues in RFdiffusion backbones (payload size)")
+    parser.add_argument("--ready_after", type=float, default=0.0, help="Seconds before v1/health/ready reports ready")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for latencies, errors and responses")
+    parser.add_argument("--reject_gzip", action="store_true", help="Answer gzip-compressed request bodies with 415")
+    parser.add_argument("--gpu_slots", nargs="*", default=[], help="MODEL=N requests a model serves at once; the rest queue")
+    parser.add_argument("--mpnn_per_sequence", type=float, default=0.0, help="Extra ProteinMPNN seconds per designed sequence")
+    parser.add_argument("--reject_alignments", action="store_true", help="Answer multimer payloads with precomputed alignments with 422")
+    parser.add_argument("--default_seed", type=int, default=None, help="Answer requests without random_seed as if they had this one (a NIM with a fixed default seed)")
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    latency = {model: (v[0], v[1] if len(v) > 1 else 0.25) for model, v in parse_model_values(args.latency, "--latency").items()}
+    error_rate = {model: v[0] for model, v in parse_model_values(args.error_rate, "--error_rate").items()}
+    gpu_slots = {model: int(v[0]) for model, v in parse_model_values(args.gpu_slots, "--gpu_slots").items()}
+    return MockConfig(latency, error_rate, args.binder_length, args.target_length, args.ready_after, args.seed, args.reject_gzip,
+                      gpu_slots, args.mpnn_per_sequence, args.default_seed, args.reject_alignments)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock RFdiffusion / ProteinMPNN / AF2-Multimer NIM server")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--ports", nargs="+", type=int, default=[8082, 8083, 8084], help="Ports to serve (each serves every model)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock, servers = serve(config_from_args(args), args.ports, args.host)
+    print(f"Mock NIMs listening on {', '.join(f'{args.host}:{s.server_port}' for s in servers)} (GET /mock/stats for latencies)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(mock.stats(), indent=2))
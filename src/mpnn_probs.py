@@ -0,0 +1,91 @@
+# Binary storage for ProteinMPNN probability matrices and scores
+# Instead of one comma-joined text line per position, a run's probs are stored as
+#   <prefix>_probs.npy        all positions of all sequences stacked, shape (sum of L, width), float16 by default;
+#                             width is whatever the NIM returns (21 for ProteinMPNN: 20 amino acids + X)
+#   <prefix>_probs_index.npy  row offsets, shape (n_sequences + 1,), sequence i is rows [index[i], index[i + 1])
+#   <prefix>_scores.npy       one score per sequence (when the response has scores)
+# ProbsReader memory-maps the .npy files, so reading sequence i touches only its own L x width rows.
+
+import argparse
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from tracing import span
+
+def save_probs(prefix: str,
+               probs: Sequence[Sequence[Sequence[float]]],
+               scores: Optional[Sequence[float]] = None,
+               dtype: str = "float16") -> List[str]:
+    """
+    Write a ProteinMPNN response's "probs" (and "scores") under prefix; returns the files written.
+    Each sequence's probs must be an L x width matrix, with the same width for every sequence.
+    """
+    with span("local.save_probs", file=f"{prefix}_probs.npy") as s:
+        matrices = [np.asarray(p, dtype=dtype) for p in probs]
+        for i, m in enumerate(matrices):
+            if m.ndim != 2:
+                raise ValueError(f"probs of sequence {i + 1} have shape {m.shape}, expected L x width")
+            if m.shape[1] != matrices[0].shape[1]:
+                raise ValueError(f"probs of sequence {i + 1} are {m.shape[1]} wide, sequence 1's are {matrices[0].shape[1]}")
+        index = np.zeros(len(matrices) + 1, dtype=np.int64)
+        index[1:] = np.cumsum([len(m) for m in matrices])
+        stacked = np.concatenate(matrices) if matrices else np.zeros((0, 0), dtype=dtype)
+        files = [f"{prefix}_probs.npy", f"{prefix}_probs_index.npy"]
+        np.save(files[0], stacked)
+        np.save(files[1], index)
+        if scores is not None:
+            files.append(f"{prefix}_scores.npy")
+            np.save(files[2], np.asarray(scores, dtype=np.float32))
+        s.set(bytes=stacked.nbytes)
+        return files
+
+class ProbsReader:
+    """
+    Lazy, memory-mapped access to probs saved by save_probs: reader[i] is sequence i's L x width array.
+    """
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.probs = np.load(f"{prefix}_probs.npy", mmap_mode="r")
+        self.index = np.load(f"{prefix}_probs_index.npy")
+        self.width = self.probs.shape[1]  # columns per position, as the NIM returned them
+        scores_path = f"{prefix}_scores.npy"
+        self.scores = np.load(scores_path) if os.path.exists(scores_path) else None
+
+    def __len__(self) -> int:
+        return len(self.index) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"sequence {i} out of range for {len(self)} sequences")
+        i %= len(self)
+        return self.probs[self.index[i]:self.index[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def convert_probs_txt(txt_path: str, prefix: str, dtype: str = "float16") -> List[str]:
+    """
+    Convert an old 3_{name}_proteinmpnn_probs.txt ("Sequence i:" blocks of comma-separated rows) to save_probs format.
+    """
+    probs, current = [], None
+    with open(txt_path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("Sequence"):
+                current = []
+                probs.append(current)
+            elif line:
+                current.append(np.array(line.split(","), dtype=np.float32))
+    return save_probs(prefix, probs, dtype=dtype)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert ProteinMPNN probs text files to memory-mappable .npy")
+    parser.add_argument("txt_files", nargs="+", help="3_{name}_proteinmpnn_probs.txt files")
+    parser.add_argument("--dtype", type=str, default="float16", help="float16 or float32")
+    args = parser.parse_args()
+    for txt_path in args.txt_files:
+        prefix = txt_path.removesuffix("_probs.txt")
+        print(f"{txt_path} -> {convert_probs_txt(txt_path, prefix, args.dtype)}")
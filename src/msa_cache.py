@@ -0,0 +1,157 @@
+# Per-target MSA cache for AF2-Multimer folds
+# Every binder-target fold used to search uniref90 / mgnify / small_bfd for both chains, so a ~1000
+# residue target was aligned again for each of its binders. The target's MSA is now searched once
+# (MSA search NIM, NIM_ENDPOINTS.MSA_SEARCH), stored under ~/.cache/nim_results/msa/<sha of sequence and
+# databases>.json, and passed to the multimer NIM as a precomputed alignment for the target chain;
+# only the short binder chain is still searched by the fold itself.
+#
+# Multimer payload with a precomputed target alignment (one entry per chain, null = search it):
+#   {"sequences": [binder, target], "databases": [...],
+#    "alignments": [null, {"uniref90": {"alignment": "<a3m>", "format": "a3m"}, ...}]}
+# A multimer NIM that does not accept "alignments" answers 400/422; the fold is then resent as the plain
+# payload. The cache stops attaching alignments for the rest of the run once an error names the
+# "alignments" field, or once max_rejections folds were rejected with them but accepted without;
+# a 400/422 that the plain payload gets as well is the pair's own error and is raised.
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from nim_client import NimClient, NimHTTPError, NIM_ENDPOINTS, NIM_PORTS
+from result_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_MSA_DIR = os.path.join(DEFAULT_CACHE_DIR, "msa")
+MULTIMER_DATABASES = ["uniref90", "mgnify", "small_bfd"]
+ALIGNMENTS_FIELD = "alignments"
+ALIGNMENTS_REJECTED_CODES = (400, 422)
+
+T = TypeVar("T")
+
+def multimer_payload(binder_target_pair: List[str],
+                     target_alignments: Optional[Dict[str, Dict[str, str]]] = None,
+                     databases: List[str] = MULTIMER_DATABASES) -> Dict[str, Any]:
+    payload = {
+        "sequences": binder_target_pair,
+        "databases": databases
+    }
+    if target_alignments is not None:
+        payload[ALIGNMENTS_FIELD] = [None, target_alignments]
+    return payload
+
+class MsaCache:
+    """
+    Target MSAs searched once per sequence (per process and on disk) and attached to multimer payloads.
+    """
+    def __init__(self,
+                 client: NimClient,
+                 directory: str = DEFAULT_MSA_DIR,
+                 databases: List[str] = MULTIMER_DATABASES,
+                 msa_url: Optional[str] = None,
+                 max_rejections: int = 3):
+        self.client = client
+        self.directory = directory
+        self.databases = databases
+        self.msa_url = msa_url  # MSA search endpoint; default the routed / localhost MSA search NIM
+        self.accepted = True  # false once the multimer NIM rejected precomputed alignments
+        self.max_rejections = max_rejections
+        self.rejections = 0  # folds rejected with alignments that went through without them
+        self.searches = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, sequence: str) -> str:
+        key = hashlib.sha256("\0".join([sequence, *self.databases]).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"{key}.json")
+
+    def search(self, sequence: str) -> Dict[str, Dict[str, str]]:
+        """
+        One MSA search; returns {database: {"alignment": a3m text, "format": "a3m"}}.
+        """
+        payload = {"sequence": sequence, "databases": self.databases, "output_alignment_formats": ["a3m"]}
+        if self.msa_url:
+            response = self.client.post_json(self.msa_url, payload, parse=True)
+        else:
+            response = self.client.post_nim(payload, NIM_ENDPOINTS.MSA_SEARCH.value, NIM_PORTS.MSA_SEARCH_PORT.value, parse=True)
+        alignments = response["alignments"]
+        return {db: formats.get("a3m", formats) for db, formats in alignments.items()}
+
+    def alignments(self, sequence: str) -> Dict[str, Dict[str, str]]:
+        """
+        The sequence's MSA from disk, or searched now; concurrent callers for one sequence share a single search.
+        """
+        path = self.path(sequence)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(path, threading.Lock())
+        with key_lock:
+            if os.path.exists(path):
+                with open(path) as f:
+                    self.hits += 1
+                    return json.load(f)
+            alignments = self.search(sequence)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(alignments, f)
+            os.replace(tmp, path)
+            self.searches += 1
+            print(f"Searched and cached the MSA of a {len(sequence)}-residue target ({path})")
+            return alignments
+
+    def payload(self, binder_target_pair: List[str]) -> Dict[str, Any]:
+        """
+        Multimer payload for the pair, with the target's cached MSA when the multimer NIM accepts it.
+        """
+        if not self.accepted:
+            return multimer_payload(binder_target_pair, databases=self.databases)
+        return multimer_payload(binder_target_pair, self.alignments(binder_target_pair[1]), self.databases)
+
+    def fold(self, binder_target_pair: List[str], send: Callable[[Dict[str, Any]], T]) -> T:
+        """
+        send(payload) with the target's MSA attached; if the multimer NIM rejects the payload, send the
+        plain payload instead (see the module comment for when alignments are dropped for good).
+        """
+        payload = self.payload(binder_target_pair)
+        try:
+            return send(payload)
+        except NimHTTPError as e:
+            if not self.rejected(payload, e):
+                raise
+            result = send(self.plain_payload(binder_target_pair))
+        self.accepted_without()
+        return result
+
+    def plain_payload(self, binder_target_pair: List[str]) -> Dict[str, Any]:
+        return multimer_payload(binder_target_pair, databases=self.databases)
+
+    def rejected(self, payload: Dict[str, Any], error: Exception) -> bool:
+        """
+        Whether a fold of payload that failed with error should be resent as the plain payload; an error
+        naming the alignments field also stops attaching them.
+        """
+        if ALIGNMENTS_FIELD not in payload or not isinstance(error, NimHTTPError) or error.status_code not in ALIGNMENTS_REJECTED_CODES:
+            return False
+        if ALIGNMENTS_FIELD in error.text.lower():
+            self.reject(f"{error.status_code} naming the {ALIGNMENTS_FIELD} field")
+        return True
+
+    def accepted_without(self):
+        """
+        Count a fold that was rejected with alignments and accepted without them.
+        """
+        with self._lock:
+            self.rejections += 1
+            rejections = self.rejections
+        if rejections >= self.max_rejections:
+            self.reject(f"{rejections} folds rejected with them and accepted without")
+
+    def reject(self, reason: str):
+        """
+        Stop attaching precomputed alignments for the rest of the run.
+        """
+        with self._lock:
+            was_accepted, self.accepted = self.accepted, False
+        if was_accepted:
+            print(f"Multimer NIM rejected precomputed alignments ({reason}), searching every chain from now on")
@@ -0,0 +1,176 @@
+# Submit/poll mode for the NIMs instead of one connection held open for up to "poll-seconds": 900
+#   - a job is submitted with a short poll-seconds; a 200 is the result, a 202 carries the request ID
+#     (NVCF-REQID header) and the job keeps running on the NIM without a client socket
+#   - the status endpoint (v2/nvcf/pexec/status/<request ID>) is long-polled for up to poll-seconds,
+#     again answering 202 while the job runs and 200 with the result when it is done
+#   - every job is a coroutine on one asyncio event loop; the short HTTP calls themselves run on a
+#     small thread pool over NimClient's pooled sessions (so retries and the cache still apply). A
+#     status call occupies a thread for up to poll-seconds, so keep poll-seconds short when tracking
+#     many more jobs than http_threads
+#   - submitted request IDs are journalled, so a timed-out or interrupted run collects the result
+#     later instead of recomputing it
+#
+#   poller = NimPoller(nim_client, journal=journal)
+#   results = poller.run([(url, payload), ...])   # bytes or the NimError of each job, in order
+#   poller.run(jobs, on_result=save)               # save(i, bytes or error) as each job finishes; nothing kept
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from nim_client import NimClient, NimError, NimHTTPError, NimTimeoutError, model_name, origin
+from result_cache import canonical_payload
+from run_journal import RunJournal, unit_key
+from tracing import get_tracer
+
+REQUEST_ID_HEADER = "NVCF-REQID"
+STATUS_PATH = "v2/nvcf/pexec/status/{request_id}"
+
+class NimJobTimeoutError(NimTimeoutError):
+    """
+    A submitted job was not done before the job timeout; it may still finish and be collected by request_id.
+    """
+    def __init__(self, message: str, url: str, request_id: str):
+        super().__init__(message, url)
+        self.request_id = request_id
+
+class NimPoller:
+    """
+    Tracks many submitted NIM jobs from one event loop.
+    """
+    def __init__(self,
+                 client: NimClient,
+                 poll_seconds: int = 5,
+                 poll_interval: float = 1.0,
+                 job_timeout: float = 3600.0,
+                 http_threads: int = 16,
+                 journal: Optional[RunJournal] = None,
+                 status_path: str = STATUS_PATH):
+        self.client = client
+        self.poll_seconds = poll_seconds  # how long the NIM may hold one submit/status call before answering 202
+        self.poll_interval = poll_interval  # pause between status calls that came back 202
+        self.job_timeout = job_timeout
+        self.http_threads = http_threads
+        self.journal = journal
+        self.status_path = status_path
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _call(self, method: str, url: str, **kwargs):
+        headers = {"poll-seconds": str(self.poll_seconds)}
+        if method == "GET":
+            # a status call should be answered within poll-seconds; one that is not is polled again (collect),
+            # while a submit keeps the client's read timeout in case the NIM ignores poll-seconds
+            kwargs["timeout"] = (self.client.connect_timeout, self.poll_seconds + self.client.connect_timeout)
+        return self.client.request(method, url, headers=headers, **kwargs)
+
+    async def _http(self, method: str, url: str, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: self._call(method, url, **kwargs))
+
+    @staticmethod
+    def _request_id(response) -> str:
+        request_id = response.headers.get(REQUEST_ID_HEADER)
+        if request_id is None:
+            try:
+                d = response.json()
+                request_id = d.get("reqId") or d.get("request_id")
+            except ValueError:
+                pass
+        if request_id is None:
+            raise NimHTTPError(response.url, response.status_code, "202 without a request ID")
+        return request_id
+
+    async def collect(self, url: str, request_id: str, deadline: Optional[float] = None) -> bytes:
+        """
+        Poll the status endpoint of an already submitted job until it returns the result. A status call
+        that times out counts as "still running".
+        """
+        deadline = deadline or time.monotonic() + self.job_timeout
+        status_url = f"{origin(url)}/{self.status_path.format(request_id=request_id)}"
+        while True:
+            try:
+                response = await self._http("GET", status_url)
+            except NimTimeoutError:
+                response = None
+            if response is not None and response.status_code != 202:
+                return response.content
+            if time.monotonic() + self.poll_interval > deadline:
+                raise NimJobTimeoutError(f"Job {request_id} not done after {self.job_timeout:.0f}s", url, request_id)
+            await asyncio.sleep(self.poll_interval)
+
+    async def result(self, url: str, payload: Dict[str, Any], seed: Optional[int] = None) -> bytes:
+        """
+        Submit one job (or resume its journalled request ID) and return the response body when done.
+        The whole job, submit to result, is recorded as one "nim.<model>" span with mode "poll".
+        """
+        start = time.perf_counter()
+        try:
+            body = await self._result(url, payload, seed)
+        except Exception as e:
+            get_tracer().record(f"nim.{model_name(url)}", time.perf_counter() - start, e, url=url, mode="poll")
+            raise
+        get_tracer().record(f"nim.{model_name(url)}", time.perf_counter() - start, url=url, mode="poll", response_bytes=len(body))
+        return body
+
+    async def _result(self, url: str, payload: Dict[str, Any], seed: Optional[int] = None) -> bytes:
+        deadline = time.monotonic() + self.job_timeout
+        cache = self.client.cache
+        key = self.client.cache_key(url, payload, seed) if cache is not None else None
+        if key is not None and not self.client.refresh:
+            body = cache.get(key)
+            if body is not None:
+                return body
+
+        job_key = unit_key(url, canonical_payload(payload))
+        submitted = self.journal.done("submitted", job_key) if self.journal is not None else None
+        if submitted is not None:
+            print(f"Collecting job {submitted['request_id']} submitted by an earlier run")
+            try:
+                body = await self.collect(url, submitted["request_id"], deadline)
+            except NimHTTPError as e:
+                if e.status_code != 404:
+                    raise
+                body = None  # the NIM no longer knows the request ID; submit again
+        else:
+            body = None
+        if body is None:
+            response = await self._http("POST", url, json=payload)
+            if response.status_code == 202:
+                request_id = self._request_id(response)
+                if self.journal is not None:
+                    self.journal.record("submitted", job_key, url=url, request_id=request_id)
+                body = await self.collect(url, request_id, deadline)
+            else:
+                body = response.content
+        if key is not None:
+            cache.put(key, body)
+        return body
+
+    async def gather(self,
+                     jobs: List[Tuple[str, Dict[str, Any]]],
+                     on_result: Optional[Callable[[int, Union[bytes, Exception]], None]] = None) -> List[Union[bytes, NimError, None]]:
+        async def one(i: int, url: str, payload: Dict[str, Any]):
+            try:
+                body = await self.result(url, payload)
+            except Exception as e:
+                body = e
+            if on_result is None:
+                return body
+            on_result(i, body)  # handed over and dropped, so finished bodies do not pile up
+            return None
+
+        self._executor = ThreadPoolExecutor(max_workers=self.http_threads)
+        try:
+            return await asyncio.gather(*(one(i, url, payload) for i, (url, payload) in enumerate(jobs)))
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def run(self,
+            jobs: List[Tuple[str, Dict[str, Any]]],
+            on_result: Optional[Callable[[int, Union[bytes, Exception]], None]] = None) -> List[Union[bytes, NimError, None]]:
+        """
+        Run every (url, payload) job to completion on one event loop; returns the body or the error of each,
+        or with on_result calls on_result(job index, body or error) as each job finishes and returns Nones.
+        """
+        return asyncio.run(self.gather(jobs, on_result))
@@ -0,0 +1,510 @@
+# Shared NIM client used by the protein binder design scripts
+#   - one keep-alive requests.Session per NIM host:port (connection reuse for multi-MB PDB payloads)
+#   - connect/read timeouts on every call
+#   - exponential-backoff retry on 429/502/503/504 and dropped connections (e.g. RFdiffusion warm-up 503s)
+#   - typed errors instead of a bare Exception
+#   - optional content-addressed ResultCache so repeated payloads are not recomputed on the GPU
+#   - startup gate that waits (concurrently, with a deadline) until every required NIM is ready
+#   - JSON request bodies gzip-compressed (streamed through the compressor, falling back to plain JSON
+#     for a server that answers 415 or rejects the encoding), large responses (multimer PDBs) streamed
+#     straight to disk, and JSON responses decoded chunk by chunk as they arrive
+#   - every call is a timing span (bytes, retries, cache hit/miss) in the process-wide tracer (tracing.py)
+#   - optional NimRouter spreading each model's requests over several replicas (see nim_router.py)
+#   - optional AdaptiveScheduler capping each model's requests in flight from their service times (scheduler.py)
+
+import codecs
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from enum import StrEnum, Enum  # must be Python 3.11+
+from typing import Tuple, Dict, Any, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from nim_router import NimRouter
+from result_cache import ResultCache, cache_key
+from tracing import Span, span
+
+NIM_HOST_URL_BASE = "http://localhost"
+
+# 3 different endpoints for the models, plus the MSA search NIM that feeds target MSAs to AF2-Multimer
+class NIM_PORTS(Enum):
+    RFDIFFUSION_PORT = 8082
+    PROTEINMPNN_PORT = 8083
+    AF2_MULTIMER_PORT = 8084
+    MSA_SEARCH_PORT = 8085
+class NIM_ENDPOINTS(StrEnum):
+    RFDIFFUSION =  "biology/ipd/rfdiffusion/generate"
+    PROTEINMPNN =  "biology/ipd/proteinmpnn/predict"
+    AF2_MULTIMER = "protein-structure/alphafold2/multimer/predict-structure-from-sequences"
+    MSA_SEARCH =   "biology/colabfold/msa-search/predict"
+
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+GZIP_UNSUPPORTED_CODE = 415  # Unsupported Media Type: the server does not take gzip bodies at all
+GZIP_REJECTED_CODES = (400, 422)  # other answers only count when the error text is about the encoding
+GZIP_REJECTED_WORDS = ("gzip", "content-encoding", "decompress", "decode")
+STREAM_CHUNK_BYTES = 1 << 20
+
+def origin(url: str) -> str:
+    """
+    "http://host:port/some/path" -> "http://host:port"
+    """
+    return "/".join(url.split("/", 3)[:3])
+
+def model_name(url: str) -> str:
+    """
+    "rfdiffusion", "proteinmpnn" or "af2_multimer" for a NIM endpoint URL (span names), else "other".
+    """
+    for endpoint in NIM_ENDPOINTS:
+        if endpoint.value in url:
+            return endpoint.name.lower()
+    return "other"
+
+def encode_json(payload: Dict[str, Any], gzip_level: Optional[int] = None) -> bytes:
+    """
+    Serialize a JSON body. With gzip_level, the encoder's chunks go straight through the compressor, so
+    the full uncompressed JSON text (a second copy of every embedded PDB) is never built.
+    """
+    if gzip_level is None:
+        return json.dumps(payload).encode()
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    chunks = [compressor.compress(chunk.encode()) for chunk in json.JSONEncoder().iterencode(payload)]
+    chunks.append(compressor.flush())
+    return b"".join(chunks)
+
+def gzip_rejected(status_code: int, text: str) -> bool:
+    """
+    Whether an error answer to a gzip body says the encoding (not the payload) was the problem.
+    """
+    if status_code == GZIP_UNSUPPORTED_CODE:
+        return True
+    return status_code in GZIP_REJECTED_CODES and any(word in text.lower() for word in GZIP_REJECTED_WORDS)
+
+def read_json(response: requests.Response) -> Any:
+    """
+    Parse a streamed JSON response. The chunks are decoded as they arrive, so the raw body is never held
+    whole next to its text and the parsed fields (which hold the embedded PDBs once more).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    text = [decoder.decode(chunk) for chunk in response.iter_content(STREAM_CHUNK_BYTES)]
+    text.append(decoder.decode(b"", final=True))
+    return json.loads("".join(text))
+
+##############################################################
+# Errors
+##############################################################
+class NimError(Exception):
+    """
+    Base class for every error raised by NimClient.
+    """
+    def __init__(self, message: str, url: str):
+        super().__init__(message)
+        self.url = url
+
+class NimHTTPError(NimError):
+    """
+    The NIM answered with a non-2xx status (after retries, if the status was retryable).
+    """
+    def __init__(self, url: str, status_code: int, text: str):
+        super().__init__(f"Error: response returned code [{status_code}], with text: {text}", url)
+        self.status_code = status_code
+        self.text = text
+
+class NimTimeoutError(NimError):
+    """
+    The NIM did not connect or respond within the configured timeout.
+    """
+
+class NimConnectionError(NimError):
+    """
+    The NIM could not be reached (refused, reset, DNS) after all retries.
+    """
+
+##############################################################
+# Client
+##############################################################
+class NimClient:
+    """
+    Pooled, retrying HTTP client for the RFdiffusion / ProteinMPNN / AF2-Multimer NIMs.
+    """
+    def __init__(self,
+                headers: Optional[Dict[str, str]] = None,
+                base_url: str = NIM_HOST_URL_BASE,
+                connect_timeout: float = 10.0,
+                read_timeout: float = 960.0,  # a bit more than the 900 s "poll-seconds" the NIMs may hold a request
+                max_retries: int = 5,
+                backoff_base: float = 2.0,
+                backoff_max: float = 60.0,
+                pool_maxsize: int = 16,
+                cache: Optional[ResultCache] = None,
+                refresh: bool = False,
+                router: Optional[NimRouter] = None,
+                gzip_requests: bool = True,
+                gzip_min_bytes: int = 16384,
+                gzip_level: int = 6,
+                scheduler=None):
+        self.headers = dict(headers or {})
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.cache = cache
+        self.refresh = refresh  # recompute and overwrite cached entries instead of reading them
+        self.gzip_requests = gzip_requests
+        self.gzip_min_bytes = gzip_min_bytes  # smaller bodies (multimer sequences) are sent as is
+        self.gzip_level = gzip_level
+        self._no_gzip: set = set()  # origins that rejected a gzip body
+        self._sessions: Dict[str, requests.Session] = {}
+        self._model_versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # replicas from NIM_<MODEL>_URLS / NIM_REPLICAS_CONFIG unless a router is passed in
+        self.router = router or NimRouter.from_env({p.name.removesuffix("_PORT"): p.value for p in NIM_PORTS})
+        if self.router.probe is None:
+            self.router.probe = lambda host: self.probe(host, verbose=False)  # background re-probes stay quiet
+        self.scheduler = scheduler  # AdaptiveScheduler (scheduler.py) or None for no client-side limit
+
+    def slot(self, url: str, payload: Dict[str, Any]):
+        """
+        The scheduler's slot for a request to url, held while the NIM works on it (no-op without a scheduler).
+        """
+        return self.scheduler.slot(model_name(url), payload) if self.scheduler is not None else nullcontext()
+
+    def session(self, host: str) -> requests.Session:
+        """
+        Return the keep-alive session for a "scheme://host:port" origin, creating it on first use.
+        """
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(self.headers)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+        self.router.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def url(self, nim_endpoint: str, nim_port: int, base_url: Optional[str] = None) -> str:
+        return f"{base_url or self.base_url}:{nim_port}/{nim_endpoint}"
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_base ** attempt, self.backoff_max)
+        return delay * (0.5 + random.random() / 2)  # jitter so replicas are not hit in lockstep
+
+    def request(self, method: str, url: str, max_retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Send a request on the pooled session for url, retrying retryable failures with backoff.
+        Returns the 2xx response or raises a NimError subclass. Each call is one "http.<method>" span.
+        A json= body is gzip-compressed unless it is small or the server answered a gzip body with 415
+        before; a 400/422 that blames the encoding is resent as plain JSON without turning gzip off.
+        With stream=True the body is left unread for iter_content.
+        """
+        payload = kwargs.pop("json", None)
+        gzipped = False
+        if payload is not None:
+            host = origin(url)
+            headers = {"Content-Type": "application/json", **kwargs.get("headers", {})}
+            # the embedded PDB strings dominate the body size, so they decide without serializing twice
+            approx_bytes = sum(len(v) for v in payload.values() if isinstance(v, str)) if isinstance(payload, dict) else 0
+            gzipped = self.gzip_requests and host not in self._no_gzip and approx_bytes >= self.gzip_min_bytes
+            kwargs["data"] = encode_json(payload, self.gzip_level if gzipped else None)
+            if gzipped:
+                headers["Content-Encoding"] = "gzip"
+            kwargs["headers"] = headers
+        with span(f"http.{method.lower()}", url=url, request_bytes=len(kwargs.get("data") or b""), gzip=gzipped) as s:
+            try:
+                response = self._send(method, url, s, max_retries, **kwargs)
+            except NimHTTPError as e:
+                if not gzipped or not gzip_rejected(e.status_code, e.text):
+                    raise
+                if e.status_code == GZIP_UNSUPPORTED_CODE:
+                    print(f"{origin(url)} does not accept gzip request bodies ({e.status_code}), sending plain JSON from now on")
+                    self._no_gzip.add(origin(url))
+                else:
+                    print(f"{origin(url)} rejected a gzip request body ({e.status_code}), resending it as plain JSON")
+                kwargs["data"] = encode_json(payload)
+                del kwargs["headers"]["Content-Encoding"]
+                s.set(request_bytes=len(kwargs["data"]), gzip=False)
+                response = self._send(method, url, s, max_retries, **kwargs)
+            size = response.headers.get("Content-Length") if kwargs.get("stream") else len(response.content)
+            s.set(status=response.status_code, response_bytes=int(size or 0))
+            return response
+
+    def _send(self, method: str, url: str, s: Span, max_retries: Optional[int] = None, **kwargs) -> requests.Response:
+        session = self.session(origin(url))
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+        max_retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            last_attempt = attempt == max_retries
+            s.set(retries=attempt)
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.Timeout as e:
+                # a read timeout means the job may still be running; do not resubmit it blindly
+                if last_attempt or isinstance(e, requests.ReadTimeout):
+                    raise NimTimeoutError(f"Timed out after {attempt + 1} attempt(s): {e}", url) from e
+                delay, reason = self._backoff(attempt), "timed out"
+            except requests.ConnectionError as e:
+                if last_attempt:
+                    raise NimConnectionError(f"Connection failed after {attempt + 1} attempt(s): {e}", url) from e
+                delay, reason = self._backoff(attempt), "unreachable"
+            else:
+                if response.ok:
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                    s.set(status=response.status_code)
+                    raise NimHTTPError(url, response.status_code, response.text)
+                delay, reason = self._backoff(attempt, response), f"returned {response.status_code}"
+            print(f"{url} {reason}, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def model_version(self, host: str) -> str:
+        """
+        Version reported by the NIM at host (v1/version), used to key cached results.
+        """
+        if host not in self._model_versions:
+            try:
+                response = self.session(host).get(f"{host}/v1/version", timeout=(self.connect_timeout, self.connect_timeout))
+                response.raise_for_status()
+                self._model_versions[host] = json.dumps(response.json(), sort_keys=True)
+            except (requests.RequestException, ValueError):
+                return "unknown"  # not remembered, so the next call asks again
+        return self._model_versions[host]
+
+    def cache_key(self, url: str, payload: Dict[str, Any], seed: Optional[int] = None) -> str:
+        host = origin(url)
+        return cache_key(url[len(host):], payload, self.model_version(host), seed)
+
+    def post_json(self,
+                  url: str,
+                  payload: Dict[str, Any],
+                  seed: Optional[int] = None,
+                  max_retries: Optional[int] = None,
+                  parse: bool = False) -> Any:
+        """
+        POST a JSON payload and return the raw response body, served from the result cache when possible.
+        With parse=True the parsed response is returned instead; without a cache it is read with read_json.
+        """
+        with span(f"nim.{model_name(url)}", url=url) as s:
+            if self.cache is None:
+                with self.slot(url, payload):
+                    if not parse:
+                        return self.post(url, json=payload, max_retries=max_retries).content
+                    with self.post(url, json=payload, max_retries=max_retries, stream=True) as response:
+                        try:
+                            return read_json(response)
+                        except requests.RequestException as e:
+                            raise NimConnectionError(f"Response stream broken: {e}", url) from e
+            key = self.cache_key(url, payload, seed)
+            body = None if self.refresh else self.cache.get(key)
+            if body is not None:
+                s.set(cache="hit", response_bytes=len(body))
+            else:
+                s.set(cache="miss")
+                with self.slot(url, payload):
+                    body = self.post(url, json=payload, max_retries=max_retries).content
+                self.cache.put(key, body)
+            if not parse:
+                return body
+            text = body.decode()
+            del body  # the bytes go before the parsed fields are built
+            return json.loads(text)
+
+    def post_json_to_file(self,
+                          url: str,
+                          payload: Dict[str, Any],
+                          path: str,
+                          seed: Optional[int] = None,
+                          max_retries: Optional[int] = None) -> int:
+        """
+        post_json, but the response body is streamed to path in chunks (never held in memory whole).
+        Returns the number of bytes written.
+        """
+        with span(f"nim.{model_name(url)}", url=url, file=path) as s:
+            key = self.cache_key(url, payload, seed) if self.cache is not None else None
+            if key is not None and not self.refresh and self.cache.get_file(key, path):
+                s.set(cache="hit", response_bytes=os.path.getsize(path))
+                return os.path.getsize(path)
+            s.set(cache="miss" if key is not None else "off")
+            tmp = f"{path}.part"
+            n_bytes = 0
+            try:
+                with self.slot(url, payload), self.post(url, json=payload, max_retries=max_retries, stream=True) as response, open(tmp, "wb") as f:
+                    for chunk in response.iter_content(STREAM_CHUNK_BYTES):
+                        f.write(chunk)
+                        n_bytes += len(chunk)
+            except requests.RequestException as e:
+                raise NimConnectionError(f"Response stream broken after {n_bytes} bytes: {e}", url) from e
+            os.replace(tmp, path)  # a broken stream never leaves a truncated file at path
+            if key is not None:
+                self.cache.put_file(key, path)
+            s.set(response_bytes=n_bytes)
+            return n_bytes
+
+    def post_nim(self,
+                 payload: Dict[str, Any],
+                 nim_endpoint: str,
+                 nim_port: int,
+                 base_url: Optional[str] = None,
+                 seed: Optional[int] = None,
+                 path: Optional[str] = None,
+                 parse: bool = False) -> Any:
+        """
+        post_json to a model's endpoint (or post_json_to_file when path is given, returning None).
+        With replicas configured for nim_port (and no explicit base_url), the request goes to the least
+        loaded healthy replica; a replica that cannot be reached is ejected and the request moves on to
+        the next one.
+        """
+        def send(url: str, max_retries: Optional[int] = None) -> Any:
+            if path is None:
+                return self.post_json(url, payload, seed=seed, max_retries=max_retries, parse=parse)
+            self.post_json_to_file(url, payload, path, seed=seed, max_retries=max_retries)
+            return None
+
+        pool = self.router.pool(nim_port) if base_url is None else None
+        if pool is None:
+            return send(self.url(nim_endpoint, nim_port, base_url))
+        tried = []
+        while True:
+            with pool.acquire(exclude=tried) as replica:
+                if replica is None:
+                    raise NimConnectionError(f"No reachable {pool.name} replica (tried {', '.join(tried)})", nim_endpoint)
+                # fail over at once while another healthy replica is left; the last one gets the full retries
+                others = [r for r in pool.healthy() if r.origin not in tried and r is not replica]
+                try:
+                    return send(f"{replica.origin}/{nim_endpoint}", max_retries=0 if others else None)
+                except NimConnectionError as e:
+                    self.router.eject(pool, replica.origin, str(e))
+                    tried.append(replica.origin)
+
+    def query(self,
+              payload: Dict[str, Any],
+              nim_endpoint: str,
+              nim_port: int = 8080,
+              base_url: Optional[str] = None,
+              echo: bool = False,
+              seed: Optional[int] = None) -> Tuple[int, Dict]:
+        """
+        POST a JSON payload to a NIM endpoint and return (status_code, response JSON).
+        """
+        function_url = self.url(nim_endpoint, nim_port, base_url)
+        if echo:
+            print("*"*80)
+            print(f"\tURL: {function_url}")
+            print(f"\tPayload: {payload}")
+            print("*"*80)
+        return 200, self.post_nim(payload, nim_endpoint, nim_port, base_url, seed=seed, parse=True)
+
+    def check_readiness(self,
+                        nim_port: int,
+                        base_url: Optional[str] = None,
+                        endpoint: str = "v1/health/ready") -> bool:
+        """
+        Return true if a NIM is ready. Never retries or raises: this is a probe.
+        With replicas configured for nim_port, every replica is probed (failing ones are ejected)
+        and the result is true if any of them is ready.
+        """
+        pool = self.router.pool(nim_port) if base_url is None else None
+        if pool is not None:
+            return self.router.probe_all(nim_port)
+        return self.probe(self.url(endpoint, nim_port, base_url))
+
+    def probe(self, url: str, verbose: bool = True) -> bool:
+        """
+        GET a readiness URL (a bare "scheme://host:port" origin gets v1/health/ready appended).
+        """
+        if url == origin(url):
+            url = f"{url}/v1/health/ready"
+        try:
+            response = self.session(origin(url)).get(url, timeout=(self.connect_timeout, self.connect_timeout))
+            d = response.json()
+            if "status" in d:
+                if d["status"] == "ready":
+                    return True
+            return False
+        except Exception as e:
+            if verbose:
+                print(e)
+            return False
+
+    def wait_until_ready(self,
+                         services: Dict[str, int],
+                         timeout: float = 1200.0,
+                         poll_interval: float = 5.0,
+                         warmup: Optional[Dict[str, Tuple[str, Dict[str, Any]]]] = None,
+                         base_url: Optional[str] = None) -> Dict[str, float]:
+        """
+        Poll v1/health/ready of every service ({"RFDiffusion": 8082, ...}, every replica of routed ones)
+        concurrently until all are ready, then optionally POST one small warm-up request per service
+        ({"RFDiffusion": (nim_endpoint, payload)}) so the first real request does not pay the load cost.
+        Returns the seconds each service took to become ready; raises NimTimeoutError after timeout.
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        warmup = warmup or {}
+        targets: List[Tuple[str, str]] = []
+        for name, nim_port in services.items():
+            pool = self.router.pool(nim_port) if base_url is None else None
+            origins = [r.origin for r in pool.replicas] if pool is not None else [origin(self.url("", nim_port, base_url))]
+            targets += [(name, o) for o in origins]
+
+        ready_at: Dict[str, float] = {}  # a routed service is ready as soon as its first replica is
+
+        def wait_one(name: str, host: str) -> Optional[float]:
+            while not self.probe(host, verbose=False):
+                if name in ready_at or time.monotonic() + poll_interval > deadline:
+                    return None  # slow replicas of a ready service are left to the router's re-probe
+                time.sleep(poll_interval)
+            ready_after = time.monotonic() - start
+            with self._lock:
+                ready_at.setdefault(name, ready_after)
+            if name in warmup:
+                nim_endpoint, payload = warmup[name]
+                warmup_start = time.monotonic()
+                self.post(f"{host}/{nim_endpoint}", json=payload)  # not cached: the point is to run the model
+                print(f"{name} warm-up on {host} took {time.monotonic() - warmup_start:.1f}s")
+            return ready_after
+
+        with ThreadPoolExecutor(max_workers=len(targets) or 1) as pool_executor:
+            results = list(pool_executor.map(lambda t: wait_one(*t), targets))
+
+        for (name, host), ready_after in zip(targets, results):
+            pool = self.router.pool(services[name]) if base_url is None else None
+            if ready_after is None and pool is not None:
+                self.router.eject(pool, host, "not ready at startup")
+        for name in services:
+            if name in ready_at:
+                print(f"{name} ready: True (after {ready_at[name]:.1f}s)")
+            else:
+                print(f"{name} ready: False (gave up after {timeout:.0f}s)")
+        missing = [name for name in services if name not in ready_at]
+        if missing:
+            raise NimTimeoutError(f"{', '.join(missing)} not ready after {timeout:.0f}s", base_url or self.base_url)
+        return {name: ready_at[name] for name in services}
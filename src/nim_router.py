@@ -0,0 +1,166 @@
+# Client-side routing over several replicas of the same NIM
+#   - each model (RFdiffusion, ProteinMPNN, AF2-Multimer) can have a list of replica origins, e.g. a
+#     second RFdiffusion container on another GPU: "http://localhost:8082,http://gpu1:8082"
+#   - requests go to the healthy replica with the fewest outstanding requests
+#   - a replica that fails its readiness probe or drops connections is ejected, and a background
+#     thread re-probes ejected replicas and puts them back once they report ready
+#
+# Replicas come from the environment, one comma-separated variable per model
+#   NIM_RFDIFFUSION_URLS, NIM_PROTEINMPNN_URLS, NIM_AF2_MULTIMER_URLS
+# or from a JSON file named by NIM_REPLICAS_CONFIG: {"RFDIFFUSION": ["http://localhost:8082", ...], ...}
+# A model without replicas is not routed and keeps using base_url:port.
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+REPLICAS_CONFIG_ENV = "NIM_REPLICAS_CONFIG"
+
+class Replica:
+    def __init__(self, origin: str):
+        self.origin = origin.rstrip("/")
+        self.outstanding = 0
+        self.served = 0
+        self.healthy = True
+
+class ReplicaPool:
+    """
+    Least-outstanding-requests selection over the replicas of one model.
+    """
+    def __init__(self, name: str, origins: List[str]):
+        if not origins:
+            raise ValueError(f"No replicas given for {name}")
+        self.name = name
+        self.replicas = [Replica(o) for o in origins]
+        self._lock = threading.Lock()
+
+    def healthy(self) -> List[Replica]:
+        with self._lock:
+            return [r for r in self.replicas if r.healthy]
+
+    def ejected(self) -> List[Replica]:
+        with self._lock:
+            return [r for r in self.replicas if not r.healthy]
+
+    def _pick(self, exclude: List[str]) -> Optional[Replica]:
+        candidates = [r for r in self.replicas if r.origin not in exclude]
+        healthy = [r for r in candidates if r.healthy]
+        # with every replica ejected, still try one rather than fail before the re-probe catches up
+        pool = healthy or candidates
+        if not pool:
+            return None
+        return min(pool, key=lambda r: (r.outstanding, r.served))
+
+    @contextmanager
+    def acquire(self, exclude: List[str] = ()) -> Iterator[Optional[Replica]]:
+        """
+        Reserve the least loaded replica (not in exclude) for one request; yields None if none is left.
+        """
+        with self._lock:
+            replica = self._pick(list(exclude))
+            if replica is not None:
+                replica.outstanding += 1
+                replica.served += 1
+        try:
+            yield replica
+        finally:
+            if replica is not None:
+                with self._lock:
+                    replica.outstanding -= 1
+
+    def set_healthy(self, origin: str, healthy: bool) -> bool:
+        """
+        Mark a replica healthy or ejected; returns true if its state changed.
+        """
+        with self._lock:
+            for r in self.replicas:
+                if r.origin == origin and r.healthy != healthy:
+                    r.healthy = healthy
+                    return True
+        return False
+
+class NimRouter:
+    """
+    Replica pools keyed by NIM port (the scripts address a model by its NIM_PORTS value), plus the
+    background re-probe of ejected replicas.
+    """
+    def __init__(self,
+                 pools: Dict[int, ReplicaPool],
+                 probe: Optional[Callable[[str], bool]] = None,
+                 reprobe_interval: float = 15.0):
+        self.pools = pools
+        self.probe = probe
+        self.reprobe_interval = reprobe_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, models: Dict[str, int], environ: Optional[Dict[str, str]] = None, **kwargs) -> "NimRouter":
+        """
+        Build pools for models ({"RFDIFFUSION": 8082, ...}) from NIM_<MODEL>_URLS or the NIM_REPLICAS_CONFIG file.
+        """
+        environ = os.environ if environ is None else environ
+        config = {}
+        if environ.get(REPLICAS_CONFIG_ENV):
+            with open(environ[REPLICAS_CONFIG_ENV]) as f:
+                config = json.load(f)
+        pools = {}
+        for model, port in models.items():
+            origins = config.get(model, [])
+            if environ.get(f"NIM_{model}_URLS"):
+                origins = [o.strip() for o in environ[f"NIM_{model}_URLS"].split(",") if o.strip()]
+            if origins:
+                pools[port] = ReplicaPool(model, origins)
+        return cls(pools, **kwargs)
+
+    def pool(self, nim_port: int) -> Optional[ReplicaPool]:
+        return self.pools.get(nim_port)
+
+    def eject(self, pool: ReplicaPool, origin: str, reason: str):
+        if pool.set_healthy(origin, False):
+            print(f"Ejected {pool.name} replica {origin}: {reason}")
+        self._start_reprobe()
+
+    def readmit(self, pool: ReplicaPool, origin: str):
+        if pool.set_healthy(origin, True):
+            print(f"{pool.name} replica {origin} is ready again")
+
+    def probe_all(self, nim_port: int) -> bool:
+        """
+        Probe every replica of a model now, ejecting or readmitting each; true if any is ready.
+        """
+        pool = self.pools[nim_port]
+        ready = False
+        for replica in pool.replicas:
+            if self.probe is not None and self.probe(replica.origin):
+                self.readmit(pool, replica.origin)
+                ready = True
+            else:
+                self.eject(pool, replica.origin, "not ready")
+        return ready
+
+    def _start_reprobe(self):
+        if self.probe is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._reprobe_loop, name="nim-reprobe", daemon=True)
+                self._thread.start()
+
+    def _reprobe_loop(self):
+        while not self._stop.wait(self.reprobe_interval):
+            with self._lock:
+                ejected = [(pool, r.origin) for pool in self.pools.values() for r in pool.ejected()]
+                if not ejected:
+                    self._thread = None  # restarted by the next ejection
+                    return
+            for pool, origin in ejected:
+                if self.probe(origin):
+                    self.readmit(pool, origin)
+
+    def close(self):
+        self._stop.set()
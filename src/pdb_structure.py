@@ -0,0 +1,138 @@
+# Columnar PDB structures backed by NumPy arrays
+# The PDB text is parsed once: all ATOM/HETATM lines are packed into one fixed-width byte matrix and
+# every column (atom name, residue number, chain, xyz, B-factor/pLDDT) is sliced out of it in bulk,
+# instead of slicing each line in a Python loop. Selections are boolean masks over those arrays, and
+# serialization writes the selected original lines back, so unmodified records round-trip exactly.
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+LINE_WIDTH = 80
+
+THREE_TO_ONE = {
+    "ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C",
+    "GLN": "Q", "GLU": "E", "GLY": "G", "HIS": "H", "ILE": "I",
+    "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F", "PRO": "P",
+    "SER": "S", "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V",
+}
+
+def _text_column(buf: np.ndarray, start: int, end: int) -> np.ndarray:
+    """
+    Columns [start, end) of every row as stripped str values.
+    """
+    raw = np.ascontiguousarray(buf[:, start:end]).view(f"S{end - start}").ravel()
+    return np.char.strip(np.char.decode(raw, "ascii"))
+
+def _number_column(buf: np.ndarray, start: int, end: int, dtype=np.float64) -> np.ndarray:
+    """
+    Columns [start, end) of every row parsed as numbers; blank fields become 0.
+    """
+    raw = np.ascontiguousarray(buf[:, start:end])
+    blank = (raw == ord(" ")).all(axis=1)
+    raw[blank, -1] = ord("0")
+    return raw.view(f"S{end - start}").ravel().astype(np.float64).astype(dtype)
+
+class Structure:
+    """
+    Atom records of a PDB as parallel NumPy arrays. All arrays have one entry per atom.
+    """
+    def __init__(self, lines: np.ndarray):
+        self.lines = lines  # original record lines, bytes
+        n = len(lines)
+        buf = np.zeros((n, LINE_WIDTH), dtype=np.uint8)
+        if n:
+            packed = lines.astype(f"S{LINE_WIDTH}").view(np.uint8).reshape(n, LINE_WIDTH)
+            buf[:] = np.where(packed == 0, ord(" "), packed)  # short lines are padded with blanks
+        self.record = _text_column(buf, 0, 6)
+        self.atom_name = _text_column(buf, 12, 16)
+        self.res_name = _text_column(buf, 17, 20)
+        self.chain = _text_column(buf, 21, 22)
+        self.res_num = _number_column(buf, 22, 26, np.int64)
+        self.xyz = np.stack([_number_column(buf, 30, 38), _number_column(buf, 38, 46), _number_column(buf, 46, 54)], axis=1) if n else np.zeros((0, 3))
+        self.occupancy = _number_column(buf, 54, 60)
+        self.b_factor = _number_column(buf, 60, 66)  # pLDDT for AlphaFold2 models
+
+    @classmethod
+    def from_pdb_text(cls, pdb_text: str) -> "Structure":
+        lines = np.array(pdb_text.encode().splitlines() or [b""])
+        keep = np.char.startswith(lines, b"ATOM") | np.char.startswith(lines, b"HETATM")
+        return cls(lines[keep])
+
+    @classmethod
+    def from_file(cls, path: str) -> "Structure":
+        return cls.from_pdb_text(Path(path).read_text())
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    @property
+    def plddt(self) -> np.ndarray:
+        return self.b_factor
+
+    ##############################################################
+    # Selections (all return a new Structure)
+    ##############################################################
+    def select(self, mask: np.ndarray) -> "Structure":
+        sub = Structure.__new__(Structure)
+        for field, value in self.__dict__.items():
+            setattr(sub, field, value[mask])
+        return sub
+
+    def atoms_only(self) -> "Structure":
+        return self.select(self.record == "ATOM")
+
+    def ca(self) -> "Structure":
+        return self.select((self.record == "ATOM") & (self.atom_name == "CA"))
+
+    def chains(self, *chain_ids: str) -> "Structure":
+        return self.select(np.isin(self.chain, chain_ids))
+
+    def residue_range(self, start: int, end: int, chain_id: Optional[str] = None) -> "Structure":
+        """
+        Residues start..end inclusive, optionally restricted to one chain.
+        """
+        mask = (self.res_num >= start) & (self.res_num <= end)
+        if chain_id is not None:
+            mask &= self.chain == chain_id
+        return self.select(mask)
+
+    def renumbered(self, numbering: Dict[Tuple[str, int], int]) -> "Structure":
+        """
+        Residue numbers (columns 23-26) rewritten through numbering[(chain, old number)]; insertion codes are cleared.
+        Residues missing from numbering keep their number.
+        """
+        new_nums = np.array([numbering.get((c, int(n)), int(n)) for c, n in zip(self.chain, self.res_num)], dtype=np.int64)
+        sub = self.select(np.ones(len(self), dtype=bool))
+        sub.lines = np.array([line[:22] + b"%4d " % n + line[27:] for line, n in zip(self.lines.tolist(), new_nums)] or [b""])[:len(self)]
+        sub.res_num = new_nums
+        return sub
+
+    ##############################################################
+    # Summaries
+    ##############################################################
+    def chain_ids(self) -> list:
+        _, first = np.unique(self.chain, return_index=True)
+        return [str(self.chain[i]) for i in np.sort(first)]
+
+    def sequence(self, chain_id: Optional[str] = None) -> str:
+        ca = self.ca() if chain_id is None else self.ca().chains(chain_id)
+        return "".join(THREE_TO_ONE.get(r, "X") for r in ca.res_name)
+
+    def mean_plddt(self) -> float:
+        """
+        Average B-factor over CA atoms (the average pLDDT of an AlphaFold2 model).
+        """
+        ca = self.ca()
+        return float(ca.b_factor.mean()) if len(ca) else 0.0
+
+    def chain_plddt(self) -> Dict[str, float]:
+        ca = self.ca()
+        return {c: float(ca.b_factor[ca.chain == c].mean()) for c in ca.chain_ids()}
+
+    ##############################################################
+    # Serialization
+    ##############################################################
+    def to_pdb(self) -> str:
+        return b"\n".join(self.lines.tolist()).decode()
@@ -0,0 +1,106 @@
+# Streaming stage pipeline: stages joined by bounded queues, each with its own worker threads
+#   RFdiffusion -> ProteinMPNN -> AF2-Multimer
+# Every stage function takes one item and yields zero or more items for the next stage, so each
+# ProteinMPNN sequence reaches the multimer stage while other backbones are still diffusing.
+# A full queue blocks the upstream workers (backpressure), so a slow GPU never gets buried in work.
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Tuple
+
+from tracing import span
+
+_DONE = object()  # end-of-stream marker, one per downstream worker
+
+class Stage:
+    def __init__(self,
+                name: str,
+                fn: Callable[[Any], Iterable[Any]],
+                concurrency: int = 1,
+                queue_size: int = 4):
+        self.name = name
+        self.fn = fn
+        self.concurrency = concurrency  # requests this stage keeps in flight
+        self.queue_size = queue_size  # items buffered in front of this stage before upstream blocks
+        self.n_in = 0
+        self.n_out = 0
+        self.busy_seconds = 0.0
+
+class Pipeline:
+    """
+    Run items through a linear chain of Stages concurrently.
+    A failing item is recorded in errors as (stage name, item, exception) and dropped; the rest continue.
+    """
+    def __init__(self, stages: List[Stage], on_error: Callable[[str, Any, Exception], None] = None):
+        self.stages = stages
+        self.on_error = on_error
+        self.errors: List[Tuple[str, Any, Exception]] = []
+        self._lock = threading.Lock()
+
+    def _worker(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue, remaining: List[int], next_concurrency: int):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                with span(f"stage.{stage.name}") as s:
+                    blocked = 0.0
+                    for out in stage.fn(item):
+                        put_start = time.perf_counter()
+                        outbox.put(out)  # blocks while the next stage is saturated
+                        blocked += time.perf_counter() - put_start
+                        with self._lock:
+                            stage.n_out += 1
+                    s.set(backpressure_s=round(blocked, 6))
+            except Exception as e:
+                with self._lock:
+                    self.errors.append((stage.name, item, e))
+                if self.on_error is not None:
+                    self.on_error(stage.name, item, e)
+            finally:
+                with self._lock:
+                    stage.n_in += 1
+                    stage.busy_seconds += time.perf_counter() - start
+        # the last worker of a stage closes the stream for the next one
+        with self._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            for _ in range(next_concurrency):
+                outbox.put(_DONE)
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """
+        Feed items into the first stage and return everything the last stage yields.
+        """
+        inboxes = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results = queue.Queue()  # the sink is unbounded; the last stage writes its own outputs
+        threads = []
+        for i, stage in enumerate(self.stages):
+            outbox = inboxes[i + 1] if i + 1 < len(self.stages) else results
+            next_concurrency = self.stages[i + 1].concurrency if i + 1 < len(self.stages) else 1
+            remaining = [stage.concurrency]
+            for n in range(stage.concurrency):
+                t = threading.Thread(target=self._worker, name=f"{stage.name}-{n}", daemon=True,
+                                     args=(stage, inboxes[i], outbox, remaining, next_concurrency))
+                t.start()
+                threads.append(t)
+
+        for item in items:
+            inboxes[0].put(item)
+        for _ in range(self.stages[0].concurrency):
+            inboxes[0].put(_DONE)
+        for t in threads:
+            t.join()
+
+        outputs = []
+        while True:
+            out = results.get()
+            if out is _DONE:
+                return outputs
+            outputs.append(out)
+
+    def summary(self) -> str:
+        return ", ".join(f"{s.name}: {s.n_in} in / {s.n_out} out, {s.busy_seconds:.0f}s busy" for s in self.stages)
@@ -0,0 +1,111 @@
+# On-disk, content-addressed cache of NIM responses
+#   key   = sha256(endpoint, canonical JSON payload, model version, seed)
+#   value = raw response body (JSON or PDB text) stored under <cache_dir>/<key[:2]>/<key>.body
+# Entries are evicted least-recently-used first once the cache grows past max_bytes;
+# a hit refreshes the file mtime, which is what the LRU order is based on.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/nim_results")
+
+def canonical_payload(payload: Dict[str, Any]) -> str:
+    """
+    Serialize a payload so that equal requests always produce the same bytes.
+    """
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def cache_key(endpoint: str,
+              payload: Dict[str, Any],
+              model_version: str = "unknown",
+              seed: Optional[int] = None) -> str:
+    h = hashlib.sha256()
+    for part in (endpoint.strip("/"), canonical_payload(payload), model_version, "" if seed is None else str(seed)):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of response bodies on local disk. Safe to share between threads.
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 20 * 1024**3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = sum(p.stat().st_size for p in self.cache_dir.glob("*/*.body"))
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.body"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            body = path.read_bytes()
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    def get_file(self, key: str, dest: str) -> bool:
+        """
+        Copy a cached body to dest without loading it into memory; false on a miss.
+        """
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, dest)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, key: str, body: bytes):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        tmp.write_bytes(body)
+        self._commit(tmp, path)
+
+    def put_file(self, key: str, src: str):
+        """
+        put() for a body that is already on disk (a streamed response).
+        """
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        shutil.copyfile(src, tmp)
+        self._commit(tmp, path)
+
+    def _commit(self, tmp: Path, path: Path):
+        size = tmp.stat().st_size
+        with self._lock:
+            if path.exists():
+                self._total_bytes -= path.stat().st_size
+            os.replace(tmp, path)  # atomic, so readers never see a partial entry
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self.cache_dir.glob("*/*.body"), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.cache_dir.glob("*/*.body"))
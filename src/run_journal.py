@@ -0,0 +1,77 @@
+# Append-only run journal (JSONL) of completed units of work: backbones, sequence sets and folds
+# Every completed unit is appended and fsync'ed as soon as it finishes, so a run that dies halfway
+# (network blip, OOM, preempted node) can be restarted and only the missing units are redone.
+# An output file is recorded with its SHA-256, so a file that a later run overwrote with something
+# else (another pair in the same structure_pair_{idx}.pdb) no longer counts as the unit's result.
+#
+# {"kind": "fold", "key": "9f2c...", "time": 1714000000.0, "file": "output1/structure_pair_3.pdb", "sha256": "4b1e...", ...}
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+def unit_key(*parts: str) -> str:
+    """
+    Stable key for a unit of work, e.g. unit_key(binder, target) for a fold.
+    """
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:32]
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class RunJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: Dict[tuple, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by a crash; that unit is simply redone
+                    self._done[(entry["kind"], entry["key"])] = entry
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a")
+
+    def done(self, kind: str, key: str, **expected: Any) -> Optional[Dict[str, Any]]:
+        """
+        The journal entry of a completed unit, or None if it still has to run.
+        An entry whose output "file" no longer exists, or no longer has the recorded content, does not count as done,
+        nor does one recorded with other values of the expected fields (e.g. crop_radius=10.0; a missing field is None).
+        """
+        entry = self._done.get((kind, key))
+        if entry is not None and any(entry.get(field) != value for field, value in expected.items()):
+            return None
+        if entry is not None and "file" in entry:
+            if not os.path.exists(entry["file"]):
+                return None
+            if "sha256" in entry and file_sha256(entry["file"]) != entry["sha256"]:
+                return None
+        return entry
+
+    def record(self, kind: str, key: str, **data: Any):
+        entry = dict(kind=kind, key=key, time=time.time(), **data)
+        if entry.get("file") and os.path.exists(entry["file"]):
+            entry["sha256"] = file_sha256(entry["file"])
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._done[(kind, key)] = entry
+
+    def count(self, kind: str) -> int:
+        return sum(1 for k, _ in self._done if k == kind)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
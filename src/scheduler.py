@@ -0,0 +1,213 @@
+# Adaptive concurrency and batch sizing from observed NIM service times
+#   - AdaptiveLimit: an AIMD limit on the requests one model may have in flight. Every call is timed;
+#     while the smoothed service time stays within `tolerance` x the best seen (the GPU is not queueing),
+#     the limit grows by one per limit's worth of calls that found it full. When service time climbs
+#     past that (requests are waiting on the GPU) or a call times out / gets 429 or 503, the limit is
+#     cut by `backoff`, at most once per limit's worth of completions.
+#     ProteinMPNN calls grow with their batches, so its limit times each call as a multiple of the
+#     time the batch sizer expects for that batch without queueing (fit of the calls that ran alone),
+#     and does not grow before that fit exists.
+#   - BatchSizer: picks ProteinMPNN num_seq_per_target per call from a least-squares fit of call time
+#     = fixed + per-sequence x n over recent calls, as large as fits in target_seconds (well inside the
+#     read timeout), starting small and doubling until the fit has two batch sizes to go on.
+#   - AdaptiveScheduler: one AdaptiveLimit per model, the batch sizer and a summary of both. Set as
+#     NimClient.scheduler, it gates every request that actually reaches a NIM (cache hits are not
+#     timed), keyed by model_name(url).
+# The limits start at 1 and find each node's level on their own, so the same job file runs on a
+# 2 x L40S and a 4 x A100 node without hand-tuned --*_workers.
+#
+#   nim_client.scheduler = AdaptiveScheduler(MODELS, max_in_flight=8)
+#   nim_client.post_nim(...)                       # waits for an af2_multimer / proteinmpnn / ... slot
+#   print(nim_client.scheduler.summary())
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from nim_client import NimConnectionError, NimHTTPError, NimTimeoutError
+
+OVERLOAD_CODES = (429, 503)
+MODELS = ["rfdiffusion", "proteinmpnn", "af2_multimer", "msa_search"]  # model_name() of the NIM endpoints
+
+class AdaptiveLimit:
+    def __init__(self,
+                 name: str,
+                 initial: int = 1,
+                 min_limit: int = 1,
+                 max_limit: int = 16,
+                 tolerance: float = 1.5,
+                 backoff: float = 0.7,
+                 smoothing: float = 0.3,
+                 relative: bool = False):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance  # service time above tolerance x baseline counts as queueing
+        self.backoff = backoff  # multiplicative decrease
+        self.smoothing = smoothing  # EWMA weight of the newest service time
+        self.relative = relative  # time calls against the expected seconds acquire() is given, not in seconds
+        self.in_flight = 0
+        self.waiting = 0  # callers blocked in acquire (this model's queue depth)
+        self.ewma_s = None
+        self.baseline_s = None
+        self.completed = 0
+        self.started = 0
+        self.decreases = 0
+        self._full_calls = 0  # calls that started with the limit in use, since the last increase
+        self._since_change = 0
+        self._cond = threading.Condition()
+
+    @property
+    def current(self) -> int:
+        return max(self.min_limit, min(self.max_limit, int(self.limit)))
+
+    @contextmanager
+    def acquire(self, expected_s: Optional[float] = None) -> Iterator[Callable[[], bool]]:
+        """
+        Hold one of the limit's slots for a call; blocks while the model is at its limit. The call is timed
+        (with a relative limit, as a multiple of expected_s; a call without one only counts for overload
+        and never grows the limit), and an overload error (timeout, dropped connection, 429/503) cuts the limit. Yields
+        alone(): whether no other call of the model has been in flight since this one started.
+        """
+        with self._cond:
+            self.waiting += 1
+            while self.in_flight >= self.current:
+                self._cond.wait()
+            self.waiting -= 1
+            self.in_flight += 1
+            self.started += 1
+            first = self.started if self.in_flight == 1 else None
+            was_full = self.in_flight >= self.current
+        start = time.perf_counter()
+        overloaded = False
+        try:
+            yield lambda: first == self.started
+        except (NimTimeoutError, NimConnectionError):
+            overloaded = True
+            raise
+        except NimHTTPError as e:
+            overloaded = e.status_code in OVERLOAD_CODES
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            if self.relative:
+                seconds = seconds / expected_s if expected_s is not None and expected_s > 0 else None
+            self._complete(seconds, overloaded, was_full)
+
+    def _complete(self, seconds: Optional[float], overloaded: bool, was_full: bool):
+        with self._cond:
+            self.in_flight -= 1
+            self.completed += 1
+            self._since_change += 1
+            if not overloaded and seconds is not None:
+                self.ewma_s = seconds if self.ewma_s is None else self.smoothing * seconds + (1 - self.smoothing) * self.ewma_s
+                # the best smoothed time seen, drifting slowly up so a lasting change (longer targets) is not queueing forever
+                self.baseline_s = self.ewma_s if self.baseline_s is None else min(self.ewma_s, self.baseline_s + 0.01 * (self.ewma_s - self.baseline_s))
+                if self.relative:
+                    self.baseline_s = min(self.baseline_s, 1.0)  # 1 x expected is a call that did not queue
+            queueing = self.ewma_s is not None and self.ewma_s > self.tolerance * self.baseline_s
+            if (overloaded or queueing) and self._since_change >= self.current and self.limit > self.min_limit:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                self.decreases += 1
+                self._since_change = 0
+                self._full_calls = 0
+            elif not (overloaded or queueing) and was_full and seconds is not None:  # no growth before calls can be judged
+                self._full_calls += 1
+                if self._full_calls >= self.current and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._full_calls = 0
+                    self._since_change = 0
+            self._cond.notify_all()
+
+    def describe(self) -> str:
+        unit = "x expected" if self.relative else "s"
+        ewma = f"{self.ewma_s:.2f}{unit}" if self.ewma_s is not None else "-"
+        baseline = f"{self.baseline_s:.2f}{unit}" if self.baseline_s is not None else "-"
+        return (f"{self.name}: limit {self.current}, {self.in_flight} in flight, {self.waiting} waiting, "
+                f"service {ewma} (best {baseline}), {self.completed} calls, {self.decreases} cuts")
+
+class BatchSizer:
+    def __init__(self, target_seconds: float = 120.0, min_batch: int = 1, max_batch: int = 64, initial: int = 2, history: int = 32):
+        self.target_seconds = target_seconds
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.initial = initial
+        self._samples: Deque[Tuple[int, float]] = deque(maxlen=history)
+        self._alone: Deque[Tuple[int, float]] = deque(maxlen=history)  # calls that had the GPU to themselves
+        self._lock = threading.Lock()
+
+    def record(self, batch: int, seconds: float, alone: bool = False):
+        with self._lock:
+            self._samples.append((batch, seconds))
+            if alone:
+                self._alone.append((batch, seconds))
+
+    def fit(self, alone: bool = False) -> Tuple[float, float]:
+        """
+        (fixed seconds, seconds per sequence) from the recent calls (alone: only those with no other call in
+        flight); per-sequence is NaN until two batch sizes were seen.
+        """
+        with self._lock:
+            samples = np.array(self._alone if alone else self._samples, dtype=np.float64).reshape(-1, 2)
+        if len(np.unique(samples[:, 0])) < 2:
+            return float("nan"), float("nan")
+        per_seq, fixed = np.polyfit(samples[:, 0], samples[:, 1], 1)
+        return max(float(fixed), 0.0), max(float(per_seq), 1e-6)
+
+    def predict(self, batch: int) -> Optional[float]:
+        """
+        Seconds a call of batch sequences takes without other calls in flight (the fit of the calls that ran
+        alone, so queueing behind other calls is not learnt as service time); None until it has two batch sizes.
+        """
+        fixed, per_seq = self.fit(alone=True)
+        return None if np.isnan(per_seq) else fixed + per_seq * batch
+
+    def next(self, remaining: int) -> int:
+        """
+        Sequences for the next call, at most remaining.
+        """
+        fixed, per_seq = self.fit()
+        if np.isnan(per_seq):
+            with self._lock:
+                largest = max((b for b, _ in self._samples), default=0)
+                too_slow = any(s > self.target_seconds for _, s in self._samples)
+            batch = self.initial if largest == 0 else (largest if too_slow else 2 * largest)
+        else:
+            batch = int((self.target_seconds - fixed) / per_seq)
+        return max(1, min(remaining, max(self.min_batch, min(self.max_batch, batch))))
+
+class AdaptiveScheduler:
+    def __init__(self, models: List[str] = MODELS, max_in_flight: int = 16, target_call_seconds: float = 120.0, max_batch: int = 64):
+        # ProteinMPNN call time grows with the batch sizer's batches, so its limit times calls against the
+        # fit's prediction for their batch instead of in seconds, or bigger batches would look like queueing
+        self.limits: Dict[str, AdaptiveLimit] = {m: AdaptiveLimit(m, max_limit=max_in_flight, relative=m == "proteinmpnn") for m in models}
+        self.batch = BatchSizer(target_call_seconds, max_batch=max_batch)
+
+    @contextmanager
+    def slot(self, model: str, payload: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+        """
+        Hold a slot of the model's limit for one request; a successful ProteinMPNN request also feeds the batch sizer.
+        """
+        limit = self.limits.get(model)
+        if limit is None:
+            yield
+            return
+        batch = payload.get("num_seq_per_target", 1) if model == "proteinmpnn" and payload is not None else None
+        expected_s = self.batch.predict(batch) if batch is not None else None
+        with limit.acquire(expected_s) as alone:
+            start = time.perf_counter()
+            yield
+            if batch is not None:
+                self.batch.record(batch, time.perf_counter() - start, alone())
+
+    def summary(self) -> str:
+        fixed, per_seq = self.batch.fit()
+        lines = [limit.describe() for limit in self.limits.values()]
+        if not np.isnan(per_seq):
+            lines.append(f"proteinmpnn batch: {fixed:.2f}s + {per_seq:.3f}s/sequence, next batch {self.batch.next(self.batch.max_batch)}")
+        return "\n".join(lines)
@@ -0,0 +1,107 @@
+# Post-fold scoring and ranking of AF2-Multimer binder-target complexes
+#   - mean / per-chain pLDDT (CA B-factors)
+#   - interface pLDDT, binder-target CA contact count and interface CA distances
+# Each PDB is scored in a worker process (files are read in the worker, only the small score dict
+# comes back), and the results are written as one table ranked by interface pLDDT.
+#
+# python scoring.py output1/ --out output1/5_ranking.tsv --workers 16
+
+import argparse
+import csv
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from pdb_structure import Structure
+
+COLUMNS = ["rank", "file", "binder_chain", "binder_length", "binder_sequence", "mean_plddt", "binder_plddt", "target_plddt",
+           "interface_plddt", "n_contacts", "n_interface_residues", "min_interface_ca_dist", "mean_interface_ca_dist"]
+
+def score_structure(structure: Structure, contact_cutoff: float = 8.0) -> Dict[str, Any]:
+    """
+    Score one complex. The binder is the shortest chain; every other chain counts as target.
+    """
+    ca = structure.ca()
+    chain_plddt = ca.chain_plddt()
+    if len(chain_plddt) < 2:
+        raise ValueError(f"expected a binder-target complex, found chains {list(chain_plddt)}")
+    binder_chain = min(chain_plddt, key=lambda c: int((ca.chain == c).sum()))
+    is_binder = ca.chain == binder_chain
+    binder, target = ca.select(is_binder), ca.select(~is_binder)
+
+    # all binder x target CA distances at once (binders are short, so this stays small)
+    dist = np.linalg.norm(binder.xyz[:, None, :] - target.xyz[None, :, :], axis=-1)
+    contacts = dist < contact_cutoff
+    binder_iface = contacts.any(axis=1)
+    target_iface = contacts.any(axis=0)
+    iface_plddt = np.concatenate([binder.b_factor[binder_iface], target.b_factor[target_iface]])
+    return {
+        "binder_chain": binder_chain,
+        "binder_length": len(binder),
+        "binder_sequence": binder.sequence(),
+        "mean_plddt": float(ca.b_factor.mean()),
+        "binder_plddt": float(binder.b_factor.mean()),
+        "target_plddt": float(target.b_factor.mean()),
+        "interface_plddt": float(iface_plddt.mean()) if len(iface_plddt) else 0.0,
+        "n_contacts": int(contacts.sum()),
+        "n_interface_residues": int(binder_iface.sum() + target_iface.sum()),
+        "min_interface_ca_dist": float(dist.min()) if dist.size else float("inf"),
+        "mean_interface_ca_dist": float(dist[contacts].mean()) if contacts.any() else float("nan"),
+    }
+
+def score_file(path: str, contact_cutoff: float = 8.0) -> Dict[str, Any]:
+    try:
+        scores = score_structure(Structure.from_file(path), contact_cutoff)
+    except (OSError, ValueError) as e:
+        return {"file": path, "error": str(e)}
+    scores["file"] = path
+    return scores
+
+def rank(scores: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Sort by interface pLDDT, then by contact count, then mean pLDDT (best first) and number the ranks.
+    """
+    ranked = sorted(scores, key=lambda s: (s["interface_plddt"], s["n_contacts"], s["mean_plddt"]), reverse=True)
+    for i, s in enumerate(ranked, start=1):
+        s["rank"] = i
+    return ranked
+
+def score_directory(pdb_dir: str, pattern: str = "*.pdb", workers: int = None, contact_cutoff: float = 8.0) -> List[Dict[str, Any]]:
+    paths = sorted(glob.glob(os.path.join(pdb_dir, pattern)))
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(score_file, paths, [contact_cutoff] * len(paths), chunksize=max(1, len(paths) // (workers * 4))))
+    failed = [r for r in results if "error" in r]
+    for r in failed:
+        print(f"Skipping {r['file']}: {r['error']}")
+    return rank([r for r in results if "error" not in r])
+
+def write_table(ranked: List[Dict[str, Any]], out_path: str):
+    with open(out_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, delimiter="\t", extrasaction="ignore")
+        writer.writeheader()
+        for s in ranked:
+            writer.writerow({k: f"{v:.2f}" if isinstance(v, float) else v for k, v in s.items()})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score and rank AF2-Multimer binder-target PDBs")
+    parser.add_argument("pdb_dir", type=str, help="Directory of multimer PDBs (e.g. output1/)")
+    parser.add_argument("--pattern", type=str, default="*.pdb", help="Glob of files to score inside pdb_dir")
+    parser.add_argument("--out", type=str, default=None, help="Ranked table (default: <pdb_dir>/5_ranking.tsv)")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument("--contact_cutoff", type=float, default=8.0, help="CA-CA distance (A) that counts as a binder-target contact")
+    parser.add_argument("--top", type=int, default=5, help="Print the top N binders")
+    args = parser.parse_args()
+
+    ranked = score_directory(args.pdb_dir, args.pattern, args.workers, args.contact_cutoff)
+    out_path = args.out or os.path.join(args.pdb_dir, "5_ranking.tsv")
+    write_table(ranked, out_path)
+    for s in ranked[:args.top]:
+        print("-"*80)
+        print(f"rank: {s['rank']}  file: {s['file']}")
+        print(f"binder: {s['binder_sequence']}")
+        print(f"interface pLDDT: {s['interface_plddt']:.2f}  contacts: {s['n_contacts']}  mean pLDDT: {s['mean_plddt']:.2f}")
+    print(f"Ranked {len(ranked)} structures, table saved to {out_path}")
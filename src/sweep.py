@@ -0,0 +1,405 @@
+# Sweep driver: run every (cycle, num_seq, diffusion, temp) job of a grid or job file in one process
+#   - targets and epitopes come from the registry (targets.json)
+#   - the target PDB is parsed once, readiness is checked once, one pooled NimClient is shared
+#   - stages are streamed through pipeline.Pipeline, so MPNN on job k overlaps diffusion on job k+1,
+#     and with --multimer_workers each designed binder is folded while other backbones still diffuse
+#   - one manifest of all outputs is written at the end (and refreshed after every job)
+#   - with --adaptive, requests in flight per model and ProteinMPNN batch sizes follow the measured
+#     service times (scheduler.py) instead of --*_workers and one call per --num_seq
+#
+# python sweep.py --cycles 1A 1B 2C --num_seq 4 --diffusion 25 30 --temp 0.1 0.2
+# python sweep.py --jobs jobs.csv      (columns: cycle,num_seq,diffusion,temp; .yaml/.yml list of the same keys also works)
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from nim_client import NimClient, NIM_HOST_URL_BASE, NIM_PORTS, NIM_ENDPOINTS
+from result_cache import ResultCache, DEFAULT_CACHE_DIR
+from design_params import (ExampleRequestParams, load_reduced_pdb, load_epitope_crop, load_hotspots,
+                           rfdiffusion_payload, proteinmpnn_payload, merge_proteinmpnn, binder_sequences, warmup_queries)
+from target_registry import TargetRegistry, Epitope, DEFAULT_REGISTRY
+from epitope_crop import EpitopeCrop
+from fold_index import FoldIndex, DEFAULT_FOLD_INDEX
+from mfasta import designed_records
+from msa_cache import MsaCache, DEFAULT_MSA_DIR, multimer_payload
+from triage import TriageConfig, add_triage_arguments, config_from_args, triage, report
+from hotspots import HotspotConfig, add_hotspot_arguments, hotspot_config_from_args
+from pipeline import Pipeline, Stage
+from scheduler import AdaptiveScheduler
+from tracing import configure_tracing, get_tracer, traced_open
+from mpnn_probs import save_probs
+from run_journal import RunJournal, unit_key
+from design_db import DesignDB
+
+root = "/home/ubuntu/nvidia-workbench"
+
+class SweepJob:
+    def __init__(self, epitope: Epitope, num_seq: int, diffusion: int, temp: float, crop_radius: Optional[float] = None,
+                 hotspots: Union[HotspotConfig, Sequence[str], None] = None):
+        self.epitope = epitope
+        self.cycle = epitope.name
+        self.num_seq = num_seq
+        self.diffusion = diffusion
+        self.temp = temp
+        self.precomputed_pdb_path = epitope.target.pdb
+        self.crop_radius = crop_radius
+        self.hotspot_spec = hotspots  # residues, or a HotspotConfig to pick them from the precomputed PDB
+        self.name = f"cycle{self.cycle}_{num_seq}seqs_{diffusion}diff_{temp}temp"
+        self.outdir = f"{root}/{diffusion}diff_{temp}temp_{num_seq}numseq"
+
+    def crop(self) -> Optional[EpitopeCrop]:
+        if self.crop_radius is None or not self.epitope.window:
+            return None
+        return load_epitope_crop(self.precomputed_pdb_path, self.epitope.window, self.crop_radius, tuple(self.hotspots))
+
+    @property
+    def hotspots(self) -> List[str]:
+        """
+        Hotspot residues in the original numbering; none for whole-target epitopes.
+        """
+        if self.hotspot_spec is None or not self.epitope.window:
+            return []
+        if isinstance(self.hotspot_spec, HotspotConfig):
+            return load_hotspots(self.precomputed_pdb_path, self.epitope.window, self.hotspot_spec).residues
+        return list(self.hotspot_spec)
+
+    @property
+    def contigs(self) -> str:
+        crop = self.crop()
+        return crop.contigs(self.epitope.binder_length) if crop is not None else self.epitope.contigs()
+
+    def input_pdb(self) -> str:
+        crop = self.crop()
+        return crop.pdb if crop is not None else load_reduced_pdb(self.precomputed_pdb_path)
+
+    def params(self) -> ExampleRequestParams:
+        crop = self.crop()
+        return ExampleRequestParams(
+            target_sequence=self.epitope.target.sequence,
+            contigs=self.contigs,
+            hotspot_res=crop.hotspots(self.hotspots) if crop is not None else self.hotspots,
+            input_pdb_chains=[self.epitope.target.chain],
+            ca_only=False,
+            use_soluble_model=True,
+            sampling_temp=[self.temp],
+            diffusion_steps=self.diffusion,
+            num_seq_per_target=self.num_seq
+        )
+
+    def settings(self) -> Dict[str, Any]:
+        """
+        Job settings that change the RFdiffusion input but not the job name; journal entries must match them.
+        """
+        return {"crop_radius": self.crop_radius, "hotspots": self.hotspots or None}
+
+    def describe(self) -> Dict[str, Any]:
+        return {"cycle": self.cycle, "target": self.epitope.target.name, "num_seq": self.num_seq, "diffusion": self.diffusion,
+                "temp": self.temp, "contigs": self.contigs, "crop_radius": self.crop_radius, "hotspots": self.hotspots, "precomputed_pdb": self.precomputed_pdb_path, "outdir": self.outdir}
+
+def load_jobs(registry: TargetRegistry, path: str, crop_radius: Optional[float] = None,
+              hotspots: Union[HotspotConfig, Sequence[str], None] = None) -> List[SweepJob]:
+    """
+    Read jobs from a CSV (header cycle,num_seq,diffusion,temp) or a YAML list of mappings with the same keys.
+    """
+    if path.endswith((".yaml", ".yml")):
+        import yaml  # only needed for YAML job files
+        with open(path) as f:
+            rows = yaml.safe_load(f)
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    return [SweepJob(registry.epitope(str(row["cycle"])), int(row["num_seq"]), int(row["diffusion"]), float(row["temp"]), crop_radius, hotspots) for row in rows]
+
+def grid_jobs(registry: TargetRegistry, cycles: List[str], num_seqs: List[int], diffusions: List[int], temps: List[float],
+              crop_radius: Optional[float] = None, hotspots: Union[HotspotConfig, Sequence[str], None] = None) -> List[SweepJob]:
+    return [SweepJob(registry.epitope(cycle), *combo, crop_radius, hotspots) for cycle, *combo in itertools.product(cycles, num_seqs, diffusions, temps)]
+
+##############################################################
+# Stages
+##############################################################
+def run_rfdiffusion(nim_client: NimClient, job: SweepJob) -> Tuple[ExampleRequestParams, str]:
+    example = job.params()
+    rc, rfdiffusion_response = nim_client.query(
+        payload=rfdiffusion_payload(example, job.input_pdb()),
+        nim_endpoint=NIM_ENDPOINTS.RFDIFFUSION.value,
+        nim_port=NIM_PORTS.RFDIFFUSION_PORT.value
+    )
+    os.makedirs(job.outdir, exist_ok=True)
+    pdb_filename = f"{job.outdir}/2_{job.name}_rfdiffusion.pdb"
+    with traced_open(pdb_filename) as pdb_file:
+        pdb_file.write(rfdiffusion_response["output_pdb"])
+    return example, rfdiffusion_response["output_pdb"]
+
+def query_proteinmpnn(nim_client: NimClient, example: ExampleRequestParams, rfdiffusion_pdb: str) -> Dict[str, Any]:
+    """
+    All example.num_seq_per_target designs of a backbone: one call, or with an adaptive scheduler one seeded
+    call per batch its batch sizer picks, merged into one response.
+    """
+    payload = proteinmpnn_payload(example, rfdiffusion_pdb)
+    scheduler = nim_client.scheduler
+    # batches differ only in num_seq_per_target, so each is sent with its own random_seed (derived from the
+    # backbone, so a rerun sends the same ones); a NIM with a fixed default seed would repeat the first batch
+    base_seed = int(unit_key(rfdiffusion_pdb), 16) % 2**31 if scheduler is not None else None
+    responses, remaining = [], example.num_seq_per_target
+    while remaining > 0:
+        n = scheduler.batch.next(remaining) if scheduler is not None else remaining
+        batch_payload = dict(payload, num_seq_per_target=n)
+        if base_seed is not None:
+            batch_payload["random_seed"] = (base_seed + len(responses)) % 2**31
+        rc, response = nim_client.query(
+            payload=batch_payload,
+            nim_endpoint=NIM_ENDPOINTS.PROTEINMPNN.value,
+            nim_port=NIM_PORTS.PROTEINMPNN_PORT.value
+        )
+        responses.append(response)
+        remaining -= n
+    return merge_proteinmpnn(responses)
+
+def run_proteinmpnn(nim_client: NimClient, job: SweepJob, example: ExampleRequestParams, rfdiffusion_pdb: str) -> Tuple[Dict[str, str], List[List[str]]]:
+    proteinmpnn_response = query_proteinmpnn(nim_client, example, rfdiffusion_pdb)
+    binders = binder_sequences(proteinmpnn_response["mfasta"])
+    binder_target_pairs = [[binder, example.target_sequence] for binder in binders]
+    files = {
+        "rfdiffusion_pdb": f"{job.outdir}/2_{job.name}_rfdiffusion.pdb",
+        "proteinmpnn_fasta": f"{job.outdir}/3_{job.name}_proteinmpnn.fasta",
+        "proteinmpnn_pairs": f"{job.outdir}/3_{job.name}_proteinmpnn_pairs.json",
+    }
+    with traced_open(files["proteinmpnn_pairs"]) as json_file:
+        json.dump([[binder, job.epitope.target.name] for binder in binders], json_file, indent=4)
+    with traced_open(files["proteinmpnn_fasta"]) as fasta_file:
+        fasta_file.write(proteinmpnn_response["mfasta"])
+    probs_files = save_probs(f"{job.outdir}/3_{job.name}_proteinmpnn", proteinmpnn_response["probs"], proteinmpnn_response.get("scores"))
+    files["proteinmpnn_probs"] = probs_files[0]
+    return files, binder_target_pairs
+
+def run_multimer(nim_client: NimClient, job: SweepJob, pair_idx: int, binder_target_pair: List[str], msa_cache: Optional[MsaCache] = None) -> str:
+    pdb_filename = f"{job.outdir}/4_{job.name}_structure_pair_{pair_idx + 1}.pdb"
+    # streamed to disk in chunks; the PDB is never held in memory
+    send = lambda payload: nim_client.post_nim(payload, NIM_ENDPOINTS.AF2_MULTIMER.value, NIM_PORTS.AF2_MULTIMER_PORT.value, path=pdb_filename)
+    msa_cache.fold(binder_target_pair, send) if msa_cache is not None else send(multimer_payload(binder_target_pair))
+    return pdb_filename
+
+def run_sweep(nim_client: NimClient,
+              jobs: List[SweepJob],
+              manifest_path: str,
+              rfdiffusion_workers: int = 1,
+              proteinmpnn_workers: int = 1,
+              multimer_workers: int = 0,
+              queue_size: int = 4,
+              journal: RunJournal = None,
+              registry: TargetRegistry = None,
+              fold_index: Optional[FoldIndex] = None,
+              triage_config: Optional[TriageConfig] = None,
+              msa_cache: Optional[MsaCache] = None) -> List[Dict[str, Any]]:
+    """
+    Stream all jobs through RFdiffusion -> ProteinMPNN (-> AF2-Multimer when multimer_workers > 0)
+    and return the manifest entries. Units already recorded in the journal are not recomputed, and
+    with a fold_index each distinct binder-target pair is folded once across jobs and runs. With a
+    triage_config only the designs that pass the pre-fold triage are folded, and with an msa_cache each
+    target's MSA is searched once and sent with all of its folds.
+    """
+    registry = registry or TargetRegistry.load()
+    manifest = [dict(job.describe(), status="pending") for job in jobs]
+    manifest_lock = threading.Lock()
+
+    def write_manifest():
+        with manifest_lock:
+            with open(manifest_path, "w") as f:
+                json.dump(manifest, f, indent=4)
+
+    def rfdiffusion_stage(i: int):
+        sequences = journal.done("sequences", jobs[i].name, **jobs[i].settings()) if journal else None
+        if sequences is not None:
+            yield i, None, None  # ProteinMPNN already ran for this job; no backbone needed
+            return
+        backbone = journal.done("backbone", jobs[i].name, **jobs[i].settings()) if journal else None
+        if backbone is not None:
+            with open(backbone["file"]) as pdb_file:
+                example, rfdiffusion_pdb = jobs[i].params(), pdb_file.read()
+        else:
+            example, rfdiffusion_pdb = run_rfdiffusion(nim_client, jobs[i])
+            if journal:
+                journal.record("backbone", jobs[i].name, file=f"{jobs[i].outdir}/2_{jobs[i].name}_rfdiffusion.pdb", **jobs[i].settings())
+        print(f"[{jobs[i].name}] RFdiffusion done, queued ProteinMPNN")
+        yield i, example, rfdiffusion_pdb
+
+    def proteinmpnn_stage(item):
+        i, example, rfdiffusion_pdb = item
+        sequences = journal.done("sequences", jobs[i].name, **jobs[i].settings()) if journal else None
+        if sequences is not None:
+            files = sequences["files"]
+            with open(files["proteinmpnn_pairs"]) as json_file:
+                binder_target_pairs = [registry.resolve_pair(pair) for pair in json.load(json_file)]
+        else:
+            files, binder_target_pairs = run_proteinmpnn(nim_client, jobs[i], example, rfdiffusion_pdb)
+            if journal:
+                journal.record("sequences", jobs[i].name, file=files["proteinmpnn_pairs"], files=files, **jobs[i].settings())
+        with open(files["proteinmpnn_fasta"]) as fasta_file:
+            records = designed_records(fasta_file)
+        binders = [record.to_dict() for record in records]
+        keep = [True] * len(binder_target_pairs)
+        if triage_config is not None:
+            result = triage([r.sequence for r in records], [r.score for r in records], triage_config)
+            keep = result.keep.tolist()
+            for binder, reason in zip(binders, result.reasons):
+                binder.update(triage="kept" if not reason else reason)
+        with manifest_lock:
+            manifest[i].update(status="done", files=files, n_binders=len(binder_target_pairs), binders=binders, folds=[])
+        print(f"[{jobs[i].name}] ProteinMPNN done, {len(binder_target_pairs)} binders")
+        if triage_config is not None and multimer_workers > 0:
+            print(f"[{jobs[i].name}] {report(result)}")
+        write_manifest()
+        for pair_idx, binder_target_pair in enumerate(binder_target_pairs):
+            if keep[pair_idx]:
+                yield i, pair_idx, binder_target_pair
+
+    def multimer_stage(item):
+        i, pair_idx, binder_target_pair = item
+        fold = journal.done("fold", unit_key(*binder_target_pair)) if journal else None
+        reused = fold is not None
+        if fold is not None:
+            pdb_filename = fold["file"]
+        else:
+            run = lambda: run_multimer(nim_client, jobs[i], pair_idx, binder_target_pair, msa_cache)
+            pdb_filename, reused = fold_index.fold(*binder_target_pair, run) if fold_index else (run(), False)
+            if journal:
+                journal.record("fold", unit_key(*binder_target_pair), file=pdb_filename)
+        with manifest_lock:
+            manifest[i]["folds"].append(pdb_filename)
+        print(f"[{jobs[i].name}] folded pair {pair_idx + 1}" + (f" (reused {pdb_filename})" if reused else ""))
+        yield pdb_filename
+
+    def on_error(stage_name: str, item, e: Exception):
+        i = item if stage_name == "rfdiffusion" else item[0]
+        with manifest_lock:
+            if stage_name == "multimer":
+                manifest[i].setdefault("fold_errors", []).append(str(e))
+            else:
+                manifest[i].update(status="failed", stage=stage_name, error=str(e))
+        print(f"[{jobs[i].name}] {stage_name} failed: {e}")
+
+    stages = [
+        Stage("rfdiffusion", rfdiffusion_stage, rfdiffusion_workers, queue_size),
+        Stage("proteinmpnn", proteinmpnn_stage, proteinmpnn_workers, queue_size),
+    ]
+    if multimer_workers > 0:
+        stages.append(Stage("multimer", multimer_stage, multimer_workers, queue_size))
+    pipeline = Pipeline(stages, on_error=on_error)
+    pipeline.run(range(len(jobs)))
+    print(pipeline.summary())
+    write_manifest()
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep RFdiffusion + ProteinMPNN over cycles x num_seq x diffusion x temp")
+    parser.add_argument("--root", type=str, default=root, help="Directory for job outputs, manifest and journal")
+    parser.add_argument("--registry", type=str, default=DEFAULT_REGISTRY, help="Target/epitope registry (targets.json)")
+    parser.add_argument("--jobs", type=str, default=None, help="CSV or YAML job file (cycle,num_seq,diffusion,temp); overrides the grid options")
+    parser.add_argument("--cycles", nargs="+", default=["1A"], help="Cycles to sweep (e.g. 1A 1B 2C)")
+    parser.add_argument("--num_seq", nargs="+", type=int, default=[1], help="Numbers of sequences per target")
+    parser.add_argument("--diffusion", nargs="+", type=int, default=[20], help="Numbers of diffusion steps")
+    parser.add_argument("--temp", nargs="+", type=float, default=[0.2], help="Sampling temperatures")
+    parser.add_argument("--crop_radius", type=float, default=None, help="Send only the epitope window plus residues within this many Angstrom of it (default: the whole target)")
+    add_hotspot_arguments(parser)
+    parser.add_argument("--rfdiffusion_workers", type=int, default=1, help="RFdiffusion requests in flight")
+    parser.add_argument("--proteinmpnn_workers", type=int, default=1, help="ProteinMPNN requests in flight")
+    parser.add_argument("--multimer_workers", type=int, default=0, help="AF2-Multimer requests in flight; 0 skips folding")
+    parser.add_argument("--queue_size", type=int, default=4, help="Items buffered between stages before upstream waits")
+    parser.add_argument("--adaptive", action="store_true", help="Size requests in flight per model and ProteinMPNN batches from measured service times (--*_workers become unused)")
+    parser.add_argument("--max_in_flight", type=int, default=8, help="With --adaptive: upper bound on one model's requests in flight")
+    parser.add_argument("--target_call_seconds", type=float, default=120.0, help="With --adaptive: ProteinMPNN batches are sized to take about this long")
+    parser.add_argument("--max_batch", type=int, default=64, help="With --adaptive: largest num_seq_per_target of one ProteinMPNN call")
+    parser.add_argument("--manifest", type=str, default=None, help="Manifest path (default: <root>/sweep_<timestamp>.json)")
+    parser.add_argument("--journal", type=str, default=None, help="Run journal (default: <root>/sweep_journal.jsonl); backbones, sequence sets and folds recorded there are skipped")
+    parser.add_argument("--fold_index", type=str, default=DEFAULT_FOLD_INDEX, help="Cross-run index of folded pairs; identical binders are folded once")
+    parser.add_argument("--no_dedup", action="store_true", help="Fold every binder, even identical ones")
+    add_triage_arguments(parser)
+    parser.add_argument("--reuse_msa", action="store_true", help="Search each target's MSA once (MSA search NIM) and send it with every fold")
+    parser.add_argument("--msa_dir", type=str, default=DEFAULT_MSA_DIR, help="With --reuse_msa: directory of cached target MSAs")
+    parser.add_argument("--design_db", type=str, default=None, help="Import every job's backbones, sequences and folds into this SQLite design database (design_db.py)")
+    parser.add_argument("--read_timeout", type=float, default=960.0, help="Seconds to wait for a NIM response")
+    parser.add_argument("--max_retries", type=int, default=5, help="Retries on 429/503 or dropped connections, with exponential backoff")
+    parser.add_argument("--no_cache", "--no-cache", action="store_true", help="Always call the NIMs; do not read or write the result cache")
+    parser.add_argument("--refresh", action="store_true", help="Recompute every NIM call and overwrite its cached result")
+    parser.add_argument("--cache_dir", type=str, default=DEFAULT_CACHE_DIR, help="Directory of the on-disk NIM result cache")
+    parser.add_argument("--cache_max_gb", type=float, default=20.0, help="Size bound of the result cache")
+    parser.add_argument("--trace", type=str, default=None, help="JSONL trace of timing spans (default: <root>/sweep_trace.jsonl)")
+    parser.add_argument("--metrics_port", type=int, default=None, help="Serve Prometheus metrics of the spans on this port")
+    parser.add_argument("--otel", action="store_true", help="Also send spans to the OpenTelemetry tracer (needs opentelemetry-sdk)")
+    parser.add_argument("--ready_timeout", type=float, default=1200.0, help="Seconds to wait for the NIMs to report ready")
+    parser.add_argument("--warmup", action="store_true", help="Send one tiny RFdiffusion and ProteinMPNN request once the NIMs are ready")
+    args = parser.parse_args()
+    root = args.root
+    configure_tracing(args.trace or f"{root}/sweep_trace.jsonl", args.metrics_port, args.otel)
+
+    registry = TargetRegistry.load(args.registry)
+    hotspots = hotspot_config_from_args(args) or args.hotspots
+    jobs = (load_jobs(registry, args.jobs, args.crop_radius, hotspots) if args.jobs
+            else grid_jobs(registry, args.cycles, args.num_seq, args.diffusion, args.temp, args.crop_radius, hotspots))
+    for path in {job.precomputed_pdb_path for job in jobs}:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Precomputed PDB file {path} does not exist.")
+
+    NVIDIA_API_KEY = os.getenv("NGC_CLI_API_KEY")
+    if not NVIDIA_API_KEY:
+        raise ValueError("NGC_CLI_API_KEY environment variable is not set. Please export it before running the script.")
+    HEADERS = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {NVIDIA_API_KEY}",
+        "poll-seconds": "900"
+    }
+    nim_client = NimClient(
+        headers=HEADERS,
+        base_url=NIM_HOST_URL_BASE,
+        read_timeout=args.read_timeout,
+        max_retries=args.max_retries,
+        cache=None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_max_gb * 1024**3)),
+        refresh=args.refresh,
+        scheduler=AdaptiveScheduler(max_in_flight=args.max_in_flight, target_call_seconds=args.target_call_seconds,
+                                    max_batch=args.max_batch) if args.adaptive else None
+    )
+    if args.adaptive:
+        # enough threads for every model to reach max_in_flight; the scheduler decides how many send at once
+        args.rfdiffusion_workers = args.proteinmpnn_workers = args.max_in_flight
+        args.multimer_workers = args.max_in_flight if args.multimer_workers > 0 else 0
+    services = {"RFDiffusion": NIM_PORTS.RFDIFFUSION_PORT.value, "ProteinMPNN": NIM_PORTS.PROTEINMPNN_PORT.value}
+    if args.multimer_workers > 0:
+        services["AF2-Multimer"] = NIM_PORTS.AF2_MULTIMER_PORT.value
+        if args.reuse_msa:
+            services["MSA-Search"] = NIM_PORTS.MSA_SEARCH_PORT.value
+    nim_client.wait_until_ready(services, timeout=args.ready_timeout,
+                                warmup=warmup_queries(jobs[0].epitope.target.pdb) if args.warmup and jobs else None)
+
+    os.makedirs(root, exist_ok=True)
+    manifest_path = args.manifest or f"{root}/sweep_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    print(f"Running {len(jobs)} jobs, manifest: {manifest_path}")
+    journal = RunJournal(args.journal or f"{root}/sweep_journal.jsonl")
+    fold_index = FoldIndex(args.fold_index) if args.multimer_workers > 0 and not args.no_dedup else None
+    manifest = run_sweep(nim_client, jobs, manifest_path, args.rfdiffusion_workers, args.proteinmpnn_workers,
+                         args.multimer_workers, args.queue_size, journal, registry, fold_index, config_from_args(args),
+                         MsaCache(nim_client, args.msa_dir) if args.reuse_msa and args.multimer_workers > 0 else None)
+    journal.close()
+    if fold_index is not None:
+        print(f"{fold_index.reused} folds reused from identical binders")
+        fold_index.close()
+    if nim_client.scheduler is not None:
+        print("Adaptive limits:")
+        print(nim_client.scheduler.summary())
+    if args.design_db:
+        design_db = DesignDB(args.design_db, registry)
+        added = {"sequences": 0, "folds": 0}
+        for outdir in sorted({job.outdir for job in jobs}):
+            for k, v in design_db.import_directory(outdir).items():
+                added[k] += v
+        print(f"Design database {args.design_db}: {added['sequences']} new sequences, {added['folds']} new folds")
+        design_db.close()
+    n_done = sum(entry["status"] == "done" for entry in manifest)
+    print(f"{n_done} of {len(jobs)} jobs finished, manifest saved to {manifest_path}")
+    print(f"Time by span (trace: {get_tracer().trace_path}):")
+    print(get_tracer().summary())
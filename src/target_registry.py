@@ -0,0 +1,125 @@
+# Target / epitope registry: one place for target sequences, precomputed PDBs and epitope contigs
+# targets.json holds
+#   "targets":  name -> {"sequence", "pdb", "chain", optional "source": "cycle1 A92-131" for a cropped peptide}
+#   "epitopes": name (the scripts' --cycle, e.g. "1A", or "pep1A" for the cropped peptides)
+#               -> {"target": target name, "window": "A480-510" or "" for the whole target, "binder_length": "15-25",
+#                   optional "script_windows": {"1_protein_binder_design": "A400-440"}}
+# A script whose epitope windows differ from the shared ones (1_ designs against wider windows, and
+# against A400-600 / A100-300 rather than no target for cycles 1 and 2) asks for its own with
+# registry.epitope(name, script="1_protein_binder_design").
+# Adding an epitope is a new entry in targets.json, not an edit to every script. Each target
+# sequence is loaded (and interned) once; pairs and manifests refer to a target by name.
+
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from design_params import ExampleRequestParams, load_epitope_crop
+from epitope_crop import EpitopeCrop
+
+DEFAULT_REGISTRY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "targets.json")
+
+class Target:
+    def __init__(self, name: str, sequence: str, pdb: str, chain: str = "A", source: str = ""):
+        self.name = name
+        self.sequence = sys.intern(sequence)
+        self.pdb = pdb
+        self.chain = chain
+        self.source = source  # "<target name> <window>" the target was cut from
+
+class Epitope:
+    def __init__(self, name: str, target: Target, window: str, binder_length: str = "15-25", script_windows: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.target = target
+        self.window = window
+        self.binder_length = binder_length
+        self.script_windows = script_windows or {}  # script name -> that script's window
+
+    def for_script(self, script: str) -> "Epitope":
+        """
+        The epitope as a script sees it: its script_windows entry, if any, in place of the shared window.
+        """
+        if script not in self.script_windows:
+            return self
+        return Epitope(self.name, self.target, self.script_windows[script], self.binder_length, self.script_windows)
+
+    def contigs(self, chain_break: bool = False) -> str:
+        """
+        RFdiffusion contig string, e.g. "A480-510/15-25" (or "A480-510/0 15-25" with an explicit chain break).
+        """
+        if not self.window:
+            return self.binder_length
+        return f"{self.window}/0 {self.binder_length}" if chain_break else f"{self.window}/{self.binder_length}"
+
+class TargetRegistry:
+    def __init__(self, targets: Dict[str, Target], epitopes: Dict[str, Epitope]):
+        self.targets = targets
+        self.epitopes = epitopes
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_REGISTRY) -> "TargetRegistry":
+        with open(path) as f:
+            d = json.load(f)
+        targets = {name: Target(name, t["sequence"], t["pdb"], t.get("chain", "A"), t.get("source", "")) for name, t in d["targets"].items()}
+        epitopes = {}
+        for name, e in d["epitopes"].items():
+            if e["target"] not in targets:
+                raise ValueError(f"Epitope {name} refers to unknown target {e['target']} in {path}")
+            epitopes[name] = Epitope(name, targets[e["target"]], e.get("window", ""), e.get("binder_length", "15-25"), e.get("script_windows"))
+        return cls(targets, epitopes)
+
+    def target(self, name: str) -> Target:
+        if name not in self.targets:
+            raise ValueError(f"Unknown target {name}. Known targets: {', '.join(self.targets)}")
+        return self.targets[name]
+
+    def epitope(self, name: str, script: Optional[str] = None) -> Epitope:
+        if name not in self.epitopes:
+            raise ValueError(f"Invalid cycle number {name}. Known epitopes: {', '.join(self.epitopes)}")
+        return self.epitopes[name].for_script(script) if script else self.epitopes[name]
+
+    def crop_source(self, epitope_name: str, script: Optional[str] = None) -> Tuple[Target, str]:
+        """
+        Structure and window to crop for an epitope: a peptide target's source window, else the epitope's own window ("" for the whole target).
+        """
+        epitope = self.epitope(epitope_name, script)
+        if epitope.target.source:
+            source, window = epitope.target.source.split()
+            return self.target(source), window
+        return epitope.target, epitope.window
+
+    def crop(self, epitope_name: str, radius: float, hotspots: Sequence[str] = (), script: Optional[str] = None) -> Optional[EpitopeCrop]:
+        """
+        The epitope's structure cropped to its window plus every residue within radius; None for whole-target epitopes.
+        """
+        target, window = self.crop_source(epitope_name, script)
+        return load_epitope_crop(target.pdb, window, radius, tuple(hotspots)) if window else None
+
+    def request_params(self,
+                       epitope_name: str,
+                       temp: float,
+                       diffusion_steps: int,
+                       num_seq_per_target: int,
+                       chain_break: bool = False,
+                       input_pdb_chains: Optional[List[str]] = None) -> ExampleRequestParams:
+        epitope = self.epitope(epitope_name)
+        return ExampleRequestParams(
+            target_sequence=epitope.target.sequence,
+            contigs=epitope.contigs(chain_break),
+            hotspot_res=[],
+            input_pdb_chains=input_pdb_chains or [epitope.target.chain],
+            ca_only=False,
+            use_soluble_model=True,
+            sampling_temp=[temp],
+            diffusion_steps=diffusion_steps,
+            num_seq_per_target=num_seq_per_target
+        )
+
+    def resolve_pair(self, pair: List[str]) -> List[str]:
+        """
+        [binder, target name] -> [binder, target sequence]; a pair that already holds a sequence is returned as is.
+        """
+        binder, target = pair
+        return [binder, self.targets[target].sequence if target in self.targets else target]
+
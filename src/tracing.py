@@ -0,0 +1,182 @@
+# Timing spans for NIM calls and local steps, exported as a JSONL trace and Prometheus metrics
+#   with span("nim.rfdiffusion", url=url) as s:
+#       ...
+#       s.set(request_bytes=n, retries=k)
+# Every finished span is one JSON line (name, start, wall_s, status, parent, attributes) in the trace
+# file, and is folded into per-name counters (count, errors, seconds histogram, bytes) that can be
+# served as Prometheus text on /metrics. If the opentelemetry package is installed, spans can also be
+# mirrored to the configured OpenTelemetry tracer.
+#
+# Tracing is configured once per process (configure_tracing); without it, spans are still aggregated
+# in memory (summary()) but nothing is written.
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 900, 1800)  # seconds
+
+class Span:
+    def __init__(self, name: str, span_id: int, parent_id: Optional[int], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs: Any):
+        self.attrs.update(attrs)
+
+class Tracer:
+    def __init__(self, trace_path: Optional[str] = None, otel: bool = False):
+        self.trace_path = trace_path
+        self._file = None
+        if trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            self._file = open(trace_path, "a")
+        self._otel = None
+        if otel:
+            from opentelemetry import trace  # optional: pip install opentelemetry-sdk
+            self._otel = trace.get_tracer("protein-binder-design")
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span]:
+        stack: List[Span] = self._local.__dict__.setdefault("stack", [])
+        s = Span(name, next(self._ids), stack[-1].span_id if stack else None, attrs)
+        stack.append(s)
+        otel_cm = self._otel.start_as_current_span(name) if self._otel is not None else None
+        otel_span = otel_cm.__enter__() if otel_cm is not None else None
+        error = None
+        try:
+            yield s
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            stack.pop()
+            wall_s = time.perf_counter() - s._t0
+            self._finish(s, wall_s, error)
+            if otel_cm is not None:
+                otel_span.set_attributes({k: v for k, v in s.attrs.items() if isinstance(v, (str, bool, int, float))})
+                otel_cm.__exit__(type(error) if error else None, error, None)
+
+    def record(self, name: str, wall_s: float, error: Optional[BaseException] = None, **attrs: Any):
+        """
+        Record an already timed span without nesting (e.g. from a coroutine, where the thread's span stack does not apply).
+        """
+        s = Span(name, next(self._ids), None, attrs)
+        s.start -= wall_s
+        self._finish(s, wall_s, error)
+
+    def _finish(self, s: Span, wall_s: float, error: Optional[BaseException]):
+        record = {"name": s.name, "id": s.span_id, "parent": s.parent_id, "start": s.start, "wall_s": round(wall_s, 6),
+                  "status": "error" if error else "ok", "thread": threading.current_thread().name, **s.attrs}
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        with self._lock:
+            m = self.metrics.setdefault(s.name, {"count": 0, "errors": 0, "seconds": 0.0, "buckets": [0] * len(BUCKETS),
+                                                 "request_bytes": 0, "response_bytes": 0, "retries": 0})
+            m["count"] += 1
+            m["errors"] += error is not None
+            m["seconds"] += wall_s
+            for i, le in enumerate(BUCKETS):
+                if wall_s <= le:
+                    m["buckets"][i] += 1
+            for key in ("request_bytes", "response_bytes", "retries"):
+                m[key] += int(s.attrs.get(key) or 0)
+            if self._file is not None:
+                self._file.write(json.dumps(record, default=str) + "\n")
+                self._file.flush()
+
+    def summary(self) -> str:
+        """
+        One line per span name: count, total and mean seconds, errors.
+        """
+        with self._lock:
+            items = sorted(self.metrics.items(), key=lambda kv: -kv[1]["seconds"])
+            return "\n".join(f"{name:<28}{m['count']:>6} x {m['seconds'] / m['count']:8.2f}s = {m['seconds']:9.1f}s"
+                             f"{'  ' + str(m['errors']) + ' errors' if m['errors'] else ''}" for name, m in items)
+
+    def prometheus_text(self) -> str:
+        lines = ["# TYPE nim_span_seconds histogram"]
+        with self._lock:
+            for name, m in sorted(self.metrics.items()):
+                for le, n in zip(BUCKETS, m["buckets"]):
+                    lines.append(f'nim_span_seconds_bucket{{span="{name}",le="{le}"}} {n}')
+                lines.append(f'nim_span_seconds_bucket{{span="{name}",le="+Inf"}} {m["count"]}')
+                lines.append(f'nim_span_seconds_sum{{span="{name}"}} {m["seconds"]:.6f}')
+                lines.append(f'nim_span_seconds_count{{span="{name}"}} {m["count"]}')
+            for metric, key in (("nim_span_errors_total", "errors"), ("nim_span_request_bytes_total", "request_bytes"),
+                                ("nim_span_response_bytes_total", "response_bytes"), ("nim_span_retries_total", "retries")):
+                lines.append(f"# TYPE {metric} counter")
+                lines += [f'{metric}{{span="{name}"}} {m[key]}' for name, m in sorted(self.metrics.items())]
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """
+        Serve prometheus_text() on http://host:port/metrics from a daemon thread.
+        """
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                body = tracer.prometheus_text().encode()
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+_tracer = Tracer()
+
+def configure_tracing(trace_path: Optional[str] = None, metrics_port: Optional[int] = None, otel: bool = False) -> Tracer:
+    """
+    Replace the process-wide tracer: write spans to trace_path, optionally serve /metrics on metrics_port.
+    """
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(trace_path, otel)
+    if metrics_port:
+        _tracer.serve_prometheus(metrics_port)
+        print(f"Prometheus metrics on http://localhost:{metrics_port}/metrics")
+    return _tracer
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+def span(name: str, **attrs: Any):
+    """
+    Time a block under the process-wide tracer.
+    """
+    return _tracer.span(name, **attrs)
+
+@contextmanager
+def traced_open(path: str, mode: str = "w", **kwargs: Any) -> Iterator[IO]:
+    """
+    open() timed as a "local.write" (or "local.read") span.
+    """
+    with span("local.read" if "r" in mode else "local.write", file=path), open(path, mode, **kwargs) as f:
+        yield f
@@ -0,0 +1,129 @@
+# Pre-fold triage of ProteinMPNN designs: cheap CPU checks before the expensive AF2-Multimer stage
+#   - MPNN score (mean negative log-likelihood from the mfasta header; lower is better) above max_score
+#   - composition: one residue type above max_fraction of the sequence (e.g. poly-Q / poly-A binders)
+#   - low complexity: Shannon entropy of the composition below min_entropy bits, or a homopolymer run
+#     longer than max_run
+#   - top_k: of the designs that pass, only the best-scoring k per backbone are folded
+# All checks run on the whole batch at once: sequences are packed into one padded integer matrix and
+# composition, entropy and runs are computed with array operations across all rows.
+#
+#   result = triage(["KSAKEREARRREELRRESLE", ...], scores=[0.91, ...], config=TriageConfig(top_k=4))
+#   result.keep           # boolean mask over the batch
+#   result.reasons[i]     # "" when kept, else e.g. "Q 40% of residues"
+
+import argparse
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+_CODES = np.full(256, 20, dtype=np.int8)  # 20 = unknown residue, 21 = padding
+_CODES[np.frombuffer(AMINO_ACIDS.encode(), dtype=np.uint8)] = np.arange(20)
+PAD = 21
+
+class TriageConfig:
+    def __init__(self,
+                 max_score: Optional[float] = None,
+                 max_fraction: float = 0.35,
+                 min_entropy: float = 2.5,
+                 max_run: int = 4,
+                 top_k: Optional[int] = None):
+        self.max_score = max_score
+        self.max_fraction = max_fraction
+        self.min_entropy = min_entropy  # bits; a uniform 20-letter composition has log2(20) = 4.32
+        self.max_run = max_run
+        self.top_k = top_k
+
+class TriageResult:
+    def __init__(self, keep: np.ndarray, reasons: List[str], metrics: Dict[str, np.ndarray]):
+        self.keep = keep
+        self.reasons = reasons
+        self.metrics = metrics  # per-sequence arrays: length, max_fraction, max_residue, entropy, max_run, score
+
+    def rows(self, sequences: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        One dict per sequence (sequence, verdict, metrics) for tables and manifests.
+        """
+        return [dict(sequence=seq, keep=bool(self.keep[i]), reason=self.reasons[i],
+                     **{k: v[i].item() for k, v in self.metrics.items()}) for i, seq in enumerate(sequences)]
+
+def encode(sequences: Sequence[str]) -> np.ndarray:
+    """
+    Sequences as an (n, max length) int8 matrix of residue codes 0-19, 20 for unknown, PAD after the end.
+    """
+    n, width = len(sequences), max((len(s) for s in sequences), default=0)
+    packed = np.frombuffer("".join(s.ljust(width, "\0") for s in sequences).upper().encode(), dtype=np.uint8).reshape(n, width)
+    codes = _CODES[packed]
+    codes[packed == 0] = PAD
+    return codes
+
+def composition_metrics(codes: np.ndarray) -> Dict[str, np.ndarray]:
+    n = len(codes)
+    lengths = (codes != PAD).sum(axis=1)
+    counts = np.bincount((np.arange(n)[:, None] * 22 + codes).ravel(), minlength=n * 22).reshape(n, 22)[:, :21]
+    freq = counts / np.maximum(lengths, 1)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.where(freq > 0, freq * np.log2(freq), 0.0).sum(axis=1) + 0.0  # no -0.0
+
+    # longest homopolymer run: one pass over positions, vectorized across sequences
+    run = np.ones(n, dtype=np.int64)
+    max_run = np.minimum(lengths, 1)
+    for j in range(1, codes.shape[1]):
+        same = (codes[:, j] == codes[:, j - 1]) & (codes[:, j] != PAD)
+        run = np.where(same, run + 1, 1)
+        max_run = np.maximum(max_run, np.where(codes[:, j] != PAD, run, 0))
+
+    top = counts[:, :20].argmax(axis=1)
+    return {"length": lengths, "max_fraction": freq[:, :20].max(axis=1) if n else np.zeros(0), "max_residue": top,
+            "entropy": entropy, "max_run": max_run}
+
+def triage(sequences: Sequence[str], scores: Optional[Sequence[Optional[float]]] = None, config: Optional[TriageConfig] = None) -> TriageResult:
+    """
+    Check one backbone's batch of designed sequences; designs without a score are not ranked by score.
+    """
+    config = config or TriageConfig()
+    metrics = composition_metrics(encode(sequences))
+    score = np.array([np.nan if s is None else s for s in scores] if scores is not None else [np.nan] * len(sequences), dtype=np.float64)
+    metrics["score"] = score
+
+    checks = [
+        (metrics["max_fraction"] > config.max_fraction, lambda i: f"{AMINO_ACIDS[metrics['max_residue'][i]]} {metrics['max_fraction'][i]:.0%} of residues"),
+        (metrics["entropy"] < config.min_entropy, lambda i: f"low complexity, entropy {metrics['entropy'][i]:.2f} bits"),
+        (metrics["max_run"] > config.max_run, lambda i: f"homopolymer run of {metrics['max_run'][i]}"),
+    ]
+    if config.max_score is not None:
+        checks.append((score > config.max_score, lambda i: f"MPNN score {score[i]:.3f} > {config.max_score}"))
+    keep = np.ones(len(sequences), dtype=bool)
+    reasons = [""] * len(sequences)
+    for failed, reason in checks:
+        for i in np.flatnonzero(failed & keep):
+            reasons[i] = reason(i)
+        keep &= ~failed
+
+    if config.top_k is not None and keep.sum() > config.top_k:
+        # best (lowest) scores first; unscored designs keep their order after the scored ones
+        order = np.flatnonzero(keep)[np.argsort(np.where(np.isnan(score), np.inf, score)[keep], kind="stable")]
+        for i in order[config.top_k:]:
+            reasons[i] = f"not in top {config.top_k} by MPNN score"
+        keep[order[config.top_k:]] = False
+    return TriageResult(keep, reasons, metrics)
+
+def report(result: TriageResult) -> str:
+    line = f"Triage kept {int(result.keep.sum())} of {len(result.keep)} designs"
+    return line + "".join(f"\n  dropped design {i + 1}: {r}" for i, r in enumerate(result.reasons) if r)
+
+def add_triage_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--no_triage", action="store_true", help="Fold every ProteinMPNN design, skipping the pre-fold triage")
+    parser.add_argument("--top_k", type=int, default=None, help="Fold only the k best-scoring designs per backbone that pass triage")
+    parser.add_argument("--max_score", type=float, default=None, help="Drop designs whose MPNN score (lower is better) is above this")
+    parser.add_argument("--max_fraction", type=float, default=0.35, help="Drop designs where one residue type exceeds this fraction")
+    parser.add_argument("--min_entropy", type=float, default=2.5, help="Drop low-complexity designs below this composition entropy (bits)")
+    parser.add_argument("--max_run", type=int, default=4, help="Drop designs with a longer single-residue run")
+
+def config_from_args(args: argparse.Namespace) -> Optional[TriageConfig]:
+    """
+    TriageConfig from add_triage_arguments options, or None with --no_triage.
+    """
+    if args.no_triage:
+        return None
+    return TriageConfig(args.max_score, args.max_fraction, args.min_entropy, args.max_run, args.top_k)